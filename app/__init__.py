@@ -1,2 +1,6 @@
-from fastapi import FastAPI
-from .main import app
+def __getattr__(name):
+    # Imported on first access so `import app.<module>` doesn't load the whole web app
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,54 @@
+"""Batch processing API around agentic_system.
+
+Every transaction still runs through the regular graph, but the runs happen concurrently
+with micro-batchers active, so LLM questions from many graphs share one request.
+"""
+import asyncio
+import logging
+from typing import Iterable, List
+
+from app.agents import failure_detection_agent, monitoring_agent
+from app.agents.router import agentic_system
+from app.core.batching import batching
+from app.core.config import BATCH_MAX_CONCURRENCY, BATCH_MAX_WAIT_MS, BATCH_SIZE
+from app.core.state import AgentState, new_agent_state
+from app.models.schemas import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+async def aprocess_transactions(transactions: Iterable[Transaction], batch_size: int = BATCH_SIZE,
+                                max_wait: float = BATCH_MAX_WAIT_MS / 1000,
+                                max_concurrency: int = BATCH_MAX_CONCURRENCY) -> List[AgentState]:
+    """Processes transactions through agentic_system, micro-batching their LLM calls. Results keep input order."""
+    batchers = {
+        "validation": monitoring_agent.make_batcher(batch_size, max_wait),
+        "fraud_detection": failure_detection_agent.make_batcher(batch_size, max_wait),
+    }
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(transaction: Transaction) -> AgentState:
+        async with semaphore:
+            try:
+                return await agentic_system.ainvoke(new_agent_state(transaction))
+            except Exception as e:
+                # One bad transaction shouldn't sink the rest of the batch
+                logger.exception("Batch processing failed for %s", transaction.capture_id)
+                state = new_agent_state(transaction)
+                state['error_message'] = f"Processing failed: {e}"
+                state['history'].append(f"Batch: Processing failed: {e}")
+                return state
+
+    with batching(batchers):
+        results = await asyncio.gather(*(run(transaction) for transaction in transactions))
+
+    logger.info(
+        "Processed %d transactions with %d validation and %d fraud detection LLM requests",
+        len(results), batchers["validation"].requests, batchers["fraud_detection"].requests
+    )
+    return list(results)
+
+
+def process_transactions(transactions: Iterable[Transaction], **kwargs) -> List[AgentState]:
+    """Blocking wrapper around aprocess_transactions for scripts and notebooks."""
+    return asyncio.run(aprocess_transactions(transactions, **kwargs))
@@ -0,0 +1,139 @@
+"""Durable, resumable runs of the agent graph.
+
+With CHECKPOINT_DB set, transactions run through a copy of the graph compiled with a SQLite
+checkpointer, one thread per capture_id. A run that fails or is cut off part-way leaves its
+checkpoints behind; the next run for the same capture_id (a redelivery, a queued job or the
+startup sweep) resumes from the last completed node, so validation and fraud verdicts already
+paid for aren't asked for again. Finished runs delete their thread.
+
+A run leases its thread to the process running it. The startup sweep only resumes runs whose
+lease expired or was released, so a starting worker leaves alone the runs that other live
+processes sharing CHECKPOINT_DB are still executing.
+"""
+import logging
+import threading
+from typing import AsyncIterator, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END
+from langgraph.pregel import Pregel
+
+from app.agents.router import agentic_system, build_workflow
+from app.agents.streaming import astream_deltas
+from app.core.checkpoints import SqliteCheckpointSaver
+from app.core.config import CHECKPOINT_DB, GRAPH_TOPOLOGY
+from app.core.state import AgentState
+from app.models.schemas import Transaction
+
+logger = logging.getLogger(__name__)
+
+_durable_system: Optional[Pregel] = None
+_lock = threading.Lock()
+
+
+def durable_system() -> Optional[Pregel]:
+    """The checkpointed graph, compiled (and its file opened) on first use; None if checkpointing is off."""
+    global _durable_system
+    if not CHECKPOINT_DB:
+        return None
+    if _durable_system is None:
+        with _lock:
+            if _durable_system is None:
+                checkpointer = SqliteCheckpointSaver(CHECKPOINT_DB)
+                _durable_system = build_workflow(GRAPH_TOPOLOGY).compile(checkpointer=checkpointer)
+    return _durable_system
+
+
+def thread_config(capture_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": capture_id}}
+
+
+async def _run_input(graph: Pregel, state: AgentState, config: RunnableConfig) -> Optional[AgentState]:
+    """None (resume) if an earlier run of this transaction stopped part-way, otherwise the fresh state."""
+    snapshot = await graph.aget_state(config)
+    if snapshot.values and snapshot.next:
+        logger.info("Resuming %s at %s", config["configurable"]["thread_id"], ", ".join(snapshot.next))
+        return None
+    if snapshot.values:
+        # Finished but not cleaned up (e.g. stopped right after the last node): start over cleanly
+        await graph.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+    return state
+
+
+async def ainvoke_durable(state: AgentState) -> AgentState:
+    """agentic_system.ainvoke with checkpoints, resuming an interrupted run of the same transaction."""
+    graph = durable_system()
+    if graph is None:
+        return await agentic_system.ainvoke(state)
+    capture_id = state['transaction'].capture_id
+    config = thread_config(capture_id)
+    await graph.checkpointer.aclaim(capture_id)
+    final_state = await graph.ainvoke(await _run_input(graph, state, config), config)
+    await graph.checkpointer.adelete_thread(capture_id)
+    return final_state
+
+
+async def astream_durable(state: AgentState) -> AsyncIterator[Tuple[str, dict]]:
+    """astream_deltas with checkpoints; a resumed run only streams the nodes still to run."""
+    graph = durable_system()
+    if graph is None:
+        async for node, delta in astream_deltas(state):
+            yield node, delta
+        return
+    capture_id = state['transaction'].capture_id
+    config = thread_config(capture_id)
+    await graph.checkpointer.aclaim(capture_id)
+    async for node, delta in astream_deltas(await _run_input(graph, state, config), graph, config):
+        if node == END:
+            await graph.checkpointer.adelete_thread(capture_id)
+        yield node, delta
+
+
+def interrupted_transactions() -> List[Transaction]:
+    """Transactions whose runs stopped part-way in a process that is gone, leased to this process to resume."""
+    graph = durable_system()
+    if graph is None:
+        return []
+    transactions = []
+    for thread_id in graph.checkpointer.abandoned_thread_ids():
+        # Another starting process may have taken it first
+        if not graph.checkpointer.claim(thread_id, take_over=False):
+            continue
+        snapshot = graph.get_state(thread_config(thread_id))
+        if snapshot.values.get('transaction') is not None:
+            transactions.append(snapshot.values['transaction'])
+        else:
+            graph.checkpointer.delete_thread(thread_id)
+    return transactions
+
+
+def discard_run(capture_id: str) -> None:
+    """Drops a transaction's checkpoints, e.g. when its result turned out to be stored already."""
+    graph = durable_system()
+    if graph is not None:
+        graph.checkpointer.delete_thread(capture_id)
+
+
+def renew_run_leases() -> None:
+    """Confirms the runs this process holds are still alive; called periodically while the app runs."""
+    graph = durable_system()
+    if graph is not None:
+        graph.checkpointer.renew()
+
+
+def release_runs() -> None:
+    """Hands this process's unfinished runs over to the next process that starts."""
+    graph = durable_system()
+    if graph is not None:
+        graph.checkpointer.release()
+
+
+def compact_checkpoints() -> None:
+    graph = durable_system()
+    if graph is not None:
+        graph.checkpointer.compact()
+
+
+def checkpoint_stats() -> dict:
+    graph = durable_system()
+    return graph.checkpointer.stats() if graph is not None else {"unfinished_runs": 0, "checkpoints": 0}
@@ -1,29 +1,228 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.core.config import GOOGLE_API_KEY, GEMINI_MODEL
+from app.core.batching import MicroBatcher, format_batch, get_batcher
+from app.core.cache import verdict_cache, verdict_key
+from app.core.cascade import VERDICT_FORMAT, ModelCascade
+from app.core.config import (
+    GEMINI_MODEL, FRAUD_CASCADE_MODELS, PAYLOAD_MAX_ID_CHARS, PAYLOAD_MAX_TEXT_CHARS, PAYLOAD_TOKEN_BUDGET, FRAUD_SCORE_ENABLED, FRAUD_SCORE_MIN_SAMPLES, FRAUD_SCORE_PASS_THRESHOLD,
+    FRAUD_SCORE_FAIL_THRESHOLD, FRAUD_SCORE_METADATA_KEYS, FRAUD_SCORE_MAX_KEYS, VELOCITY_FIELDS,
+    VELOCITY_MAX_KEYS, VELOCITY_LIMITS
+)
+from app.core.fraud_scoring import ESCALATE, FAIL, PASS, FraudAssessment, FraudScorer
+from app.core.llm import chat_model
+from app.core.metrics import DECISIONS
+from app.core.payloads import PayloadEncoder
+from app.core.resilience import DegradedError, guarded_call
 from app.core.state import AgentState
+from app.core.velocity import VelocityStore, describe_velocity, exceeded_limits
+from app.models.database import SessionLocal
+
+# Deterministic screen used when the model can't be reached, as in demo_workflow.py
+FALLBACK_AMOUNT_LIMIT = 10000
+FALLBACK_SUSPICIOUS_DEVICE_PREFIX = "suspicious"
+# Marks verdicts of that screen in the history, which is how rescoring tells them from model or score verdicts
+FALLBACK_CHECK = "rule-based check"
+
+# Bump whenever the prompt changes so cached verdicts from the old prompt are ignored
+PROMPT_VERSION = "5"
 
 prompt = ChatPromptTemplate.from_messages(
-    [("system", "You are a fraud detection expert. Your task is to analyze the provided transaction data for any signs of fraudulent activity. Consider factors like transaction amount, frequency, and metadata. Based on your analysis, decide if the transaction is fraudulent. Respond with only 'yes' or 'no'."),
+    [("system", "You are a fraud detection expert. Your task is to analyze the provided transaction data for any signs of fraudulent activity. Consider factors like transaction amount relative to the provided baseline, the provided velocity counts, and metadata. Based on your analysis, decide if the transaction is fraudulent ('yes') or not ('no') and give your confidence in that from 0 to 1. " + VERDICT_FORMAT),
      ("human", "Here is the transaction data:\n\n{transaction_json}")]
 )
 
-llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, google_api_key=GOOGLE_API_KEY)
+batch_prompt = ChatPromptTemplate.from_messages(
+    [("system", "You are a fraud detection expert. Your task is to analyze each of the provided transactions for any signs of fraudulent activity. Consider factors like transaction amount relative to the provided baseline, the provided velocity counts, and metadata. For every transaction answer on its own line in the form '<number>: yes' if it is fraudulent, otherwise '<number>: no'."),
+     ("human", "Here are the transactions:\n\n{transactions_json}")]
+)
+
+llm = chat_model(GEMINI_MODEL, agent="fraud_detection")
 
 fraud_detection_agent = prompt | llm
+batch_fraud_detection_agent = batch_prompt | llm
 
-def run_fraud_detection_agent(state: AgentState) -> AgentState:
-    """Runs the fraud detection agent to analyze the transaction."""
-    transaction_json = state['transaction'].model_dump_json(indent=2)
-    response = fraud_detection_agent.invoke({"transaction_json": transaction_json})
-    
-    is_fraudulent = response.content.strip().lower() == 'yes'
+# Cheaper models answer first and GEMINI_MODEL (fraud_detection_agent) only gets the questions they aren't sure about;
+# batched questions go straight to GEMINI_MODEL
+cascade = ModelCascade("fraud_detection", prompt, FRAUD_CASCADE_MODELS)
+
+# Single and batched requests take very different times, so each gets its own deadline/hedging calibration
+guard = guarded_call("fraud_detection")
+batch_guard = guarded_call("fraud_detection")
+
+fraud_scorer = FraudScorer(
+    metadata_keys=FRAUD_SCORE_METADATA_KEYS,
+    min_samples=FRAUD_SCORE_MIN_SAMPLES,
+    pass_threshold=FRAUD_SCORE_PASS_THRESHOLD,
+    fail_threshold=FRAUD_SCORE_FAIL_THRESHOLD,
+    max_keys=FRAUD_SCORE_MAX_KEYS
+)
+
+velocity_store = VelocityStore(fields=VELOCITY_FIELDS, max_keys=VELOCITY_MAX_KEYS)
+
+# Ids carry no fraud signal (velocity counts cover repeats), so they are left out; codes are normalized
+payload_encoder = PayloadEncoder(
+    "fraud_detection", ("status", "amount", "metadata", "createdAt"), normalize=True,
+    max_id_chars=PAYLOAD_MAX_ID_CHARS, max_text_chars=PAYLOAD_MAX_TEXT_CHARS, token_budget=PAYLOAD_TOKEN_BUDGET
+)
+
+def _ask(details: str) -> bool:
+    inputs = {"transaction_json": details}
+    verdict = cascade.ask_cheap(inputs)
+    if verdict is None:
+        verdict = cascade.final(guard.call_sync(lambda: fraud_detection_agent.invoke(inputs)).content)
+    return verdict.answer
+
+async def _aask(details: str) -> bool:
+    inputs = {"transaction_json": details}
+    verdict = await cascade.aask_cheap(inputs)
+    if verdict is None:
+        verdict = cascade.final((await guard.call(lambda: fraud_detection_agent.ainvoke(inputs))).content)
+    return verdict.answer
+
+async def _aask_batch(details: list) -> str:
+    response = await batch_guard.call(lambda: batch_fraud_detection_agent.ainvoke({"transactions_json": format_batch(details)}))
+    return response.content
+
+def make_batcher(max_batch_size: int, max_wait: float) -> MicroBatcher:
+    """Creates a micro-batcher that screens several transactions per LLM request."""
+    return MicroBatcher(_aask_batch, _aask, max_batch_size=max_batch_size, max_wait=max_wait, name="fraud_detection")
+
+def warm_fraud_scorer() -> int:
+    """Rebuilds the local scoring baselines from the transactions table."""
+    if not FRAUD_SCORE_ENABLED:
+        return 0
+    db = SessionLocal()
+    try:
+        return fraud_scorer.rebuild_from_db(db)
+    finally:
+        db.close()
+
+def warm_velocity_store() -> int:
+    """Rebuilds the velocity counters from the last day of transactions."""
+    db = SessionLocal()
+    try:
+        return velocity_store.rebuild_from_db(db)
+    finally:
+        db.close()
+
+def _prescore(state: AgentState, speculative: bool = False) -> FraudAssessment:
+    """
+    Scores the transaction locally and records its score and velocity counts in the state. Velocity
+    counts each capture id once, so resumed or retried runs see the same counts as the first one.
+    """
+    # A speculative run only previews the counts; the transaction is counted once its verdict is kept
+    state['velocity'] = (velocity_store.preview if speculative else velocity_store.observe)(state['transaction'])
+    assessment = fraud_scorer.assess(state['transaction']) if FRAUD_SCORE_ENABLED else FraudAssessment(ESCALATE, None)
+    state['fraud_score'] = assessment.score
+
+    # An ordinary amount doesn't clear a device or card that is suddenly busy
+    if assessment.decision == PASS and exceeded_limits(state['velocity'], VELOCITY_LIMITS):
+        assessment.decision = ESCALATE
+    return assessment
+
+def _describe(state: AgentState, assessment: FraudAssessment, payload: str) -> str:
+    return (
+        f"{payload}\n\nAmount baseline: {assessment.describe()}"
+        f"\n\nVelocity: {describe_velocity(state['velocity'])}"
+    )
+
+def _learn(state: AgentState, speculative: bool = False) -> None:
+    """
+    Feeds transactions that weren't flagged back into the baselines, whichever path decided the verdict;
+    speculative runs wait for the join.
+    """
+    if FRAUD_SCORE_ENABLED and not speculative and not state['is_fraudulent']:
+        fraud_scorer.observe_transaction(state['transaction'])
+
+def record_fraud_detection(state: AgentState) -> None:
+    """Applies what a speculative run deferred once its verdict is kept: counts the transaction and learns from it."""
+    velocity_store.add(state['transaction'])
+    _learn(state)
+
+def _cache_key(state: AgentState, payload: str) -> str:
+    # Raw counts grow with every redelivery, so only which limits are exceeded is part of the key
+    exceeded = exceeded_limits(state['velocity'], VELOCITY_LIMITS)
+    return verdict_key("fraud_detection", PROMPT_VERSION, cascade.key, payload,
+                       context={"velocity_exceeded": {label: sorted(over) for label, over in exceeded.items()}})
+
+def _apply_verdict(state: AgentState, is_fraudulent: bool, source: str = None) -> AgentState:
     state['is_fraudulent'] = is_fraudulent
+    DECISIONS.inc(agent="fraud_detection", source="llm" if source is None else "cache" if source == "cached"
+                  else "fallback" if source.startswith("degraded") else "local")
     
-    history_message = f"Fraud Detection Agent: Transaction is {'fraudulent' if is_fraudulent else 'not fraudulent'}."
+    history_message = f"Fraud Detection Agent: Transaction is {'fraudulent' if is_fraudulent else 'not fraudulent'}{f' ({source})' if source else ''}."
     state['history'].append(history_message)
     
     if is_fraudulent:
         state['error_message'] = "Transaction flagged as potentially fraudulent."
 
     return state
+
+def _fallback_verdict(state: AgentState) -> bool:
+    """Rule-based verdict for when the model couldn't be used: large amounts, suspicious devices, busy keys."""
+    transaction = state['transaction']
+    device_id = str(transaction.transaction_metadata.get("device_id", ""))
+    return (
+        transaction.amount.value >= FALLBACK_AMOUNT_LIMIT
+        or device_id.startswith(FALLBACK_SUSPICIOUS_DEVICE_PREFIX)
+        or bool(exceeded_limits(state['velocity'], VELOCITY_LIMITS))
+    )
+
+def _apply_fallback(state: AgentState, reason: str, speculative: bool = False) -> AgentState:
+    _apply_verdict(state, _fallback_verdict(state), source=f"degraded: {reason}; {FALLBACK_CHECK}")
+    _learn(state, speculative)
+    return state
+
+def run_fraud_detection_agent(state: AgentState, speculative: bool = False) -> AgentState:
+    """
+    Runs the fraud detection agent to analyze the transaction. A speculative run leaves the
+    velocity counters and baselines alone; record_fraud_detection applies them if the verdict is kept.
+    """
+    assessment = _prescore(state, speculative)
+    if assessment.decision != ESCALATE:
+        _apply_verdict(state, assessment.decision == FAIL, source=f"local score {assessment.score:.2f}")
+        _learn(state, speculative)
+        return state
+
+    payload = payload_encoder.encode(state['transaction']).text
+    key = _cache_key(state, payload)
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        _apply_verdict(state, cached, source="cached")
+        _learn(state, speculative)
+        return state
+
+    try:
+        is_fraudulent = _ask(_describe(state, assessment, payload))
+    except DegradedError as e:
+        return _apply_fallback(state, e.reason, speculative)
+    verdict_cache.set(key, is_fraudulent)
+    _apply_verdict(state, is_fraudulent)
+    _learn(state, speculative)
+    return state
+
+async def arun_fraud_detection_agent(state: AgentState, speculative: bool = False) -> AgentState:
+    """Async variant of run_fraud_detection_agent that awaits the LLM instead of blocking."""
+    assessment = _prescore(state, speculative)
+    if assessment.decision != ESCALATE:
+        _apply_verdict(state, assessment.decision == FAIL, source=f"local score {assessment.score:.2f}")
+        _learn(state, speculative)
+        return state
+
+    payload = payload_encoder.encode(state['transaction']).text
+    key = _cache_key(state, payload)
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        _apply_verdict(state, cached, source="cached")
+        _learn(state, speculative)
+        return state
+
+    details = _describe(state, assessment, payload)
+    batcher = get_batcher("fraud_detection")
+    try:
+        is_fraudulent = await (batcher.submit(details) if batcher else _aask(details))
+    except DegradedError as e:
+        return _apply_fallback(state, e.reason, speculative)
+    verdict_cache.set(key, is_fraudulent)
+    _apply_verdict(state, is_fraudulent)
+    _learn(state, speculative)
+    return state
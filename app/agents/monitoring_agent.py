@@ -1,51 +1,179 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.core.config import GOOGLE_API_KEY, GEMINI_MODEL
+from app.core.batching import MicroBatcher, format_batch, get_batcher
+from app.core.cache import verdict_cache, verdict_key
+from app.core.cascade import VERDICT_FORMAT, ModelCascade
+from app.core.config import (
+    GEMINI_MODEL, PAYLOAD_MAX_ID_CHARS, PAYLOAD_MAX_TEXT_CHARS, PAYLOAD_TOKEN_BUDGET, VALIDATION_CASCADE_MODELS,
+    VALIDATION_LLM_RULES
+)
+from app.core.llm import chat_model
+from app.core.metrics import DECISIONS
+from app.core.payloads import PayloadEncoder
+from app.core.resilience import DegradedError, guarded_call
+from app.core.rules import RuleEngine, VALIDATION_RULES, rule_failure_message
 from app.core.state import AgentState
 
+# Bump whenever the prompt changes so cached verdicts from the old prompt are ignored
+PROMPT_VERSION = "3"
 
 prompt = ChatPromptTemplate.from_messages([
     ("system", """You are a transaction validation expert. Your task is to validate the provided transaction data. 
     Check for the following:
-    1. Required fields are present (captureId, requestId, chargeId, status, amount, metadata)
-    2. Status must be one of: PENDING, SUCCESS, FAILED
-    3. Amount must be a positive number
-    4. Currency must be a valid 3-letter currency code
-    5. Timestamps must be valid ISO 8601 format
+    {rules}
     
-    Respond with only 'yes' if all validations pass, otherwise 'no'.
-    """),
+    The verdict is 'yes' if all validations pass, otherwise 'no'. Give your confidence in it from 0 to 1.
+    """ + VERDICT_FORMAT),
     ("human", """Here is the transaction data:
     
     {transaction_json}
     
-    Based on the validation rules, is this transaction valid? Respond with only 'yes' or 'no'.""")
+    Based on the validation rules, is this transaction valid?""")
+])
+
+batch_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are a transaction validation expert. Your task is to validate each of the provided transactions. 
+    Check for the following:
+    {rules}
+    
+    For every transaction answer on its own line in the form '<number>: yes' if all validations pass, otherwise '<number>: no'.
+    """),
+    ("human", """Here are the transactions:
+    
+    {transactions_json}""")
 ])
 
-llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, google_api_key=GOOGLE_API_KEY)
+llm = chat_model(GEMINI_MODEL, agent="validation")
 
 validation_agent = prompt | llm
+batch_validation_agent = batch_prompt | llm
 
-def run_validation_agent(state: AgentState) -> AgentState:
-    """Runs the validation agent to check the transaction data."""
-    # First check the status field immediately
-    if state['transaction'].status == 'FAILURE':
+# Cheaper models answer first and GEMINI_MODEL (validation_agent) only gets the questions they aren't sure about;
+# batched questions go straight to GEMINI_MODEL
+cascade = ModelCascade("validation", prompt, VALIDATION_CASCADE_MODELS)
+
+# Single and batched requests take very different times, so each gets its own deadline/hedging calibration
+guard = guarded_call("validation")
+batch_guard = guarded_call("validation")
+
+rule_engine = RuleEngine(VALIDATION_RULES, llm_rules=VALIDATION_LLM_RULES)
+
+# Only the fields the LLM-judged rules look at; status and currency are sent as-is since their format is being judged
+payload_encoder = PayloadEncoder(
+    "validation", rule_engine.llm_rule_fields(),
+    max_id_chars=PAYLOAD_MAX_ID_CHARS, max_text_chars=PAYLOAD_MAX_TEXT_CHARS, token_budget=PAYLOAD_TOKEN_BUDGET
+)
+
+def _apply_rules(state: AgentState) -> bool:
+    """Applies the local rule engine and returns True if it already decided the transaction."""
+    # Mechanical rules are decided locally; only a failure or a configured fuzzy rule goes further
+    failed_rules = rule_engine.evaluate(state['transaction'])
+    state['validation_failures'] = failed_rules
+    if failed_rules or not rule_engine.llm_rules:
+        DECISIONS.inc(agent="validation", source="rules")
+    if failed_rules:
         state['is_valid'] = False
-        state['error_message'] = "Transaction status is FAILURE. Marking as invalid."
-        state['history'].append("Validation Agent: Transaction status is FAILURE. Marking as invalid.")
-        return state
-        
-    # If status is not FAILURE, proceed with full validation
-    transaction_json = state['transaction'].model_dump_json(indent=2)
-    response = validation_agent.invoke({"transaction_json": transaction_json})
-    
-    is_valid = response.content.strip().lower() == 'yes'
+        state['error_message'] = rule_failure_message(failed_rules)
+        state['history'].append(f"Validation Agent: Transaction is invalid (failed rules: {', '.join(failed_rules)}).")
+        return True
+
+    if not rule_engine.llm_rules:
+        state['is_valid'] = True
+        state['history'].append("Validation Agent: Transaction is valid.")
+        return True
+
+    return False
+
+def _ask(transaction_json: str) -> bool:
+    inputs = {"rules": rule_engine.describe_llm_rules(), "transaction_json": transaction_json}
+    verdict = cascade.ask_cheap(inputs)
+    if verdict is None:
+        verdict = cascade.final(guard.call_sync(lambda: validation_agent.invoke(inputs)).content)
+    return verdict.answer
+
+async def _aask(transaction_json: str) -> bool:
+    inputs = {"rules": rule_engine.describe_llm_rules(), "transaction_json": transaction_json}
+    verdict = await cascade.aask_cheap(inputs)
+    if verdict is None:
+        verdict = cascade.final((await guard.call(lambda: validation_agent.ainvoke(inputs))).content)
+    return verdict.answer
+
+async def _aask_batch(transaction_jsons: list) -> str:
+    response = await batch_guard.call(lambda: batch_validation_agent.ainvoke({
+        "rules": rule_engine.describe_llm_rules(),
+        "transactions_json": format_batch(transaction_jsons)
+    }))
+    return response.content
+
+def make_batcher(max_batch_size: int, max_wait: float) -> MicroBatcher:
+    """Creates a micro-batcher that validates several transactions per LLM request."""
+    return MicroBatcher(_aask_batch, _aask, max_batch_size=max_batch_size, max_wait=max_wait, name="validation")
+
+def _cache_key(payload: str) -> str:
+    rules = ",".join(rule.name for rule in rule_engine.llm_rules)
+    return verdict_key("validation", f"{PROMPT_VERSION}:{rules}", cascade.key, payload)
+
+def _apply_verdict(state: AgentState, is_valid: bool, cached: bool = False) -> AgentState:
     state['is_valid'] = is_valid
+    DECISIONS.inc(agent="validation", source="cache" if cached else "llm")
     
-    history_message = f"Validation Agent: Transaction is {'valid' if is_valid else 'invalid'}."
+    history_message = f"Validation Agent: Transaction is {'valid' if is_valid else 'invalid'}{' (cached)' if cached else ''}."
     state['history'].append(history_message)
     
     if not is_valid:
+        state['validation_failures'] = [rule.name for rule in rule_engine.llm_rules]
         state['error_message'] = "Transaction failed validation checks."
 
     return state
+
+def _apply_fallback(state: AgentState, reason: str) -> AgentState:
+    """Decides the LLM-judged rules with their local checks when the model couldn't be used."""
+    failed_rules = rule_engine.evaluate_llm_rules(state['transaction'])
+    state['is_valid'] = not failed_rules
+    DECISIONS.inc(agent="validation", source="fallback")
+
+    state['history'].append(
+        f"Validation Agent: Transaction is {'invalid' if failed_rules else 'valid'} (degraded: {reason}; rules checked locally)."
+    )
+
+    if failed_rules:
+        state['validation_failures'] = failed_rules
+        state['error_message'] = rule_failure_message(failed_rules)
+
+    return state
+
+def run_validation_agent(state: AgentState) -> AgentState:
+    """Runs the validation agent to check the transaction data."""
+    if _apply_rules(state):
+        return state
+
+    payload = payload_encoder.encode(state['transaction']).text
+    key = _cache_key(payload)
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        return _apply_verdict(state, cached, cached=True)
+
+    try:
+        is_valid = _ask(payload)
+    except DegradedError as e:
+        return _apply_fallback(state, e.reason)
+    verdict_cache.set(key, is_valid)
+    return _apply_verdict(state, is_valid)
+
+async def arun_validation_agent(state: AgentState) -> AgentState:
+    """Async variant of run_validation_agent that awaits the LLM instead of blocking."""
+    if _apply_rules(state):
+        return state
+
+    payload = payload_encoder.encode(state['transaction']).text
+    key = _cache_key(payload)
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        return _apply_verdict(state, cached, cached=True)
+
+    batcher = get_batcher("validation")
+    try:
+        is_valid = await (batcher.submit(payload) if batcher else _aask(payload))
+    except DegradedError as e:
+        return _apply_fallback(state, e.reason)
+    verdict_cache.set(key, is_valid)
+    return _apply_verdict(state, is_valid)
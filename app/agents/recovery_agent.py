@@ -1,19 +1,26 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.core.config import GOOGLE_API_KEY, GEMINI_MODEL
+from app.core.config import GEMINI_MODEL, RECOVERY_SUMMARY_MODE, RECOVERY_SUMMARY_REFRESH
+from app.core.llm import chat_model
+from app.core.resilience import guarded_call
 from app.core.state import AgentState
+from app.core.summaries import Summary, SummaryStore
 
 prompt = ChatPromptTemplate.from_messages(
     [("system", "You are a transaction fulfillment and resolution expert. Based on the transaction status, your job is to either process the fulfillment or flag it for manual review. Generate a brief summary of the action taken."),
      ("human", "The transaction has been processed with the following status:\n\nValidation: {validation_status}\nFraud Check: {fraud_status}\n\nProvide a summary of the next steps.")]
 )
 
-llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, google_api_key=GOOGLE_API_KEY)
+llm = chat_model(GEMINI_MODEL, agent="recovery")
 
 recovery_agent = prompt | llm
 
-def run_recovery_agent(state: AgentState) -> AgentState:
-    """Runs the recovery agent to handle fulfillment or resolution."""
+# A failed or late summary raises DegradedError, which the summary store answers with its fallback text
+guard = guarded_call("recovery")
+
+summary_store = SummaryStore(mode=RECOVERY_SUMMARY_MODE, refresh_after=RECOVERY_SUMMARY_REFRESH)
+
+def _resolve(state: AgentState) -> dict:
+    """Sets the fulfillment status and returns the prompt input describing it."""
     if state.get('is_valid') and not state.get('is_fraudulent'):
         # Simulate fulfillment
         state['fulfillment_status'] = 'SUCCESS'
@@ -24,13 +31,34 @@ def run_recovery_agent(state: AgentState) -> AgentState:
         validation_status = 'Invalid' if not state.get('is_valid') else 'Valid'
         fraud_status = 'Fraudulent' if state.get('is_fraudulent') else 'Not Fraudulent'
 
-    response = recovery_agent.invoke({
+    return {
         "validation_status": validation_status,
         "fraud_status": fraud_status
-    })
+    }
+
+def _generate_summary(inputs: dict) -> str:
+    return guard.call_sync(lambda: recovery_agent.invoke(inputs)).content.strip()
+
+async def _agenerate_summary(inputs: dict) -> str:
+    response = await guard.call(lambda: recovery_agent.ainvoke(inputs))
+    return response.content.strip()
 
-    summary = response.content.strip()
-    history_message = f"Recovery Agent: {summary}"
+def _apply_summary(state: AgentState, summary: Summary) -> AgentState:
+    history_message = f"Recovery Agent: {summary.text}{f' (degraded: {summary.degraded})' if summary.degraded else ''}"
     state['history'].append(history_message)
 
     return state
+
+def run_recovery_agent(state: AgentState) -> AgentState:
+    """Runs the recovery agent to handle fulfillment or resolution."""
+    summary = summary_store.summarize(_resolve(state), _generate_summary)
+    return _apply_summary(state, summary)
+
+async def arun_recovery_agent(state: AgentState) -> AgentState:
+    """Async variant of run_recovery_agent that awaits the LLM instead of blocking."""
+    summary = await summary_store.asummarize(_resolve(state), _agenerate_summary)
+    return _apply_summary(state, summary)
+
+async def warm_recovery_summaries() -> None:
+    """Pre-generates the memoized summaries so the first requests don't pay for them."""
+    await summary_store.awarm(_agenerate_summary)
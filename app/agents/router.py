@@ -1,8 +1,10 @@
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
+from app.core.config import GRAPH_TOPOLOGY
 from app.core.state import AgentState
-from app.agents.monitoring_agent import run_validation_agent
-from app.agents.failure_detection_agent import run_fraud_detection_agent
-from app.agents.recovery_agent import run_recovery_agent
+from app.core.tracing import traced_node
+from app.agents.monitoring_agent import run_validation_agent, arun_validation_agent
+from app.agents.failure_detection_agent import run_fraud_detection_agent, arun_fraud_detection_agent, record_fraud_detection
+from app.agents.recovery_agent import run_recovery_agent, arun_recovery_agent
 
 def should_continue_after_validation(state: AgentState):
     """Determines the next step after the validation agent has run."""
@@ -10,29 +12,95 @@ def should_continue_after_validation(state: AgentState):
         return "run_fraud_detection_agent"
     return "run_recovery_agent"
 
-# Create the graph
-workflow = StateGraph(AgentState)
+def _detach(state: AgentState) -> AgentState:
+    """Copies the state so a speculative branch can't touch what validation writes."""
+    return AgentState(**{**state, 'history': []})
 
-# Add nodes
-workflow.add_node("run_validation_agent", run_validation_agent)
-workflow.add_node("run_fraud_detection_agent", run_fraud_detection_agent)
-workflow.add_node("run_recovery_agent", run_recovery_agent)
+def _speculative_result(before: AgentState, after: AgentState) -> dict:
+    changes = {key: value for key, value in after.items() if key != 'history' and before.get(key) != value}
+    changes['history'] = after['history']
+    return changes
 
-# Set the entrypoint
-workflow.set_entry_point("run_validation_agent")
+def run_speculative_fraud_detection(state: AgentState) -> dict:
+    """Runs fraud detection alongside validation and parks its result, and its side effects, until the join."""
+    before = _detach(state)
+    result = run_fraud_detection_agent(_detach(state), speculative=True)
+    return {'speculative_fraud': _speculative_result(before, result)}
 
-# Add conditional edges
-workflow.add_conditional_edges(
-    "run_validation_agent",
-    should_continue_after_validation,
-    {
-        "run_fraud_detection_agent": "run_fraud_detection_agent",
-        "run_recovery_agent": "run_recovery_agent"
-    }
-)
+async def arun_speculative_fraud_detection(state: AgentState) -> dict:
+    """Async variant of run_speculative_fraud_detection."""
+    before = _detach(state)
+    result = await arun_fraud_detection_agent(_detach(state), speculative=True)
+    return {'speculative_fraud': _speculative_result(before, result)}
 
-workflow.add_edge('run_fraud_detection_agent', 'run_recovery_agent')
-workflow.add_edge('run_recovery_agent', END)
+def join_fraud_detection(state: AgentState) -> AgentState:
+    """
+    Keeps the speculative fraud verdict if validation passed and discards it otherwise. Only a kept
+    verdict counts towards the velocity counters and the amount baselines.
+    """
+    speculative = state.get('speculative_fraud') or {}
+    state['speculative_fraud'] = None
+    if not state.get('is_valid'):
+        if speculative:
+            state['history'].append("Fraud Detection Agent: Speculative result discarded because validation failed.")
+        return state
+
+    for key, value in speculative.items():
+        if key == 'history':
+            state['history'].extend(value)
+        else:
+            state[key] = value
+    if speculative:
+        record_fraud_detection(state)
+    return state
+
+def build_workflow(topology: str = "serial") -> StateGraph:
+    """
+    Builds the agent graph.
+
+    "serial" runs validation, then fraud detection (only for valid transactions), then recovery.
+    "speculative" runs fraud detection concurrently with validation and joins before recovery,
+    trading a wasted fraud check on invalid transactions for a shorter critical path.
+    """
+    if topology not in ("serial", "speculative"):
+        raise ValueError(f"Unknown graph topology: {topology}")
+
+    workflow = StateGraph(AgentState)
+
+    # Add nodes; each has a blocking and an async implementation so both invoke and ainvoke work,
+    # and is traced so its timing lands in the metrics and the transaction's state
+    workflow.add_node("run_validation_agent", traced_node("run_validation_agent", run_validation_agent, arun_validation_agent))
+    workflow.add_node("run_recovery_agent", traced_node("run_recovery_agent", run_recovery_agent, arun_recovery_agent))
+
+    if topology == "speculative":
+        workflow.add_node("run_fraud_detection_agent", traced_node("run_fraud_detection_agent", run_speculative_fraud_detection, arun_speculative_fraud_detection))
+        workflow.add_node("join_fraud_detection", traced_node("join_fraud_detection", join_fraud_detection))
+
+        # Fan out from the start and wait for both branches before recovery
+        workflow.add_edge(START, "run_validation_agent")
+        workflow.add_edge(START, "run_fraud_detection_agent")
+        workflow.add_edge(["run_validation_agent", "run_fraud_detection_agent"], "join_fraud_detection")
+        workflow.add_edge("join_fraud_detection", "run_recovery_agent")
+    else:
+        workflow.add_node("run_fraud_detection_agent", traced_node("run_fraud_detection_agent", run_fraud_detection_agent, arun_fraud_detection_agent))
+
+        # Set the entrypoint
+        workflow.set_entry_point("run_validation_agent")
+
+        # Add conditional edges
+        workflow.add_conditional_edges(
+            "run_validation_agent",
+            should_continue_after_validation,
+            {
+                "run_fraud_detection_agent": "run_fraud_detection_agent",
+                "run_recovery_agent": "run_recovery_agent"
+            }
+        )
+
+        workflow.add_edge('run_fraud_detection_agent', 'run_recovery_agent')
+
+    workflow.add_edge('run_recovery_agent', END)
+    return workflow
 
 # Compile the graph
-agentic_system = workflow.compile()
+agentic_system = build_workflow(GRAPH_TOPOLOGY).compile()
@@ -0,0 +1,48 @@
+"""Streaming API around agentic_system.
+
+Yields what each node changed as soon as it finishes, so callers can act on an early
+verdict (e.g. a validation reject) without waiting for the rest of the graph.
+"""
+from typing import AsyncIterator, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END
+from langgraph.pregel import Pregel
+
+from app.agents.router import agentic_system
+from app.core.state import AgentState
+
+
+def state_delta(before: AgentState, update: dict) -> dict:
+    """The part of a node's update that differs from the state it started from.
+
+    History and timings only grow, so just their new entries are included; the transaction never changes.
+    """
+    delta = {}
+    for key, value in update.items():
+        if key == 'transaction' or before.get(key) == value:
+            continue
+        if key == 'history':
+            previous = before.get('history') or []
+            value = value[len(previous):] if value[:len(previous)] == previous else value
+        elif key == 'timings':
+            value = {node: ms for node, ms in value.items() if node not in (before.get('timings') or {})}
+        delta[key] = value
+    return delta
+
+
+async def astream_deltas(state: Optional[AgentState], graph: Pregel = agentic_system,
+                         config: Optional[RunnableConfig] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """Runs `state` through the graph, yielding (node, delta) as nodes finish and (END, final state) last.
+
+    A checkpointed graph can be given None to resume the run in `config`'s thread.
+    """
+    current = state or {}
+    async for mode, chunk in graph.astream(state, config, stream_mode=["updates", "values"]):
+        if mode == "values":
+            # Nodes append to the history in place, so keep a copy to diff the next step against
+            current = {**chunk, 'history': list(chunk.get('history') or [])}
+            continue
+        for node, update in chunk.items():
+            yield node, state_delta(current, update or {})
+    yield END, current
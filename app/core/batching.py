@@ -0,0 +1,115 @@
+"""LLM micro-batching.
+
+While a batch run is active, agents hand their LLM questions to a MicroBatcher instead of
+calling the chain directly. The batcher collects questions from concurrently running
+graphs and sends them as one multi-transaction prompt, then routes each parsed verdict
+back to the graph that asked for it.
+"""
+import asyncio
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.metrics import LLM_BATCH_SIZE, LLM_QUEUE_TIME
+
+logger = logging.getLogger(__name__)
+
+_VERDICT_LINE = re.compile(r"^\s*\[?(\d+)\]?\s*[:.)\-]\s*(yes|no)\b", re.IGNORECASE | re.MULTILINE)
+
+_active_batchers: ContextVar[Optional[Dict[str, "MicroBatcher"]]] = ContextVar("active_batchers", default=None)
+
+
+def parse_batch_verdicts(content: str, count: int) -> Dict[int, bool]:
+    """Parses '<n>: yes|no' lines into {index: verdict} for indexes 0..count-1."""
+    verdicts = {}
+    for number, answer in _VERDICT_LINE.findall(content):
+        index = int(number) - 1
+        if 0 <= index < count and index not in verdicts:
+            verdicts[index] = answer.lower() == "yes"
+    return verdicts
+
+
+def format_batch(items: List[str]) -> str:
+    return "\n\n".join(f"Transaction {i}:\n{item}" for i, item in enumerate(items, 1))
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item LLM questions into multi-item prompts."""
+
+    def __init__(self, send_batch: Callable[[List[str]], Awaitable[str]],
+                 send_one: Callable[[str], Awaitable[bool]],
+                 max_batch_size: int = 20, max_wait: float = 0.02, name: str = ""):
+        self._send_batch = send_batch
+        self._send_one = send_one
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.requests = 0
+        self.items = 0
+
+    async def submit(self, item: str) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, loop.time()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            now = asyncio.get_running_loop().time()
+            for _, _, queued_at in batch:
+                LLM_QUEUE_TIME.observe(now - queued_at, agent=self.name)
+            LLM_BATCH_SIZE.observe(len(batch), agent=self.name)
+            asyncio.ensure_future(self._dispatch([(item, future) for item, future, _ in batch]))
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        items = [item for item, _ in batch]
+        try:
+            if len(items) == 1:
+                verdicts = {0: await self._send_one(items[0])}
+                self.requests += 1
+            else:
+                content = await self._send_batch(items)
+                self.requests += 1
+                verdicts = parse_batch_verdicts(content, len(items))
+                # Ask individually about anything the model skipped or garbled
+                for index in set(range(len(items))) - set(verdicts):
+                    logger.warning("No verdict for item %d of %d in batch response, retrying singly", index + 1, len(items))
+                    verdicts[index] = await self._send_one(items[index])
+                    self.requests += 1
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.items += len(items)
+        for index, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(verdicts[index])
+
+
+def get_batcher(agent: str) -> Optional[MicroBatcher]:
+    """Returns the batcher for an agent if the current task is part of a batch run."""
+    batchers = _active_batchers.get()
+    return batchers.get(agent) if batchers else None
+
+
+@contextmanager
+def batching(batchers: Dict[str, MicroBatcher]):
+    token = _active_batchers.set(batchers)
+    try:
+        yield batchers
+    finally:
+        _active_batchers.reset(token)
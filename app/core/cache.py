@@ -0,0 +1,166 @@
+"""Verdict cache so replayed transactions don't pay for the same LLM decision twice."""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+
+from app.core.codec import canonical_json
+from app.core.config import VERDICT_CACHE_DB, VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL
+from app.core.metrics import CACHE_LOOKUPS
+from app.models.schemas import Transaction
+
+
+def normalize_transaction(transaction: Transaction) -> dict:
+    """Returns the transaction fields in a canonical form (trimmed, upper-cased codes)."""
+    return {
+        "capture_id": transaction.capture_id.strip(),
+        "request_id": transaction.request_id.strip(),
+        "charge_id": transaction.charge_id.strip(),
+        "status": transaction.status.strip().upper(),
+        "amount": transaction.amount.value,
+        "currency": transaction.amount.currency.strip().upper(),
+        "metadata": transaction.transaction_metadata,
+        "created_at": transaction.created_at,
+        "updated_at": transaction.updated_at,
+    }
+
+
+def verdict_key(agent: str, prompt_version: str, model: str, transaction: Union[Transaction, str],
+                context: Optional[dict] = None) -> str:
+    """Hashes everything that can change an agent's verdict into a cache key.
+
+    `transaction` is either the transaction itself or the canonical payload an agent sends for it.
+    """
+    payload = {
+        "agent": agent,
+        "prompt_version": prompt_version,
+        "model": model,
+        "transaction": transaction if isinstance(transaction, str) else normalize_transaction(transaction),
+        "context": context,
+    }
+    return hashlib.sha256(canonical_json(payload).encode("utf-8")).hexdigest()
+
+
+class SqliteVerdictStore:
+    """Second cache tier that survives restarts and is shared by workers on the same host."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[bool]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT verdict FROM verdicts WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return None if row is None else bool(row[0])
+
+    def set(self, key: str, verdict: bool, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, expires_at) VALUES (?, ?, ?)",
+                (key, int(verdict), time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM verdicts WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM verdicts")
+            self._conn.commit()
+
+
+class VerdictCache:
+    """In-process LRU cache with per-entry TTL, optionally backed by a SqliteVerdictStore."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600.0, store: Optional[SqliteVerdictStore] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = store
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+
+    def get(self, key: str) -> Optional[bool]:
+        """Returns the cached verdict or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                verdict, expires_at = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc(result="hit")
+                    return verdict
+                del self._entries[key]
+
+        verdict = self.store.get(key) if self.store is not None else None
+        with self._lock:
+            if verdict is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self.hits += 1
+            self.store_hits += 1
+            CACHE_LOOKUPS.inc(result="store_hit")
+            self._remember(key, verdict)
+        return verdict
+
+    def set(self, key: str, verdict: bool) -> None:
+        with self._lock:
+            self._remember(key, verdict)
+        if self.store is not None:
+            self.store.set(key, verdict, self.ttl)
+
+    def _remember(self, key: str, verdict: bool) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (verdict, self._clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.store_hits = 0
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "store_hits": self.store_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "persistent": self.store is not None,
+            }
+
+
+verdict_cache = VerdictCache(
+    max_size=VERDICT_CACHE_SIZE,
+    ttl=VERDICT_CACHE_TTL,
+    store=SqliteVerdictStore(VERDICT_CACHE_DB) if VERDICT_CACHE_DB else None,
+)
@@ -0,0 +1,163 @@
+"""Model cascade for the agents' yes/no verdicts.
+
+An agent's question goes to cheaper, faster models first, which answer with a structured
+verdict and a stated confidence. The first answer at or above the confidence threshold is
+used; a less confident, unreadable or unavailable answer escalates to the next tier and
+finally to GEMINI_MODEL, whose verdict is final. Each cheaper tier has its own circuit
+breaker, so a failing small model is skipped instead of tripping the breaker that guards
+GEMINI_MODEL.
+
+Answers per tier and outcome are counted in `llm_cascade_answers_total`; together with the
+per-model latency and spend metrics they give each tier's escalation rate, latency and cost,
+summarised by cascade_stats().
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+
+from app.core.config import CASCADE_CONFIDENCE_THRESHOLD, GEMINI_MODEL
+from app.core.llm import chat_model
+from app.core.metrics import CASCADE_ANSWERS, LLM_COST, LLM_DEGRADED, LLM_DURATION
+from app.core.resilience import DegradedError, GuardedCall, guarded_call, make_breaker
+
+# Appended to single-transaction prompts (braces escaped for ChatPromptTemplate)
+VERDICT_FORMAT = 'Respond with only a JSON object: {{"verdict": "yes" or "no", "confidence": <number from 0 to 1>}}.'
+
+ACCEPTED, LOW_CONFIDENCE, UNPARSEABLE, UNAVAILABLE = "accepted", "low_confidence", "unparseable", "unavailable"
+OUTCOMES = (ACCEPTED, LOW_CONFIDENCE, UNPARSEABLE, UNAVAILABLE)
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_BARE_ANSWER = re.compile(r"^\W*(yes|no)\b", re.IGNORECASE)
+_ANSWERS = {"yes": True, "true": True, "no": False, "false": False}
+
+_cascades: List["ModelCascade"] = []
+
+
+@dataclass(frozen=True)
+class Verdict:
+    answer: bool
+    # The model's stated confidence in [0, 1]; None for a bare yes/no
+    confidence: Optional[float] = None
+
+
+def parse_verdict(content: str) -> Optional[Verdict]:
+    """Reads a '{"verdict": "yes", "confidence": 0.9}' answer (code fences and prose around it are ignored)
+    or a bare yes/no; None if the answer is neither."""
+    match = _JSON_OBJECT.search(content)
+    if match:
+        try:
+            data = json.loads(match.group())
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            answer = _ANSWERS.get(str(data.get("verdict", "")).strip().lower())
+            if answer is None:
+                return None
+            try:
+                confidence = min(max(float(data["confidence"]), 0.0), 1.0)
+            except (KeyError, TypeError, ValueError):
+                confidence = None
+            return Verdict(answer, confidence)
+    match = _BARE_ANSWER.match(content)
+    return Verdict(match.group(1).lower() == "yes") if match else None
+
+
+@dataclass
+class Tier:
+    model: str
+    chain: Runnable
+    guard: GuardedCall
+
+
+class ModelCascade:
+    """The cheaper tiers of one agent's question, and the reading of the final model's answer.
+
+    The agent asks GEMINI_MODEL itself (through its own chain and guard) when ask_cheap() returns None.
+    """
+
+    def __init__(self, agent: str, prompt: ChatPromptTemplate, models: Sequence[str],
+                 threshold: float = CASCADE_CONFIDENCE_THRESHOLD, final_model: str = GEMINI_MODEL):
+        self.agent = agent
+        self.threshold = threshold
+        self.final_model = final_model
+        self.tiers = [
+            Tier(model, prompt | chat_model(model, agent=agent), guarded_call(agent, make_breaker()))
+            for model in dict.fromkeys(models) if model != final_model
+        ]
+        _cascades.append(self)
+
+    @property
+    def key(self) -> str:
+        """Where verdicts come from, for verdict cache keys: the models asked and the confidence threshold."""
+        if not self.tiers:
+            return self.final_model
+        return ">".join([tier.model for tier in self.tiers] + [self.final_model]) + f"@{self.threshold:g}"
+
+    def _accept(self, tier: Tier, content: str) -> Optional[Verdict]:
+        verdict = parse_verdict(content)
+        if verdict is None:
+            outcome = UNPARSEABLE
+        elif verdict.confidence is None or verdict.confidence < self.threshold:
+            outcome = LOW_CONFIDENCE
+        else:
+            outcome = ACCEPTED
+        CASCADE_ANSWERS.inc(agent=self.agent, model=tier.model, outcome=outcome)
+        return verdict if outcome == ACCEPTED else None
+
+    def ask_cheap(self, inputs: dict) -> Optional[Verdict]:
+        """The first confident verdict of the cheaper tiers, or None to escalate to the final model."""
+        for tier in self.tiers:
+            try:
+                message = tier.guard.call_sync(lambda: tier.chain.invoke(inputs))
+            except DegradedError:
+                CASCADE_ANSWERS.inc(agent=self.agent, model=tier.model, outcome=UNAVAILABLE)
+                continue
+            verdict = self._accept(tier, message.content)
+            if verdict is not None:
+                return verdict
+        return None
+
+    async def aask_cheap(self, inputs: dict) -> Optional[Verdict]:
+        for tier in self.tiers:
+            try:
+                message = await tier.guard.call(lambda: tier.chain.ainvoke(inputs))
+            except DegradedError:
+                CASCADE_ANSWERS.inc(agent=self.agent, model=tier.model, outcome=UNAVAILABLE)
+                continue
+            verdict = self._accept(tier, message.content)
+            if verdict is not None:
+                return verdict
+        return None
+
+    def final(self, content: str) -> Verdict:
+        """The final model's verdict, whatever its confidence. An unreadable answer raises DegradedError so the
+        agent's rule-based fallback decides instead of the answer being taken as a 'no'."""
+        verdict = parse_verdict(content)
+        if verdict is None:
+            CASCADE_ANSWERS.inc(agent=self.agent, model=self.final_model, outcome=UNPARSEABLE)
+            LLM_DEGRADED.inc(agent=self.agent, reason="unparseable verdict")
+            raise DegradedError("unparseable verdict")
+        CASCADE_ANSWERS.inc(agent=self.agent, model=self.final_model, outcome=ACCEPTED)
+        return verdict
+
+    def stats(self) -> dict:
+        tiers = {}
+        for model in [tier.model for tier in self.tiers] + [self.final_model]:
+            answers = {outcome: CASCADE_ANSWERS.value(agent=self.agent, model=model, outcome=outcome) for outcome in OUTCOMES}
+            total = sum(answers.values())
+            calls = LLM_DURATION.count(agent=self.agent, model=model)
+            tiers[model] = {
+                "answers": int(total),
+                "escalation_rate": round(1 - answers[ACCEPTED] / total, 4) if total else 0.0,
+                "mean_latency_ms": round(LLM_DURATION.sum(agent=self.agent, model=model) / calls * 1000, 2) if calls else None,
+                "cost_usd": round(LLM_COST.value(agent=self.agent, model=model), 6),
+            }
+        return {"threshold": self.threshold, "tiers": tiers}
+
+
+def cascade_stats() -> Dict[str, dict]:
+    return {cascade.agent: cascade.stats() for cascade in _cascades}
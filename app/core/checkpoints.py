@@ -0,0 +1,265 @@
+"""Durable LangGraph checkpoints in a local SQLite file.
+
+The durable graph saves a checkpoint after every node, in a thread named after the
+transaction's capture_id. If a run dies part-way (worker crash, model error), the next
+delivery of the transaction, or the startup sweep, resumes from the last completed node
+instead of paying for the earlier model calls again. A finished run's thread is deleted,
+so the file only ever holds the runs that are still in progress or were interrupted.
+
+Only the latest checkpoints matter for resuming, so each checkpoint is stored whole
+(channel values included) rather than as per-channel versioned blobs.
+
+Several processes may share the file. Each thread is leased to the process running it, which
+renews the lease's heartbeat while it is alive (see app.core.leases), so the startup sweep of
+another process only resumes runs whose process stopped. The async methods run the sqlite
+calls on worker threads, and a busy timeout makes a writer wait for another process's commit
+instead of failing with "database is locked".
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id, get_checkpoint_metadata, writes_sort_key
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.core.config import LEASE_TIMEOUT_S, SQLITE_BUSY_TIMEOUT_MS
+from app.core.leases import new_owner
+
+# Application types that appear in the graph state and may be restored from a checkpoint
+CHECKPOINT_TYPES = [("app.models.schemas", "Transaction"), ("app.models.schemas", "TransactionAmount")]
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS checkpoints (
+        thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, parent_id TEXT,
+        type TEXT NOT NULL, checkpoint BLOB NOT NULL, metadata_type TEXT NOT NULL, metadata BLOB NOT NULL,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS writes (
+        thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT NOT NULL, value BLOB,
+        task_path TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    )""",
+    """CREATE TABLE IF NOT EXISTS leases (
+        thread_id TEXT PRIMARY KEY, owner TEXT NOT NULL, heartbeat REAL NOT NULL
+    )""",
+)
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    def __init__(self, path: str, lease_timeout: float = LEASE_TIMEOUT_S):
+        super().__init__(serde=JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES))
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.owner = new_owner()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # A checkpoint per node is on the request path, so only fsync at WAL checkpoints
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+
+    def _tuple(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        with self._lock:
+            writes = self._conn.execute(
+                "SELECT task_id, idx, channel, type, value, task_path FROM writes"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchall()
+        writes.sort(key=lambda write: writes_sort_key(write[5], write[0], write[1]))
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((type_, value)))
+                            for task_id, _, channel, type_, value, _ in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        params: Tuple = (thread_id, checkpoint_ns)
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        with self._lock:
+            # Checkpoint ids are time-ordered, so the largest is the latest
+            row = self._conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", params).fetchone()
+        return self._tuple(row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM checkpoints{where} ORDER BY checkpoint_id DESC", params).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            checkpoint = self._tuple(row)
+            if filter and not all(checkpoint.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield checkpoint
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, serialized, metadata_type, serialized_metadata)
+            )
+            # Each finished node also shows the run's process is alive
+            self._conn.execute("UPDATE leases SET heartbeat = ? WHERE thread_id = ? AND owner = ?",
+                               (time.time(), thread_id, self.owner))
+            self._conn.commit()
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows: List[tuple] = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, serialized, task_path))
+        # Regular writes are kept from the first attempt; special channels (errors, interrupts) are overwritten
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [row for row in rows if row[4] >= 0]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [row for row in rows if row[4] < 0]
+            )
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM leases WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def claim(self, thread_id: str, take_over: bool = True) -> bool:
+        """Leases the thread to this process. Unless `take_over`, only if no other live process holds it."""
+        now = time.time()
+        with self._lock:
+            claimed = self._conn.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT (thread_id) DO UPDATE"
+                " SET owner = excluded.owner, heartbeat = excluded.heartbeat"
+                " WHERE ? OR leases.owner = excluded.owner OR leases.heartbeat < ?",
+                (thread_id, self.owner, now, take_over, now - self.lease_timeout)
+            ).rowcount
+            self._conn.commit()
+        return claimed == 1
+
+    def renew(self) -> None:
+        """Renews the heartbeat of every thread leased to this process."""
+        with self._lock:
+            self._conn.execute("UPDATE leases SET heartbeat = ? WHERE owner = ?", (time.time(), self.owner))
+            self._conn.commit()
+
+    def release(self) -> None:
+        """Gives up this process's leases, so other processes may resume its unfinished runs at once."""
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE owner = ?", (self.owner,))
+            self._conn.commit()
+
+    def abandoned_thread_ids(self) -> List[str]:
+        """Threads with checkpoints whose lease expired or was released: runs no live process will finish."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT checkpoints.thread_id FROM checkpoints LEFT JOIN leases USING (thread_id)"
+                " WHERE leases.heartbeat IS NULL OR leases.heartbeat < ?", (time.time() - self.lease_timeout,)
+            )]
+
+    def compact(self) -> None:
+        """Drops all but each thread's latest checkpoint (and its writes) and returns the space to the OS."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE checkpoint_id < ("
+                " SELECT MAX(latest.checkpoint_id) FROM checkpoints AS latest"
+                " WHERE latest.thread_id = checkpoints.thread_id AND latest.checkpoint_ns = checkpoints.checkpoint_ns)"
+            )
+            self._conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints WHERE checkpoints.thread_id = writes.thread_id"
+                " AND checkpoints.checkpoint_ns = writes.checkpoint_ns AND checkpoints.checkpoint_id = writes.checkpoint_id)"
+            )
+            # Expired leases of runs that died before their first checkpoint
+            self._conn.execute(
+                "DELETE FROM leases WHERE heartbeat < ? AND thread_id NOT IN (SELECT thread_id FROM checkpoints)",
+                (time.time() - self.lease_timeout,)
+            )
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def stats(self) -> dict:
+        with self._lock:
+            threads, checkpoints = self._conn.execute(
+                "SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints"
+            ).fetchone()
+        return {"unfinished_runs": threads, "checkpoints": checkpoints}
+
+    # Commits can wait on another process's writes for up to the busy timeout, so they run off the event loop
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aclaim(self, thread_id: str, take_over: bool = True) -> bool:
+        return await asyncio.to_thread(self.claim, thread_id, take_over)
@@ -0,0 +1,69 @@
+"""JSON encoding for the request path.
+
+Everything the service turns into JSON goes through orjson here: API responses, stream
+events, prompt payloads, cache keys, JSON columns and exports. A transaction is dumped once,
+on first use, into its canonical encoded form (the API field names as a dict, plus those
+bytes) and every consumer reuses it: the agents' payload encoders select fields from the dict,
+the job queue stores it, and responses splice the bytes into the final state as they are
+instead of validating and re-encoding the model. Transactions are treated as immutable once
+parsed, so the cached form never goes stale.
+"""
+from dataclasses import dataclass
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Metadata is free-form and may carry non-string keys, which the stdlib encoder turned into strings too
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+@dataclass(frozen=True)
+class EncodedTransaction:
+    # API (alias) field names, e.g. {"captureId": ..., "amount": {"value": ..., "currency": ...}, ...}; read-only
+    data: dict
+    json: bytes
+
+
+def encode_transaction(transaction: BaseModel) -> EncodedTransaction:
+    """The transaction's canonical encoded form, computed on first use and cached on the model's `_encoded`."""
+    # Read from the private dict directly; attribute access to private attributes goes through a slow __getattr__
+    encoded = transaction.__pydantic_private__["_encoded"]
+    if encoded is None:
+        data = transaction.model_dump(by_alias=True)
+        encoded = EncodedTransaction(data, orjson.dumps(data, default=str, option=_OPTIONS))
+        transaction._encoded = encoded
+    return encoded
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        if "_encoded" in value.__private_attributes__:
+            return orjson.Fragment(encode_transaction(value).json)
+        return value.model_dump(mode="json", by_alias=True)
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON; transactions are written from their cached encoding, other unknown types as str()."""
+    return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+
+def dumps_text(value: Any) -> str:
+    return dumps(value).decode("utf-8")
+
+
+def canonical_json(value: Any) -> str:
+    """Compact JSON with sorted keys, so equal values always encode to the same text."""
+    return orjson.dumps(value, default=_default, option=_OPTIONS | orjson.OPT_SORT_KEYS).decode("utf-8")
+
+
+loads = orjson.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with dumps(), so a final state is written without response model validation."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,7 +1,135 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GEMINI_MODEL = "gemini-2.0-flash"
+
+# Chat model backend: "gemini", or "stub" for a local model with simulated latency ("distribution:mean_ms[:spread]"),
+# failure rate and share of 'yes' verdicts, for offline tests and benchmarks
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "fixed:0")
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_YES_RATE = float(os.getenv("LLM_STUB_YES_RATE", "0"))
+
+# Prompt payloads: opaque values (ids, tokens) longer than this are shortened to a prefix and hash, free text is
+# truncated, and metadata entries are dropped, largest first, until the payload fits the token budget (0 disables)
+PAYLOAD_MAX_ID_CHARS = int(os.getenv("PAYLOAD_MAX_ID_CHARS", "16"))
+PAYLOAD_MAX_TEXT_CHARS = int(os.getenv("PAYLOAD_MAX_TEXT_CHARS", "64"))
+PAYLOAD_TOKEN_BUDGET = int(os.getenv("PAYLOAD_TOKEN_BUDGET", "256"))
+
+# LLM call budget: per-request deadline (0 disables), latency percentile after which a duplicate request is sent
+# (0 disables hedging) once enough latencies are known, and the circuit breaker shared by all agents, which opens
+# when the failed or slow (>= slow call ms) share of the last calls reaches the error rate and retries after the cooldown
+LLM_DEADLINE_MS = float(os.getenv("LLM_DEADLINE_MS", "10000"))
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CIRCUIT_BREAKER_ERROR_RATE = float(os.getenv("CIRCUIT_BREAKER_ERROR_RATE", "0.5"))
+CIRCUIT_BREAKER_SLOW_CALL_MS = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_MS", "5000"))
+CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW", "20"))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "10"))
+CIRCUIT_BREAKER_COOLDOWN_S = float(os.getenv("CIRCUIT_BREAKER_COOLDOWN_S", "30"))
+
+# Model cascade: cheaper models (cheapest first; "" disables) asked for a verdict before GEMINI_MODEL, per agent
+# ("VALIDATION_" / "FRAUD_" prefixed lists override the default), whose answer is kept when its stated confidence
+# reaches the threshold, and the USD price per million prompt/completion tokens of each model for spend accounting
+CASCADE_MODELS = os.getenv("CASCADE_MODELS", "gemini-2.0-flash-lite")
+VALIDATION_CASCADE_MODELS = [model.strip() for model in os.getenv("VALIDATION_CASCADE_MODELS", CASCADE_MODELS).split(",") if model.strip()]
+FRAUD_CASCADE_MODELS = [model.strip() for model in os.getenv("FRAUD_CASCADE_MODELS", CASCADE_MODELS).split(",") if model.strip()]
+CASCADE_CONFIDENCE_THRESHOLD = float(os.getenv("CASCADE_CONFIDENCE_THRESHOLD", "0.8"))
+LLM_PRICES = {
+    model.strip(): tuple(float(price) for price in prices.split("/"))
+    for model, prices in (item.split("=") for item in os.getenv(
+        "LLM_PRICES", "gemini-2.0-flash=0.10/0.40,gemini-2.0-flash-lite=0.075/0.30"
+    ).split(",") if item.strip())
+}
+
+# Any SQLAlchemy URL; the async driver (aiosqlite, asyncpg, aiomysql) is picked from the backend
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{Path(__file__).resolve().parent.parent / 'transactions.db'}")
+# Connection pool for server databases (SQLite uses SQLAlchemy's default pooling)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Validation rules (by name) that should be judged by the LLM instead of the local rule engine
+VALIDATION_LLM_RULES = [rule.strip() for rule in os.getenv("VALIDATION_LLM_RULES", "").split(",") if rule.strip()]
+
+# Agent graph layout: "serial" or "speculative" (fraud detection runs alongside validation)
+GRAPH_TOPOLOGY = os.getenv("GRAPH_TOPOLOGY", "serial")
+
+# Durable runs: local SQLite file checkpointing the graph after every node so interrupted transactions resume
+# where they stopped ("" disables), and whether interrupted runs are finished in the background at startup
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", str(Path(__file__).resolve().parent.parent / "checkpoints.db"))
+CHECKPOINT_RESUME_ON_STARTUP = os.getenv("CHECKPOINT_RESUME_ON_STARTUP", "true").lower() == "true"
+
+# Verdict cache: in-process LRU entries (0 disables), entry lifetime, and optional SQLite file for a shared tier
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", "3600"))
+VERDICT_CACHE_DB = os.getenv("VERDICT_CACHE_DB", "")
+
+# Recovery summaries: "static" (built-in text), "cached" (LLM-written once per status combination) or "llm" (per transaction)
+RECOVERY_SUMMARY_MODE = os.getenv("RECOVERY_SUMMARY_MODE", "cached")
+RECOVERY_SUMMARY_REFRESH = float(os.getenv("RECOVERY_SUMMARY_REFRESH", "86400"))
+RECOVERY_SUMMARY_WARM = os.getenv("RECOVERY_SUMMARY_WARM", "true").lower() == "true"
+
+# Batch processing: transactions per LLM request, how long to wait for a batch to fill, and graphs run at once
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "20"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "20"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "100"))
+
+# Local fraud pre-scoring: amount z-scores at or below the pass threshold are cleared, at or above the
+# fail threshold are flagged, and only the band in between is sent to the LLM
+FRAUD_SCORE_ENABLED = os.getenv("FRAUD_SCORE_ENABLED", "true").lower() == "true"
+FRAUD_SCORE_MIN_SAMPLES = int(os.getenv("FRAUD_SCORE_MIN_SAMPLES", "30"))
+FRAUD_SCORE_PASS_THRESHOLD = float(os.getenv("FRAUD_SCORE_PASS_THRESHOLD", "2.0"))
+FRAUD_SCORE_FAIL_THRESHOLD = float(os.getenv("FRAUD_SCORE_FAIL_THRESHOLD", "4.0"))
+FRAUD_SCORE_METADATA_KEYS = [key.strip() for key in os.getenv("FRAUD_SCORE_METADATA_KEYS", "merchantId,merchant_id").split(",") if key.strip()]
+FRAUD_SCORE_MAX_KEYS = int(os.getenv("FRAUD_SCORE_MAX_KEYS", "10000"))
+
+# Velocity features: metadata fields counted over sliding windows (charge_id is always counted), memory bound,
+# and per-window counts above which a locally cleared transaction is sent to the LLM anyway
+VELOCITY_FIELDS = [field.strip() for field in os.getenv("VELOCITY_FIELDS", "device_id,ip_address,deviceId,ipAddress").split(",") if field.strip()]
+VELOCITY_MAX_KEYS = int(os.getenv("VELOCITY_MAX_KEYS", "100000"))
+VELOCITY_LIMITS = {
+    window.strip(): int(limit)
+    for window, limit in (item.split(":") for item in os.getenv("VELOCITY_LIMITS", "1m:5,1h:30,24h:100").split(",") if item.strip())
+}
+
+# Write-behind persistence: group commit interval and size, and whether responses wait for the commit by default
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_FLUSH_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "50"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+WRITE_BEHIND_DURABLE = os.getenv("WRITE_BEHIND_DURABLE", "false").lower() == "true"
+
+# Transaction export: rows fetched per keyset query while streaming /api/transactions/export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Bulk ingestion: rows validated, processed and committed together (one checkpoint per chunk)
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+
+# Rescoring: rows loaded into columns and evaluated together, and worker processes (0 uses every core)
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "50000"))
+RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", "0"))
+
+# Idempotency: expected number of distinct capture ids and the acceptable rate of needless stored-result lookups
+IDEMPOTENCY_BLOOM_CAPACITY = int(os.getenv("IDEMPOTENCY_BLOOM_CAPACITY", "1000000"))
+IDEMPOTENCY_BLOOM_ERROR_RATE = float(os.getenv("IDEMPOTENCY_BLOOM_ERROR_RATE", "0.001"))
+
+# Job queue mode: workers running queued transactions, jobs waiting or running before submissions are refused,
+# the longest a status request may long-poll, the Retry-After sent when full, and how long finished jobs are kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "1000"))
+JOB_MAX_WAIT_S = float(os.getenv("JOB_MAX_WAIT_S", "30"))
+JOB_RETRY_AFTER_S = int(os.getenv("JOB_RETRY_AFTER_S", "5"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))
+
+# Work processes share (queued jobs, checkpointed runs) is owned by the process running it, which renews a heartbeat;
+# after this long without one, the owner is taken to have stopped and another process may take the work over
+LEASE_TIMEOUT_S = float(os.getenv("LEASE_TIMEOUT_S", "60"))
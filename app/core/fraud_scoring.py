@@ -0,0 +1,176 @@
+"""Local statistical fraud pre-scoring.
+
+Keeps running statistics of (log) transaction amounts per currency and per selected
+metadata value (e.g. a merchant id), updated one transaction at a time. Each transaction
+is scored against those baselines in constant time, by how far its amount lies from them in
+either direction: unusually small amounts (card testing) are as suspect as unusually large
+ones. Clear passes and clear fails are decided locally and only the ambiguous band goes to
+the LLM.
+"""
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.database import Transaction as TransactionRecord
+from app.models.schemas import Transaction
+
+PASS = "pass"
+FAIL = "fail"
+ESCALATE = "escalate"
+
+
+class AmountSketch:
+    """Welford mean/variance of log amounts plus a log-bucketed histogram for quantiles."""
+
+    BUCKETS_PER_DOUBLING = 8
+    # Floor for the log-amount deviation so a baseline of identical amounts doesn't give infinite z-scores
+    MIN_STD = 0.05
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._buckets: Dict[int, int] = {}
+
+    @staticmethod
+    def _log(amount: float) -> float:
+        return math.log1p(max(amount, 0))
+
+    def add(self, amount: float) -> None:
+        x = self._log(amount)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        bucket = int(x * self.BUCKETS_PER_DOUBLING / math.log(2))
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def zscore(self, amount: float) -> float:
+        return (self._log(amount) - self.mean) / max(self.std, self.MIN_STD)
+
+    def quantile(self, q: float) -> float:
+        """Approximate amount at quantile q (the histogram is bounded, so this is constant time)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= target:
+                return math.expm1((bucket + 1) * math.log(2) / self.BUCKETS_PER_DOUBLING)
+        return math.expm1(self.mean)
+
+
+@dataclass
+class FraudAssessment:
+    decision: str
+    score: Optional[float]
+    baselines: List[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        if not self.baselines:
+            return "No baseline available yet."
+        return "; ".join(self.baselines)
+
+
+class FraudScorer:
+    """Scores transactions against per-currency and per-metadata-value amount baselines."""
+
+    def __init__(self, metadata_keys: Iterable[str] = (), min_samples: int = 30,
+                 pass_threshold: float = 2.0, fail_threshold: float = 4.0, max_keys: int = 10000):
+        self.metadata_keys = tuple(metadata_keys)
+        self.min_samples = min_samples
+        self.pass_threshold = pass_threshold
+        self.fail_threshold = fail_threshold
+        self.max_keys = max_keys
+        self._currencies: Dict[str, AmountSketch] = {}
+        # Metadata values are unbounded, so least recently seen ones are evicted
+        self._metadata: "OrderedDict[Tuple[str, str], AmountSketch]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _groups(self, currency: str, metadata: dict) -> List[Tuple[str, Optional[AmountSketch]]]:
+        groups = [(f"currency {currency}", self._currencies.get(currency))]
+        for key in self.metadata_keys:
+            value = metadata.get(key)
+            if value is not None:
+                groups.append((f"{key} {value}", self._metadata.get((key, str(value)))))
+        return groups
+
+    def observe(self, currency: str, amount: float, metadata: Optional[dict] = None) -> None:
+        """Adds a transaction that was not fraudulent to the baselines."""
+        metadata = metadata or {}
+        with self._lock:
+            self._currencies.setdefault(currency, AmountSketch()).add(amount)
+            for key in self.metadata_keys:
+                value = metadata.get(key)
+                if value is None:
+                    continue
+                group = (key, str(value))
+                sketch = self._metadata.get(group)
+                if sketch is None:
+                    sketch = self._metadata[group] = AmountSketch()
+                    while len(self._metadata) > self.max_keys:
+                        self._metadata.popitem(last=False)
+                else:
+                    self._metadata.move_to_end(group)
+                sketch.add(amount)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._currencies.clear()
+            self._metadata.clear()
+
+    def observe_transaction(self, transaction: Transaction) -> None:
+        self.observe(transaction.amount.currency, transaction.amount.value, transaction.transaction_metadata)
+
+    def assess(self, transaction: Transaction) -> FraudAssessment:
+        """Scores the transaction by its largest absolute amount z-score across the baselines it belongs to."""
+        amount = transaction.amount.value
+        with self._lock:
+            scored = []
+            baselines = []
+            for name, sketch in self._groups(transaction.amount.currency, transaction.transaction_metadata or {}):
+                if sketch is None or sketch.count < self.min_samples:
+                    continue
+                z = sketch.zscore(amount)
+                scored.append(z)
+                baselines.append(
+                    f"{name}: {sketch.count} transactions, median {sketch.quantile(0.5):.0f}, "
+                    f"p99 {sketch.quantile(0.99):.0f}, z-score {z:.2f}"
+                )
+
+        if not scored:
+            return FraudAssessment(ESCALATE, None)
+
+        score = max(abs(z) for z in scored)
+        if score >= self.fail_threshold:
+            decision = FAIL
+        elif score <= self.pass_threshold:
+            decision = PASS
+        else:
+            decision = ESCALATE
+        return FraudAssessment(decision, score, baselines)
+
+    def rebuild_from_db(self, db: Session, batch_size: int = 10000) -> int:
+        """Replays rows screened as not fraudulent into the baselines, as the agent learns from them live."""
+        query = (
+            db.query(TransactionRecord.amount_currency, TransactionRecord.amount_value, TransactionRecord.transaction_metadata)
+            # Invalid transactions never reach fraud detection and have no verdict (NULL); they are not learned from
+            .filter(TransactionRecord.is_fraudulent.is_(False))
+            .yield_per(batch_size)
+        )
+        count = 0
+        for currency, amount, metadata in query:
+            if currency is None or amount is None:
+                continue
+            self.observe(currency, amount, metadata if isinstance(metadata, dict) else None)
+            count += 1
+        return count
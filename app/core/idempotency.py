@@ -0,0 +1,141 @@
+"""Idempotent transaction processing.
+
+A redelivered transaction is recognised by its capture id before any agent runs. A Bloom
+filter of every capture id seen answers "definitely new" from memory; only a possible repeat
+costs a lookup of the stored result (the capture id column is uniquely indexed). Concurrent
+deliveries of the same transaction share one execution instead of racing each other.
+"""
+import asyncio
+import hashlib
+import math
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.core.config import IDEMPOTENCY_BLOOM_CAPACITY, IDEMPOTENCY_BLOOM_ERROR_RATE
+
+
+class BloomFilter:
+    """Fixed-size set membership filter with no false negatives and a bounded false positive rate."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def clear(self) -> None:
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
+
+
+def _mark_retrieved(future: asyncio.Future) -> None:
+    # Nobody may be waiting on a failed execution; its caller already saw the exception
+    if not future.cancelled():
+        future.exception()
+
+
+class IdempotencyGuard:
+    """Runs each key's work at most once and replays the result to repeats."""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.seen = BloomFilter(capacity, error_rate)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.replays = 0
+        self.executions = 0
+
+    def add(self, key: str) -> None:
+        self.seen.add(key)
+
+    async def lookup(self, key: str, load: Callable[[str], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        """Returns the result of an earlier or in-flight execution of `key`, or None if there was none."""
+        future = self._inflight.get(key)
+        if future is not None:
+            result = await asyncio.shield(future)
+        elif key in self.seen:
+            # Possibly seen before (or a false positive): the stored result decides
+            result = await load(key)
+        else:
+            return None
+        if result is not None:
+            self.replays += 1
+        return result
+
+    async def run(self, key: str, execute: Callable[[], Awaitable[Tuple[Any, Optional[asyncio.Future]]]],
+                  load: Callable[[str], Awaitable[Optional[Any]]]) -> Tuple[Any, bool]:
+        """Executes the work for `key` unless it already ran; returns the result and whether it was replayed.
+
+        `execute` returns the result and a future that resolves once the result is stored. Until then,
+        repeats are answered from memory, since the stored result may not be readable yet.
+        """
+        result = await self.lookup(key, load)
+        # Someone may have claimed the key while the stored result was being looked up; their run is shared, not raced
+        while result is None and not self.claim(key):
+            result = await self.lookup(key, load)
+        if result is not None:
+            return result, True
+
+        try:
+            result, stored = await execute()
+        except BaseException as e:
+            self.abandon(key, e)
+            raise
+        self.complete(key, result, stored)
+        return result, False
+
+    def claim(self, key: str) -> bool:
+        """Marks `key` as in flight, so repeats wait for its result; False if it already is.
+
+        A claimed key must be settled with complete() or abandon(). run() does this itself; callers
+        that execute several keys together (e.g. a batch) claim them directly.
+        """
+        if key in self._inflight:
+            return False
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_mark_retrieved)
+        self._inflight[key] = future
+        return True
+
+    def complete(self, key: str, result: Any, stored: Optional[asyncio.Future] = None) -> None:
+        """Hands a claimed key's result to its repeats, which are answered from memory until `stored` resolves."""
+        self.executions += 1
+        self.seen.add(key)
+        self._inflight[key].set_result(result)
+        if stored is None or stored.done():
+            self._inflight.pop(key, None)
+        else:
+            stored.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    def abandon(self, key: str, error: BaseException) -> None:
+        """Fails a claimed key: repeats waiting for it get the error, later deliveries execute it again."""
+        self._inflight.pop(key).set_exception(error)
+
+    def clear(self) -> None:
+        self.seen.clear()
+        self._inflight.clear()
+        self.replays = 0
+        self.executions = 0
+
+    def stats(self) -> dict:
+        return {
+            "seen": self.seen.count,
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "replays": self.replays,
+        }
+
+
+processing_guard = IdempotencyGuard(IDEMPOTENCY_BLOOM_CAPACITY, IDEMPOTENCY_BLOOM_ERROR_RATE)
@@ -0,0 +1,32 @@
+"""Ownership of work that several processes share.
+
+Uvicorn workers, or a server restarted while the old one still drains, share the job table and
+the checkpoint file. A process marks the work it takes on with its owner id and renews a
+heartbeat while it runs; work whose heartbeat is older than LEASE_TIMEOUT_S belonged to a
+process that stopped, and another process may take it over.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable
+
+from app.core.config import LEASE_TIMEOUT_S
+
+logger = logging.getLogger(__name__)
+
+
+def new_owner() -> str:
+    """An owner id naming this process (host and pid), unique across restarts of the same process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def keep_alive(renew: Callable[[], Awaitable[None]], timeout: float = LEASE_TIMEOUT_S) -> None:
+    """Calls `renew` three times per lease until cancelled; a failed renewal is logged and tried again."""
+    while True:
+        await asyncio.sleep(timeout / 3)
+        try:
+            await renew()
+        except Exception:
+            logger.exception("Could not renew leases")
@@ -0,0 +1,100 @@
+"""Shared chat model clients.
+
+Every agent talks to the model through `chat_model()`, a runnable that forwards to one lazily
+constructed client per model name and records each call's latency, token usage and estimated
+cost. Importing the agents therefore doesn't import the Gemini SDK or open any connections,
+and all agents share one client (and its connection pool) instead of holding one each.
+"""
+import threading
+import time
+from typing import Dict
+
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+from app.core.config import (
+    GEMINI_MODEL, GOOGLE_API_KEY, LLM_PRICES, LLM_PROVIDER, LLM_STUB_ERROR_RATE, LLM_STUB_LATENCY, LLM_STUB_YES_RATE
+)
+from app.core.metrics import LLM_COST, LLM_DURATION, LLM_REQUESTS, LLM_TOKENS
+
+_clients: Dict[str, Runnable] = {}
+_lock = threading.Lock()
+
+
+def get_client(model: str = GEMINI_MODEL) -> Runnable:
+    """Returns the shared client for `model`, constructing it on first use."""
+    client = _clients.get(model)
+    if client is None:
+        with _lock:
+            client = _clients.get(model)
+            if client is None:
+                client = _clients[model] = _construct(model)
+    return client
+
+
+def _construct(model: str) -> Runnable:
+    if LLM_PROVIDER == "stub":
+        from app.core.stub_llm import LatencyModel, StubChatModel
+        return StubChatModel(
+            latency=LatencyModel.parse(LLM_STUB_LATENCY), error_rate=LLM_STUB_ERROR_RATE, yes_rate=LLM_STUB_YES_RATE
+        )
+    # Deferred: the SDK is one of the slowest imports in the app
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, google_api_key=GOOGLE_API_KEY)
+
+
+def _record_usage(agent: str, model: str, message) -> None:
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        LLM_TOKENS.inc(usage["input_tokens"], agent=agent, model=model, kind="prompt")
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc(usage["output_tokens"], agent=agent, model=model, kind="completion")
+    if model in LLM_PRICES:
+        prompt_price, completion_price = LLM_PRICES[model]
+        cost = (usage.get("input_tokens", 0) * prompt_price + usage.get("output_tokens", 0) * completion_price) / 1_000_000
+        if cost:
+            LLM_COST.inc(cost, agent=agent, model=model)
+
+
+def chat_model(model: str = GEMINI_MODEL, agent: str = "") -> Runnable:
+    """Runnable that forwards its input to the shared client for `model`, for use in `prompt | chat_model()`.
+
+    Each call's duration, outcome, token usage and cost are recorded under the calling `agent`'s name.
+    """
+    def invoke(prompt, config: RunnableConfig):
+        started = time.perf_counter()
+        try:
+            message = get_client(model).invoke(prompt, config)
+        except Exception:
+            LLM_REQUESTS.inc(agent=agent, model=model, outcome="error")
+            raise
+        finally:
+            LLM_DURATION.observe(time.perf_counter() - started, agent=agent, model=model)
+        LLM_REQUESTS.inc(agent=agent, model=model, outcome="ok")
+        _record_usage(agent, model, message)
+        return message
+
+    async def ainvoke(prompt, config: RunnableConfig):
+        started = time.perf_counter()
+        try:
+            message = await get_client(model).ainvoke(prompt, config)
+        except Exception:
+            LLM_REQUESTS.inc(agent=agent, model=model, outcome="error")
+            raise
+        finally:
+            LLM_DURATION.observe(time.perf_counter() - started, agent=agent, model=model)
+        LLM_REQUESTS.inc(agent=agent, model=model, outcome="ok")
+        _record_usage(agent, model, message)
+        return message
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"chat_model[{model}]")
+
+
+def register_client(model: str, client: Runnable) -> None:
+    """Replaces the client used for `model`, e.g. with a stub in tests and benchmarks."""
+    with _lock:
+        _clients[model] = client
+
+
+def reset_clients() -> None:
+    with _lock:
+        _clients.clear()
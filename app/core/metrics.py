@@ -0,0 +1,215 @@
+"""Process-wide metrics in the Prometheus text exposition format.
+
+A deliberately small registry: counters, gauges and fixed-bucket histograms with labels,
+updated with a dict lookup and an addition so instrumentation can stay on in production.
+Gauges can also be computed at scrape time from a callback.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; spans cached/local decisions (sub-millisecond) up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(_Metric):
+    """Gauge set directly or, if given a callback, read at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[dict, float]]]] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        values = dict(self._values)
+        if self._callback is not None:
+            values.update((self._key(labels), value) for labels, value in self._callback())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+    def reset(self) -> None:
+        self._values.clear()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last one is +Inf), sum]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def sum(self, **labels) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = ("le", _format_value(bound) if bound == math.inf else repr(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, callback))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+registry = Registry()
+
+# Agent graph
+NODE_DURATION = registry.histogram("agent_node_duration_seconds", "Wall time of each agent graph node.", ["node"])
+NODE_ERRORS = registry.counter("agent_node_errors_total", "Agent graph node invocations that raised.", ["node"])
+DECISIONS = registry.counter("agent_decisions_total", "Agent verdicts by where they came from.", ["agent", "source"])
+
+# LLM calls
+LLM_DURATION = registry.histogram("llm_request_duration_seconds", "Wall time of chat model requests.", ["agent", "model"])
+LLM_REQUESTS = registry.counter("llm_requests_total", "Chat model requests by outcome.", ["agent", "model", "outcome"])
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens reported by the chat model.", ["agent", "model", "kind"])
+LLM_QUEUE_TIME = registry.histogram("llm_batch_queue_seconds", "Time a question waited in a micro-batcher before being sent.", ["agent"])
+LLM_BATCH_SIZE = registry.histogram("llm_batch_size", "Questions per micro-batched request.", ["agent"],
+                                    buckets=(1, 2, 5, 10, 20, 50, 100))
+PAYLOAD_TOKENS = registry.histogram("llm_prompt_payload_tokens", "Estimated tokens of the transaction payload in each prompt.", ["agent"],
+                                    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048))
+PAYLOAD_TRIMMED = registry.counter("llm_prompt_payload_trimmed_total", "Payloads that had metadata dropped to fit the token budget.", ["agent"])
+LLM_HEDGES = registry.counter("llm_hedged_requests_total", "Duplicate requests sent because the first one was slow.", ["agent"])
+LLM_DEGRADED = registry.counter("llm_degraded_total", "Model calls replaced by rule-based fallbacks.", ["agent", "reason"])
+LLM_COST = registry.counter("llm_cost_usd_total", "Estimated model spend from token usage and LLM_PRICES.", ["agent", "model"])
+CASCADE_ANSWERS = registry.counter("llm_cascade_answers_total", "Cascade tier answers by outcome (accepted, low_confidence, unparseable, unavailable).",
+                                   ["agent", "model", "outcome"])
+
+# Verdict cache
+CACHE_LOOKUPS = registry.counter("verdict_cache_lookups_total", "Verdict cache lookups by result.", ["result"])
+
+# Persistence
+WRITE_QUEUE_TIME = registry.histogram("write_behind_commit_delay_seconds", "Time from enqueueing a write to its commit.")
+WRITE_FLUSH_SIZE = registry.histogram("write_behind_flush_size", "Writes per group commit.", buckets=(1, 5, 10, 50, 100, 500, 1000))
+
+# Job queue
+JOBS = registry.counter("jobs_total", "Submitted jobs by outcome (accepted, rejected, done, failed).", ["outcome"])
+JOB_WAIT = registry.histogram("job_queue_wait_seconds", "Time a job waited in the queue before a worker picked it up.")
@@ -0,0 +1,105 @@
+"""Compact, canonical transaction payloads for agent prompts.
+
+Each agent gets a PayloadEncoder that keeps only the transaction fields it reasons about,
+serializes them as compact JSON with sorted keys, shortens long opaque values (ids, tokens)
+to a prefix plus a short hash and truncates long free text. The encoding of a transaction is
+deterministic, so the same text doubles as the agent's verdict cache key.
+
+A token budget is enforced by dropping the largest metadata entries until the payload fits;
+every payload's (estimated) size is recorded in the prompt payload histogram.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from app.core.codec import canonical_json, encode_transaction
+from app.core.metrics import PAYLOAD_TOKENS, PAYLOAD_TRIMMED
+from app.models.schemas import Transaction
+
+# Values without whitespace, e.g. ids, tokens and hashes
+_OPAQUE = re.compile(r"^\S+$")
+# ISO dates and timestamps stay readable however long they are
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_TIMESTAMP_FIELDS = frozenset({"createdAt", "updatedAt"})
+OMITTED_KEY = "_omitted"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), the same estimate the stub model reports."""
+    return len(text) // 4 + 1
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    text: str
+    tokens: int
+    trimmed: bool
+
+
+class PayloadEncoder:
+    """Encodes transactions for one agent's prompt: selected fields, compact values, bounded size."""
+
+    def __init__(self, agent: str, fields: Iterable[str], normalize: bool = False, max_id_chars: int = 16,
+                 max_text_chars: int = 64, token_budget: Optional[int] = None):
+        self.agent = agent
+        # API (alias) field names: captureId, requestId, chargeId, status, amount, metadata, createdAt, updatedAt
+        self.fields = tuple(dict.fromkeys(fields))
+        self.normalize = normalize
+        self.max_id_chars = max_id_chars
+        self.max_text_chars = max_text_chars
+        self.token_budget = token_budget
+
+    def compact_value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {str(key): self.compact_value(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.compact_value(item) for item in value]
+        if not isinstance(value, str):
+            return value
+        if _OPAQUE.match(value):
+            if len(value) <= self.max_id_chars or _TIMESTAMP.match(value):
+                return value
+            # Keep a readable prefix (e.g. "cap_") and enough hash to tell values apart
+            return f"{value[:6]}~{hashlib.blake2b(value.encode('utf-8'), digest_size=4).hexdigest()}"
+        if len(value) > self.max_text_chars:
+            return value[:self.max_text_chars - 3] + "..."
+        return value
+
+    def _select(self, transaction: Transaction) -> dict:
+        # Shared with the other agents and the response; values are copied or compacted, never modified
+        data = encode_transaction(transaction).data
+        payload = {}
+        for field in self.fields:
+            if field not in data:
+                continue
+            value = data[field]
+            if field == "amount" and self.normalize:
+                value = {**value, "currency": str(value["currency"]).strip().upper()}
+            elif field == "status" and self.normalize:
+                value = value.strip().upper()
+            payload[field] = value if field in _TIMESTAMP_FIELDS else self.compact_value(value)
+        return payload
+
+    def encode(self, transaction: Transaction) -> EncodedPayload:
+        payload = self._select(transaction)
+        text = canonical_json(payload)
+        trimmed = False
+
+        metadata = payload.get("metadata")
+        if self.token_budget and isinstance(metadata, dict):
+            # Largest entries go first; the count of dropped keys tells the model something was left out
+            by_size = sorted(metadata, key=lambda key: (len(canonical_json(metadata[key])), key))
+            omitted = 0
+            while estimate_tokens(text) > self.token_budget and by_size:
+                metadata.pop(by_size.pop())
+                omitted += 1
+                metadata[OMITTED_KEY] = omitted
+                text = canonical_json(payload)
+                trimmed = True
+
+        tokens = estimate_tokens(text)
+        PAYLOAD_TOKENS.observe(tokens, agent=self.agent)
+        if trimmed:
+            PAYLOAD_TRIMMED.inc(agent=self.agent)
+        return EncodedPayload(text, tokens, trimmed)
@@ -0,0 +1,267 @@
+"""Columnar rule evaluation for rescoring stored transactions.
+
+A ColumnChunk holds a slice of the transactions table as one NumPy array per column, and each
+deterministic rule is a vectorized expression over a whole chunk, so re-checking months of
+rows after a rule change takes a few array passes per chunk instead of a Python call per row
+and rule. The rules mirror the local validation rules (app.core.rules) and the fraud agent's
+rule-based screen. Velocity limits depend on the order transactions arrived in and the
+timestamps rule on the API's timestamp strings; the table keeps neither, so those two aren't
+rescored.
+
+Only verdicts the rules decide are rewritten. A failing validation rule makes a transaction
+invalid however it was judged before, but passing them only clears transactions that were
+invalid because of rescored rules alone (read back from their error message). The fraud
+screen only re-decides transactions whose stored verdict came from it, i.e. the agent's
+degraded path; verdicts from the model, the local score or velocity limits stand.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, ClassVar, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.rules import ALLOWED_STATUSES, ISO_4217_CURRENCIES, RULE_FAILURE_PREFIX
+
+# Verdict columns are tri-state: NULL (not decided), false, true
+UNKNOWN, NO, YES = -1, 0, 1
+VERDICT_LABELS = {UNKNOWN: "null", NO: "false", YES: "true"}
+# Whether fulfillment went ahead, as set by the recovery agent from the two verdicts
+FULFILLED, HELD = "SUCCESS", "FLAGGED_FOR_REVIEW"
+FULFILLMENT_LABELS = {NO: HELD, YES: FULFILLED}
+
+_ALLOWED_STATUSES = np.array(sorted(ALLOWED_STATUSES))
+_CURRENCIES = np.array(sorted(ISO_4217_CURRENCIES))
+
+
+@dataclass
+class ColumnChunk:
+    # Text columns have NULLs replaced by "", verdicts are UNKNOWN/NO/YES
+    ids: np.ndarray
+    capture_ids: np.ndarray
+    request_ids: np.ndarray
+    charge_ids: np.ndarray
+    statuses: np.ndarray
+    amounts: np.ndarray
+    has_amount: np.ndarray
+    currencies: np.ndarray
+    device_ids: np.ndarray
+    is_valid: np.ndarray
+    is_fraudulent: np.ndarray
+    # YES where fulfillment_status is SUCCESS
+    fulfilled: np.ndarray
+    # error_message of rows stored as invalid ("" otherwise); few distinct values, so kept as objects
+    failure_messages: np.ndarray
+    # The stored fraud verdict came from the agent's rule-based screen
+    screened_by_rules: np.ndarray
+
+    DTYPES: ClassVar[Tuple] = (np.int64, np.str_, np.str_, np.str_, np.str_, np.int64, bool, np.str_, np.str_,
+                               np.int8, np.int8, np.int8, object, bool)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple]) -> "ColumnChunk":
+        """Transposes rows (in field order) into one array per column."""
+        columns = list(zip(*rows)) if rows else [()] * len(cls.DTYPES)
+        return cls(*(np.asarray(column, dtype=dtype) for column, dtype in zip(columns, cls.DTYPES)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    name: str
+    # Boolean array over a chunk: rows that pass (validation rules) or are flagged (fraud screens)
+    expression: Callable[[ColumnChunk], np.ndarray]
+
+
+def _has_required_fields(chunk: ColumnChunk) -> np.ndarray:
+    return ((chunk.capture_ids != "") & (chunk.request_ids != "") & (chunk.charge_ids != "")
+            & (chunk.statuses != "") & chunk.has_amount)
+
+
+def _has_known_status(chunk: ColumnChunk) -> np.ndarray:
+    return np.isin(chunk.statuses, _ALLOWED_STATUSES)
+
+
+def _has_positive_amount(chunk: ColumnChunk) -> np.ndarray:
+    return chunk.has_amount & (chunk.amounts > 0)
+
+
+def _has_valid_currency(chunk: ColumnChunk) -> np.ndarray:
+    return np.isin(chunk.currencies, _CURRENCIES)
+
+
+VALIDATION_COLUMN_RULES: Tuple[ColumnRule, ...] = (
+    ColumnRule("required_fields", _has_required_fields),
+    ColumnRule("status", _has_known_status),
+    ColumnRule("amount", _has_positive_amount),
+    ColumnRule("currency", _has_valid_currency),
+)
+
+
+def fraud_screen_rules(amount_limit: int, device_prefix: str) -> Tuple[ColumnRule, ...]:
+    """The fraud agent's rule-based screen: large amounts and devices with a suspicious id prefix."""
+    rules = [ColumnRule("amount_limit", lambda chunk: chunk.has_amount & (chunk.amounts >= amount_limit))]
+    if device_prefix:
+        rules.append(ColumnRule("suspicious_device", lambda chunk: np.char.startswith(chunk.device_ids, device_prefix)))
+    return tuple(rules)
+
+
+@dataclass
+class ChunkVerdicts:
+    is_valid: np.ndarray
+    is_fraudulent: np.ndarray
+    fulfilled: np.ndarray
+    # Bit i set: the row failed validation rule i / was flagged by fraud rule i
+    failed: np.ndarray
+    flagged: np.ndarray
+
+    def changed(self, chunk: ColumnChunk) -> np.ndarray:
+        return (self.is_valid != chunk.is_valid) | (self.is_fraudulent != chunk.is_fraudulent)
+
+
+def _rule_bits(rules: Sequence[ColumnRule], chunk: ColumnChunk, invert: bool) -> np.ndarray:
+    bits = np.zeros(len(chunk), dtype=np.uint32)
+    for bit, rule in enumerate(rules):
+        hits = rule.expression(chunk)
+        bits |= (~hits if invert else hits).astype(np.uint32) << np.uint32(bit)
+    return bits
+
+
+class ColumnRuleSet:
+    """Validation rules and fraud screens evaluated together over column chunks.
+
+    `llm_judged` says an LLM also judges validity (VALIDATION_LLM_RULES), so passing the
+    rules here isn't enough to make a transaction valid.
+    """
+
+    def __init__(self, validation_rules: Sequence[ColumnRule] = VALIDATION_COLUMN_RULES,
+                 fraud_rules: Sequence[ColumnRule] = (), llm_judged: bool = False):
+        self.validation_rules = tuple(validation_rules)
+        self.fraud_rules = tuple(fraud_rules)
+        self.llm_judged = llm_judged
+        if len(self.validation_rules) > 32 or len(self.fraud_rules) > 32:
+            raise ValueError("At most 32 validation and 32 fraud rules are supported")
+
+    def stored_failures(self, chunk: ColumnChunk) -> Tuple[np.ndarray, np.ndarray]:
+        """Bits of the rescored rules each invalid row failed when stored, and whether anything else failed it."""
+        messages, inverse = np.unique(chunk.failure_messages, return_inverse=True)
+        bits = np.zeros(len(messages), dtype=np.uint32)
+        other = np.ones(len(messages), dtype=bool)
+        positions = {rule.name: bit for bit, rule in enumerate(self.validation_rules)}
+        for i, message in enumerate(messages):
+            if not message.startswith(RULE_FAILURE_PREFIX):
+                # An LLM verdict ("failed validation checks") or no message at all
+                continue
+            names = message[len(RULE_FAILURE_PREFIX):].rstrip(".").split(", ")
+            other[i] = any(name not in positions for name in names)
+            for name in names:
+                if name in positions:
+                    bits[i] |= np.uint32(1 << positions[name])
+        inverse = inverse.reshape(-1)
+        return bits[inverse], other[inverse]
+
+    def evaluate(self, chunk: ColumnChunk) -> ChunkVerdicts:
+        failed = _rule_bits(self.validation_rules, chunk, invert=True)
+        flagged = _rule_bits(self.fraud_rules, chunk, invert=False)
+        stored_failed, failed_otherwise = self.stored_failures(chunk)
+        cleared = (chunk.is_valid == NO) & (stored_failed != 0) & ~failed_otherwise & (not self.llm_judged)
+        is_valid = np.where(failed != 0, NO, np.where(cleared, YES, chunk.is_valid))
+
+        # The screen only re-decides its own verdicts, and only towards fraudulent: the degraded path also
+        # flags busy devices and cards, which can't be told apart afterwards
+        is_fraudulent = chunk.is_fraudulent
+        if self.fraud_rules:
+            is_fraudulent = np.where(chunk.screened_by_rules & (flagged != 0), YES, is_fraudulent)
+        # As in the graph, only valid transactions have a fraud verdict
+        is_fraudulent = np.where(is_valid == YES, is_fraudulent, UNKNOWN)
+        return ChunkVerdicts(
+            is_valid=is_valid.astype(np.int8),
+            is_fraudulent=is_fraudulent.astype(np.int8),
+            fulfilled=np.where((is_valid == YES) & (is_fraudulent == NO), YES, NO).astype(np.int8),
+            failed=failed,
+            flagged=flagged,
+        )
+
+    @staticmethod
+    def names(rules: Sequence[ColumnRule], bits: int) -> List[str]:
+        return [rule.name for bit, rule in enumerate(rules) if bits >> bit & 1]
+
+
+def _transition(field: str, code: int, labels: Dict[int, str] = VERDICT_LABELS) -> str:
+    old, new = divmod(int(code), 3)
+    return f"{field}: {labels[old - 1]} -> {labels[new - 1]}"
+
+
+@dataclass
+class RescoreReport:
+    """Which stored decisions the current rules would change, and the rules behind them."""
+    rows: int = 0
+    changed: int = 0
+    # e.g. {"is_valid: true -> false": 12}
+    transitions: Counter = field(default_factory=Counter)
+    # Rows failing each validation rule ("validation:currency") or flagged by each screen ("fraud:amount_limit")
+    rules: Counter = field(default_factory=Counter)
+    # A few capture ids per transition
+    samples: Dict[str, List[str]] = field(default_factory=dict)
+    elapsed: float = 0.0
+    sample_size: int = 5
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add(self, chunk: ColumnChunk, verdicts: ChunkVerdicts, rule_set: ColumnRuleSet) -> np.ndarray:
+        """Counts a chunk's changes and rule hits; returns the mask of rows whose verdicts change."""
+        changed = verdicts.changed(chunk)
+        self.rows += len(chunk)
+        self.changed += int(np.count_nonzero(changed))
+        for field_name, old, new, labels in (
+            ("is_valid", chunk.is_valid, verdicts.is_valid, VERDICT_LABELS),
+            ("is_fraudulent", chunk.is_fraudulent, verdicts.is_fraudulent, VERDICT_LABELS),
+            # Fulfillment is only recomputed along with changed verdicts
+            ("fulfillment_status", chunk.fulfilled, verdicts.fulfilled, FULFILLMENT_LABELS),
+        ):
+            moved = (old != new) & changed
+            codes = (old[moved].astype(np.int16) + 1) * 3 + (new[moved] + 1)
+            capture_ids = chunk.capture_ids[moved]
+            for code, count in zip(*np.unique(codes, return_counts=True)):
+                label = _transition(field_name, code, labels)
+                self.transitions[label] += int(count)
+                samples = self.samples.setdefault(label, [])
+                if len(samples) < self.sample_size:
+                    samples.extend(capture_ids[codes == code][:self.sample_size - len(samples)].tolist())
+        for kind, rules, bits in (("validation", rule_set.validation_rules, verdicts.failed),
+                                  ("fraud", rule_set.fraud_rules, verdicts.flagged)):
+            for bit, rule in enumerate(rules):
+                self.rules[f"{kind}:{rule.name}"] += int(np.count_nonzero(bits & np.uint32(1 << bit)))
+        return changed
+
+    def merge(self, other: "RescoreReport") -> None:
+        self.rows += other.rows
+        self.changed += other.changed
+        self.transitions.update(other.transitions)
+        self.rules.update(other.rules)
+        for label, capture_ids in other.samples.items():
+            samples = self.samples.setdefault(label, [])
+            samples.extend(capture_ids[:self.sample_size - len(samples)])
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "changed": self.changed,
+            "transitions": dict(sorted(self.transitions.items())),
+            "rules": dict(sorted(self.rules.items())),
+            "samples": dict(sorted(self.samples.items())),
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second),
+        }
+
+    def describe(self) -> str:
+        lines = [f"{self.rows} rows rescored in {self.elapsed:.1f}s ({self.rows_per_second:.0f} rows/s), "
+                 f"{self.changed} decisions would change"]
+        for label, count in sorted(self.transitions.items()):
+            lines.append(f"  {label}: {count} (e.g. {', '.join(self.samples.get(label, []))})")
+        for name, count in sorted(self.rules.items()):
+            lines.append(f"  {name}: {count} rows")
+        return "\n".join(lines)
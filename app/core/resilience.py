@@ -0,0 +1,222 @@
+"""Deadlines, hedging and circuit breaking for LLM calls.
+
+Agents make their model calls through a GuardedCall. A call that can't produce an answer in
+time, fails, or isn't attempted because the model's circuit is open raises DegradedError, and
+the agent falls back to its deterministic rules instead of stalling the transaction.
+
+- Deadline: each request gets a fixed budget; past it the request is cancelled.
+- Hedging: once enough latencies are known, a request still running after the configured
+  percentile gets a duplicate, and whichever answers first wins.
+- Circuit breaker: shared by every agent using the model. It opens when too many recent
+  calls failed or were slow, rejects calls for a cooldown, then lets a single probe through
+  and closes again if that succeeds.
+"""
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+
+from app.core.config import (
+    CIRCUIT_BREAKER_COOLDOWN_S, CIRCUIT_BREAKER_ENABLED, CIRCUIT_BREAKER_ERROR_RATE, CIRCUIT_BREAKER_MIN_CALLS,
+    CIRCUIT_BREAKER_SLOW_CALL_MS, CIRCUIT_BREAKER_WINDOW, LLM_DEADLINE_MS, LLM_HEDGE_MIN_SAMPLES, LLM_HEDGE_PERCENTILE
+)
+from app.core.metrics import LLM_DEGRADED, LLM_HEDGES, registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class DegradedError(Exception):
+    """The model could not be used for this call; `reason` says why."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CircuitBreaker:
+    def __init__(self, error_rate: float = 0.5, slow_call_seconds: float = 5.0, window: int = 20,
+                 min_calls: int = 10, cooldown: float = 30.0, enabled: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self._clock = clock
+        # (failed, slow) for the most recent calls
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now. In half-open state only one probe is let through."""
+        if not self.enabled or self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self._clock() - self._opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record(self, success: bool, seconds: float) -> None:
+        if not self.enabled:
+            return
+        if self.state != CLOSED:
+            self._probing = False
+            if success and seconds < self.slow_call_seconds:
+                logger.info("Circuit closed after a successful probe")
+                self.state = CLOSED
+                self._window.clear()
+            else:
+                self._open()
+            return
+
+        self._window.append((not success, seconds >= self.slow_call_seconds))
+        if len(self._window) < self.min_calls:
+            return
+        failed = sum(failed for failed, _ in self._window) / len(self._window)
+        slow = sum(slow for _, slow in self._window) / len(self._window)
+        if failed >= self.error_rate or slow >= self.error_rate:
+            logger.warning("Circuit opened: %.0f%% of recent calls failed, %.0f%% were slow", failed * 100, slow * 100)
+            self._open()
+
+    def abandon(self) -> None:
+        """A call let through by allow() ended without an outcome (e.g. it was cancelled); frees the probe slot."""
+        self._probing = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = self._clock()
+        self._window.clear()
+        self.trips += 1
+
+    def reset(self) -> None:
+        self.state = CLOSED
+        self._window.clear()
+        self._probing = False
+
+
+class GuardedCall:
+    """Runs one kind of model request (e.g. single fraud checks) under a deadline, hedging and a breaker."""
+
+    def __init__(self, name: str, breaker: CircuitBreaker, deadline: Optional[float] = 10.0,
+                 hedge_percentile: Optional[float] = None, hedge_min_samples: int = 20, history: int = 200):
+        self.name = name
+        self.breaker = breaker
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies: Deque[float] = deque(maxlen=history)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a duplicate request is sent, or None if hedging is off or not calibrated yet."""
+        if not self.hedge_percentile or len(self._latencies) < max(self.hedge_min_samples, 2):
+            return None
+        return statistics.quantiles(self._latencies, n=100, method="inclusive")[int(self.hedge_percentile) - 1]
+
+    def _degrade(self, reason: str) -> DegradedError:
+        LLM_DEGRADED.inc(agent=self.name, reason=reason.split(":")[0])
+        return DegradedError(reason)
+
+    def _succeeded(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+        self.breaker.record(True, seconds)
+
+    async def call(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        if not self.breaker.allow():
+            raise self._degrade("circuit open")
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._hedged(make_call), self.deadline) if self.deadline else \
+                await self._hedged(make_call)
+        except asyncio.TimeoutError:
+            self.breaker.record(False, time.perf_counter() - started)
+            raise self._degrade(f"deadline: no answer within {self.deadline * 1000:.0f} ms")
+        except Exception as e:
+            self.breaker.record(False, time.perf_counter() - started)
+            raise self._degrade(f"model error: {type(e).__name__}") from e
+        except BaseException:
+            # Cancelled by the caller: says nothing about the model, but a half-open probe must not hold the slot
+            self.breaker.abandon()
+            raise
+        self._succeeded(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(make_call())
+        if delay is None:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                LLM_HEDGES.inc(agent=self.name)
+                tasks.add(asyncio.ensure_future(make_call()))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, *tasks):
+                task.cancel()
+
+    def call_sync(self, make_call: Callable[[], T]) -> T:
+        """Blocking variant: the breaker applies, but a blocking call can't be cancelled, so no deadline or hedging."""
+        if not self.breaker.allow():
+            raise self._degrade("circuit open")
+        started = time.perf_counter()
+        try:
+            result = make_call()
+        except Exception as e:
+            self.breaker.record(False, time.perf_counter() - started)
+            raise self._degrade(f"model error: {type(e).__name__}") from e
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        self._succeeded(time.perf_counter() - started)
+        return result
+
+
+def make_breaker() -> CircuitBreaker:
+    """A CircuitBreaker with the configured thresholds."""
+    return CircuitBreaker(
+        error_rate=CIRCUIT_BREAKER_ERROR_RATE,
+        slow_call_seconds=CIRCUIT_BREAKER_SLOW_CALL_MS / 1000,
+        window=CIRCUIT_BREAKER_WINDOW,
+        min_calls=CIRCUIT_BREAKER_MIN_CALLS,
+        cooldown=CIRCUIT_BREAKER_COOLDOWN_S,
+        enabled=CIRCUIT_BREAKER_ENABLED,
+    )
+
+
+llm_breaker = make_breaker()
+
+registry.gauge("llm_circuit_open", "1 while the LLM circuit breaker is rejecting calls.",
+               callback=lambda: [({}, int(llm_breaker.state != CLOSED))])
+
+
+def guarded_call(name: str, breaker: Optional[CircuitBreaker] = None) -> GuardedCall:
+    """A GuardedCall on `breaker` (by default the shared LLM breaker) with the configured deadline and hedging."""
+    return GuardedCall(
+        name, breaker or llm_breaker,
+        deadline=LLM_DEADLINE_MS / 1000 if LLM_DEADLINE_MS > 0 else None,
+        hedge_percentile=LLM_HEDGE_PERCENTILE or None,
+        hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+    )
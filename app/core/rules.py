@@ -0,0 +1,115 @@
+"""Deterministic validation rules evaluated locally before any LLM call."""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, List, Tuple
+
+from app.models.schemas import Transaction
+
+# error_message of a transaction the rules (not an LLM verdict) found invalid; rescoring reads the rules back from it
+RULE_FAILURE_PREFIX = "Transaction failed validation rules: "
+
+ALLOWED_STATUSES = frozenset({"PENDING", "SUCCESS", "FAILED"})
+
+# Active ISO 4217 alphabetic codes
+ISO_4217_CURRENCIES = frozenset({
+    "AED", "AFN", "ALL", "AMD", "ANG", "AOA", "ARS", "AUD", "AWG", "AZN",
+    "BAM", "BBD", "BDT", "BGN", "BHD", "BIF", "BMD", "BND", "BOB", "BRL",
+    "BSD", "BTN", "BWP", "BYN", "BZD", "CAD", "CDF", "CHF", "CLP", "CNY",
+    "COP", "CRC", "CUP", "CVE", "CZK", "DJF", "DKK", "DOP", "DZD", "EGP",
+    "ERN", "ETB", "EUR", "FJD", "FKP", "GBP", "GEL", "GHS", "GIP", "GMD",
+    "GNF", "GTQ", "GYD", "HKD", "HNL", "HTG", "HUF", "IDR", "ILS", "INR",
+    "IQD", "IRR", "ISK", "JMD", "JOD", "JPY", "KES", "KGS", "KHR", "KMF",
+    "KPW", "KRW", "KWD", "KYD", "KZT", "LAK", "LBP", "LKR", "LRD", "LSL",
+    "LYD", "MAD", "MDL", "MGA", "MKD", "MMK", "MNT", "MOP", "MRU", "MUR",
+    "MVR", "MWK", "MXN", "MYR", "MZN", "NAD", "NGN", "NIO", "NOK", "NPR",
+    "NZD", "OMR", "PAB", "PEN", "PGK", "PHP", "PKR", "PLN", "PYG", "QAR",
+    "RON", "RSD", "RUB", "RWF", "SAR", "SBD", "SCR", "SDG", "SEK", "SGD",
+    "SHP", "SLE", "SOS", "SRD", "SSP", "STN", "SVC", "SYP", "SZL", "THB",
+    "TJS", "TMT", "TND", "TOP", "TRY", "TTD", "TWD", "TZS", "UAH", "UGX",
+    "USD", "UYU", "UZS", "VED", "VES", "VND", "VUV", "WST", "XAF", "XCD",
+    "XOF", "XPF", "YER", "ZAR", "ZMW", "ZWG",
+})
+
+@dataclass(frozen=True)
+class ValidationRule:
+    name: str
+    description: str
+    check: Callable[[Transaction], bool]
+    # Transaction fields (API names) the rule looks at, so prompts only carry what the LLM needs
+    fields: Tuple[str, ...] = ()
+
+def _has_required_fields(transaction: Transaction) -> bool:
+    return (
+        all(isinstance(value, str) and value for value in (
+            transaction.capture_id, transaction.request_id, transaction.charge_id, transaction.status
+        ))
+        and transaction.amount is not None
+        and transaction.transaction_metadata is not None
+    )
+
+def _has_known_status(transaction: Transaction) -> bool:
+    return transaction.status in ALLOWED_STATUSES
+
+def _has_positive_amount(transaction: Transaction) -> bool:
+    return transaction.amount.value > 0
+
+def _has_valid_currency(transaction: Transaction) -> bool:
+    return transaction.amount.currency in ISO_4217_CURRENCIES
+
+def _has_valid_timestamps(transaction: Transaction) -> bool:
+    datetime.fromisoformat(transaction.created_at)
+    datetime.fromisoformat(transaction.updated_at)
+    return True
+
+VALIDATION_RULES: Tuple[ValidationRule, ...] = (
+    ValidationRule("required_fields", "Required fields are present (captureId, requestId, chargeId, status, amount, metadata)", _has_required_fields,
+                   ("captureId", "requestId", "chargeId", "status", "amount", "metadata")),
+    ValidationRule("status", "Status must be one of: PENDING, SUCCESS, FAILED", _has_known_status, ("status",)),
+    ValidationRule("amount", "Amount must be a positive number", _has_positive_amount, ("amount",)),
+    ValidationRule("currency", "Currency must be a valid 3-letter currency code", _has_valid_currency, ("amount",)),
+    ValidationRule("timestamps", "Timestamps must be valid ISO 8601 format", _has_valid_timestamps, ("createdAt", "updatedAt")),
+)
+
+def rule_failure_message(failed_rules: Iterable[str]) -> str:
+    return f"{RULE_FAILURE_PREFIX}{', '.join(failed_rules)}."
+
+class RuleEngine:
+    """Evaluates the mechanical rules locally and leaves the fuzzy ones to the LLM."""
+
+    def __init__(self, rules: Iterable[ValidationRule], llm_rules: Iterable[str] = ()):
+        rules = tuple(rules)
+        llm_rules = set(llm_rules)
+        unknown = llm_rules - {rule.name for rule in rules}
+        if unknown:
+            raise ValueError(f"Unknown validation rules: {', '.join(sorted(unknown))}")
+
+        # Compile the local rules down to (name, predicate) pairs once
+        self._local_checks = tuple((rule.name, rule.check) for rule in rules if rule.name not in llm_rules)
+        self.llm_rules = tuple(rule for rule in rules if rule.name in llm_rules)
+
+    def evaluate(self, transaction: Transaction) -> List[str]:
+        """Returns the names of the local rules the transaction fails."""
+        return self._run(self._local_checks, transaction)
+
+    def evaluate_llm_rules(self, transaction: Transaction) -> List[str]:
+        """Checks the LLM-judged rules with their local predicates, for when the model is unavailable."""
+        return self._run(tuple((rule.name, rule.check) for rule in self.llm_rules), transaction)
+
+    @staticmethod
+    def _run(checks, transaction: Transaction) -> List[str]:
+        failed = []
+        for name, check in checks:
+            try:
+                passed = check(transaction)
+            except (AttributeError, TypeError, ValueError):
+                passed = False
+            if not passed:
+                failed.append(name)
+        return failed
+
+    def llm_rule_fields(self) -> List[str]:
+        """The transaction fields the LLM-judged rules look at, in rule order."""
+        return list(dict.fromkeys(field for rule in self.llm_rules for field in rule.fields))
+
+    def describe_llm_rules(self) -> str:
+        return "\n".join(f"{i}. {rule.description}" for i, rule in enumerate(self.llm_rules, 1))
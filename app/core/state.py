@@ -1,4 +1,6 @@
-from typing import TypedDict, Optional, List, Any
+from typing import Annotated, Optional, List, Any, Dict
+from typing_extensions import TypedDict, NotRequired
+from app.core.tracing import merge_timings
 from app.models.schemas import Transaction
 
 class AgentState(TypedDict):
@@ -8,3 +10,24 @@ class AgentState(TypedDict):
     fulfillment_status: Optional[str]
     error_message: Optional[str]
     history: List[str]
+    # Names of the validation rules the transaction failed
+    validation_failures: NotRequired[List[str]]
+    # Largest amount z-score from the local fraud pre-scorer (None if there was no baseline yet)
+    fraud_score: NotRequired[Optional[float]]
+    # Sliding-window event counts per tracked value, e.g. {"device_id=abc": {"1m": 1, "1h": 4, "24h": 9}}
+    velocity: NotRequired[Dict[str, Dict[str, int]]]
+    # Fraud detection result parked by the speculative topology until validation finishes
+    speculative_fraud: NotRequired[Optional[dict]]
+    # Wall time per graph node in milliseconds, e.g. {"run_validation_agent": 0.4, "run_fraud_detection_agent": 212.7}
+    timings: NotRequired[Annotated[Dict[str, float], merge_timings]]
+
+def new_agent_state(transaction: Transaction) -> AgentState:
+    """Returns the initial state for a transaction entering the agentic system."""
+    return AgentState(
+        transaction=transaction,
+        is_valid=None,
+        is_fraudulent=None,
+        fulfillment_status=None,
+        error_message=None,
+        history=[]
+    )
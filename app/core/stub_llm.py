@@ -0,0 +1,134 @@
+"""Local stand-in for the Gemini chat model.
+
+StubChatModel answers the agents' prompts without a network: single yes/no questions (as a
+JSON verdict with a fixed confidence when the prompt asks for one), numbered batch prompts
+('<n>: yes|no' per transaction) and free-text summaries. Latency
+follows a configurable distribution and a share of calls can fail, so throughput and tail
+latency can be measured offline. Verdicts come from a script (cycled in order) or are drawn
+with a fixed 'yes' rate from a seeded generator, so runs are reproducible.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+_BATCH_ITEM = re.compile(r"^\s*Transaction (\d+):", re.MULTILINE)
+
+
+class StubLLMError(RuntimeError):
+    """Simulated model failure."""
+
+
+@dataclass(frozen=True)
+class LatencyModel:
+    """Per-call latency in milliseconds.
+
+    - fixed: always `mean_ms`
+    - uniform: `mean_ms` +/- `spread` ms
+    - exponential: exponentially distributed with mean `mean_ms`
+    - lognormal: median `mean_ms` with shape `spread` (sigma); gives a long tail
+    """
+    distribution: str = "fixed"
+    mean_ms: float = 0.0
+    spread: float = 0.0
+
+    def __post_init__(self):
+        if self.distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {self.distribution!r}, expected one of {LATENCY_DISTRIBUTIONS}")
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """Parses 'distribution:mean_ms[:spread]', e.g. 'lognormal:200:0.5'."""
+        distribution, *numbers = spec.split(":")
+        return cls(distribution, *(float(number) for number in numbers))
+
+    def sample(self, rng: random.Random) -> float:
+        """Returns one latency in seconds."""
+        if self.distribution == "uniform":
+            ms = rng.uniform(self.mean_ms - self.spread, self.mean_ms + self.spread)
+        elif self.distribution == "exponential":
+            ms = rng.expovariate(1 / self.mean_ms) if self.mean_ms > 0 else 0.0
+        elif self.distribution == "lognormal":
+            ms = self.mean_ms * rng.lognormvariate(0, self.spread)
+        else:
+            ms = self.mean_ms
+        return max(ms, 0.0) / 1000
+
+
+class StubChatModel(BaseChatModel):
+    latency: LatencyModel = LatencyModel()
+    error_rate: float = 0.0
+    yes_rate: float = 0.0
+    confidence: float = 1.0
+    script: Optional[List[str]] = None
+    summary: str = "Stub summary of the next steps."
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+    _position: int = PrivateAttr(default=0)
+    calls: int = 0
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _verdict(self) -> str:
+        if self.script:
+            verdict = self.script[self._position % len(self.script)]
+            self._position += 1
+            return verdict
+        return "yes" if self._rng.random() < self.yes_rate else "no"
+
+    def _answer(self, messages: Sequence[BaseMessage]) -> str:
+        text = "\n".join(str(message.content) for message in messages)
+        items = _BATCH_ITEM.findall(text)
+        if items:
+            return "\n".join(f"{number}: {self._verdict()}" for number in items)
+        if '"confidence"' in text:
+            return json.dumps({"verdict": self._verdict(), "confidence": self.confidence})
+        if "'yes'" in text:
+            return self._verdict()
+        return self.summary
+
+    def _next(self, messages: Sequence[BaseMessage]) -> tuple:
+        """Draws this call's latency and outcome up front, so sync and async calls consume the same randomness."""
+        self.calls += 1
+        delay = self.latency.sample(self._rng)
+        failed = self._rng.random() < self.error_rate
+        return delay, failed, None if failed else self._answer(messages)
+
+    @staticmethod
+    def _result(messages: Sequence[BaseMessage], failed: bool, content: Optional[str]) -> ChatResult:
+        if failed:
+            raise StubLLMError("Simulated model failure")
+        # Rough token counts (about four characters per token) so usage accounting has something to count
+        prompt_tokens = sum(len(str(message.content)) for message in messages) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        delay, failed, content = self._next(messages)
+        time.sleep(delay)
+        return self._result(messages, failed, content)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        delay, failed, content = self._next(messages)
+        await asyncio.sleep(delay)
+        return self._result(messages, failed, content)
@@ -0,0 +1,118 @@
+"""Memoized recovery summaries.
+
+The recovery prompt only depends on the validation and fraud statuses, so there are four
+possible summaries. The store generates each one once, serves it from memory and
+regenerates it after the refresh interval. When the LLM can't produce one, the last
+generated or the built-in summary is served instead and marked as degraded.
+"""
+import logging
+import time
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from app.core.resilience import DegradedError
+
+logger = logging.getLogger(__name__)
+
+SummaryKey = Tuple[str, str]
+
+# Used in "static" mode and whenever the LLM can't produce a summary
+STATIC_SUMMARIES: Dict[SummaryKey, str] = {
+    ("Valid", "Not Fraudulent"): "Transaction passed validation and fraud checks. Fulfillment has been processed.",
+    ("Valid", "Fraudulent"): "Transaction was flagged as potentially fraudulent and has been held for manual review.",
+    ("Invalid", "Not Fraudulent"): "Transaction failed validation checks and has been flagged for manual review.",
+    ("Invalid", "Fraudulent"): "Transaction failed validation and was flagged as potentially fraudulent. It has been held for manual review.",
+}
+
+SUMMARY_MODES = ("static", "cached", "llm")
+
+
+class Summary(NamedTuple):
+    text: str
+    # Why the LLM's summary wasn't used and what was served instead, e.g. "circuit open; built-in summary"
+    degraded: Optional[str] = None
+
+
+def summary_key(inputs: dict) -> SummaryKey:
+    return inputs["validation_status"], inputs["fraud_status"]
+
+
+class SummaryStore:
+    """
+    Serves recovery summaries according to the configured mode:
+
+    - "static": built-in summaries, never touches the network.
+    - "cached": LLM-written summaries generated once per status combination (at startup
+      or on first use) and regenerated after `refresh_after` seconds.
+    - "llm": calls the LLM for every transaction, for prompts with transaction-specific context.
+    """
+
+    def __init__(self, mode: str = "cached", refresh_after: float = 86400.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if mode not in SUMMARY_MODES:
+            raise ValueError(f"Unknown recovery summary mode: {mode}")
+        self.mode = mode
+        self.refresh_after = refresh_after
+        self._clock = clock
+        self._summaries: Dict[SummaryKey, Tuple[str, float]] = {}
+
+    def _lookup(self, key: SummaryKey) -> Tuple[Optional[str], bool]:
+        """Returns the stored summary for a key and whether it is still fresh."""
+        entry = self._summaries.get(key)
+        if entry is None:
+            return None, False
+        summary, generated_at = entry
+        return summary, self._clock() - generated_at < self.refresh_after
+
+    def _store(self, key: SummaryKey, summary: str) -> Summary:
+        self._summaries[key] = (summary, self._clock())
+        return Summary(summary)
+
+    def _fallback(self, key: SummaryKey, stale: Optional[str], error: Exception) -> Summary:
+        logger.warning("Recovery summary generation failed for %s: %s", key, error)
+        reason = error.reason if isinstance(error, DegradedError) else f"model error: {type(error).__name__}"
+        if stale:
+            return Summary(stale, f"{reason}; last generated summary")
+        return Summary(STATIC_SUMMARIES[key], f"{reason}; built-in summary")
+
+    def summarize(self, inputs: dict, generate: Callable[[dict], str]) -> Summary:
+        key = summary_key(inputs)
+        if self.mode == "static":
+            return Summary(STATIC_SUMMARIES[key])
+        if self.mode == "llm":
+            try:
+                return Summary(generate(inputs))
+            except Exception as e:
+                return self._fallback(key, None, e)
+
+        summary, fresh = self._lookup(key)
+        if fresh:
+            return Summary(summary)
+        try:
+            return self._store(key, generate(inputs))
+        except Exception as e:
+            return self._fallback(key, summary, e)
+
+    async def asummarize(self, inputs: dict, agenerate: Callable[[dict], Awaitable[str]]) -> Summary:
+        key = summary_key(inputs)
+        if self.mode == "static":
+            return Summary(STATIC_SUMMARIES[key])
+        if self.mode == "llm":
+            try:
+                return Summary(await agenerate(inputs))
+            except Exception as e:
+                return self._fallback(key, None, e)
+
+        summary, fresh = self._lookup(key)
+        if fresh:
+            return Summary(summary)
+        try:
+            return self._store(key, await agenerate(inputs))
+        except Exception as e:
+            return self._fallback(key, summary, e)
+
+    async def awarm(self, agenerate: Callable[[dict], Awaitable[str]]) -> None:
+        """Generates every status combination up front so requests never wait on the LLM."""
+        if self.mode != "cached":
+            return
+        for validation_status, fraud_status in STATIC_SUMMARIES:
+            await self.asummarize({"validation_status": validation_status, "fraud_status": fraud_status}, agenerate)
@@ -0,0 +1,46 @@
+"""Per-node tracing for the agent graph.
+
+Every node is wrapped so its wall time is observed in the node duration histogram and
+added to the transaction's own `timings` breakdown in AgentState (milliseconds per node).
+"""
+import time
+from typing import Callable, Dict, Optional
+
+from langchain_core.runnables import RunnableLambda
+
+from app.core.metrics import NODE_DURATION, NODE_ERRORS
+
+
+def merge_timings(left: Optional[Dict[str, float]], right: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """State reducer so parallel branches can each add their node's timing."""
+    return {**(left or {}), **(right or {})}
+
+
+def _record(result: dict, node: str, started: float) -> dict:
+    elapsed = time.perf_counter() - started
+    NODE_DURATION.observe(elapsed, node=node)
+    result['timings'] = {**(result.get('timings') or {}), node: round(elapsed * 1000, 3)}
+    return result
+
+
+def traced_node(node: str, func: Callable, afunc: Optional[Callable] = None) -> RunnableLambda:
+    """Wraps a node's blocking (and optional async) implementation with timing and error counting."""
+    def run(state):
+        started = time.perf_counter()
+        try:
+            return _record(func(state), node, started)
+        except Exception:
+            NODE_ERRORS.inc(node=node)
+            raise
+
+    async def arun(state):
+        started = time.perf_counter()
+        try:
+            # Cheap nodes without an async implementation run inline rather than in a thread
+            result = await afunc(state) if afunc is not None else func(state)
+            return _record(result, node, started)
+        except Exception:
+            NODE_ERRORS.inc(node=node)
+            raise
+
+    return RunnableLambda(run, afunc=arun, name=node)
@@ -0,0 +1,200 @@
+"""Sliding-window velocity counters ("how many times did we see this device in the last hour").
+
+Each tracked value (a charge id, a device id, an IP address, ...) gets one ring buffer of
+time buckets per window. Every ring keeps a running total, so a lookup is O(1) apart from
+clearing buckets that have rotated out since the last access. A transaction is counted once
+per capture id, so checkpoint resumes, retried jobs and redeliveries don't inflate the counts.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.database import Transaction as TransactionRecord
+from app.models.schemas import Transaction
+
+DEFAULT_WINDOWS = {"1m": 60, "1h": 3600, "24h": 86400}
+
+FeatureKey = Tuple[str, str]
+
+
+class _Ring:
+    """Counts events in a fixed window using `size` buckets of equal width."""
+
+    __slots__ = ("width", "counts", "total", "head")
+
+    def __init__(self, window: float, size: int):
+        self.width = window / size
+        self.counts = [0] * size
+        self.total = 0
+        self.head = None
+
+    def _advance(self, now: float) -> None:
+        index = int(now // self.width)
+        if self.head is None:
+            self.head = index
+            return
+        steps = index - self.head
+        if steps <= 0:
+            return
+        size = len(self.counts)
+        if steps >= size:
+            self.counts = [0] * size
+            self.total = 0
+        else:
+            for i in range(1, steps + 1):
+                slot = (self.head + i) % size
+                self.total -= self.counts[slot]
+                self.counts[slot] = 0
+        self.head = index
+
+    def add(self, timestamp: float, now: float) -> None:
+        self._advance(now)
+        index = int(timestamp // self.width)
+        # Events older than the window (or from the future) are not counted
+        if self.head - len(self.counts) < index <= self.head:
+            self.counts[index % len(self.counts)] += 1
+            self.total += 1
+
+    def count(self, now: float) -> int:
+        self._advance(now)
+        return self.total
+
+
+class VelocityStore:
+    """Bounded in-memory store of per-value event counts over several sliding windows."""
+
+    def __init__(self, fields: Iterable[str] = (), windows: Optional[Dict[str, float]] = None,
+                 buckets_per_window: int = 60, max_keys: int = 100000,
+                 clock: Callable[[], float] = time.time):
+        self.fields = tuple(fields)
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.buckets_per_window = buckets_per_window
+        self.max_keys = max_keys
+        self._clock = clock
+        self._rings: "OrderedDict[FeatureKey, Dict[str, _Ring]]" = OrderedDict()
+        # Capture ids already counted, least recently seen first
+        self._counted: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def features_for(self, charge_id: Optional[str], metadata: Optional[dict]) -> Dict[str, FeatureKey]:
+        """Returns the tracked values of a transaction, labelled like 'device_id=abc'."""
+        features = {}
+        if charge_id:
+            features[f"charge_id={charge_id}"] = ("charge_id", charge_id)
+        for field in self.fields:
+            value = (metadata or {}).get(field)
+            if value is not None:
+                features[f"{field}={value}"] = (field, str(value))
+        return features
+
+    def _rings_for(self, key: FeatureKey) -> Dict[str, _Ring]:
+        rings = self._rings.get(key)
+        if rings is None:
+            rings = self._rings[key] = {
+                name: _Ring(window, self.buckets_per_window) for name, window in self.windows.items()
+            }
+            # Evict the least recently seen values to bound memory
+            while len(self._rings) > self.max_keys:
+                self._rings.popitem(last=False)
+        else:
+            self._rings.move_to_end(key)
+        return rings
+
+    def _add(self, features: Dict[str, FeatureKey], timestamp: float, now: float) -> None:
+        for key in features.values():
+            for ring in self._rings_for(key).values():
+                ring.add(timestamp, now)
+
+    def _first_sighting(self, capture_id: Optional[str]) -> bool:
+        """Marks the capture id as counted and returns whether it wasn't already; call with the lock held."""
+        if capture_id is None:
+            return True
+        if capture_id in self._counted:
+            self._counted.move_to_end(capture_id)
+            return False
+        self._counted[capture_id] = None
+        while len(self._counted) > self.max_keys:
+            self._counted.popitem(last=False)
+        return True
+
+    def record(self, features: Dict[str, FeatureKey], timestamp: Optional[float] = None,
+               capture_id: Optional[str] = None) -> None:
+        """Counts one event for the features, unless `capture_id` was counted before."""
+        now = self._clock()
+        timestamp = now if timestamp is None else timestamp
+        with self._lock:
+            if self._first_sighting(capture_id):
+                self._add(features, timestamp, now)
+
+    def lookup(self, features: Dict[str, FeatureKey]) -> Dict[str, Dict[str, int]]:
+        now = self._clock()
+        counts = {}
+        with self._lock:
+            for label, key in features.items():
+                rings = self._rings.get(key)
+                counts[label] = {name: rings[name].count(now) if rings else 0 for name in self.windows}
+        return counts
+
+    def observe(self, transaction: Transaction) -> Dict[str, Dict[str, int]]:
+        """Records the transaction unless it was counted before and returns the counts for its values, including itself."""
+        features = self.features_for(transaction.charge_id, transaction.transaction_metadata)
+        self.record(features, capture_id=transaction.capture_id)
+        return self.lookup(features)
+
+    def preview(self, transaction: Transaction) -> Dict[str, Dict[str, int]]:
+        """The counts observe() would return, without recording the transaction."""
+        counts = self.lookup(self.features_for(transaction.charge_id, transaction.transaction_metadata))
+        with self._lock:
+            pending = int(transaction.capture_id not in self._counted)
+        return {label: {name: count + pending for name, count in windows.items()} for label, windows in counts.items()}
+
+    def add(self, transaction: Transaction) -> None:
+        """Records a transaction whose counts were previewed, unless it was counted before."""
+        self.record(self.features_for(transaction.charge_id, transaction.transaction_metadata),
+                    capture_id=transaction.capture_id)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rings.clear()
+            self._counted.clear()
+
+    def rebuild_from_db(self, db: Session, batch_size: int = 10000) -> int:
+        """Replays transactions inside the longest window from the transactions table."""
+        since = datetime.now(timezone.utc) - timedelta(seconds=max(self.windows.values()))
+        query = (
+            db.query(TransactionRecord.capture_id, TransactionRecord.charge_id, TransactionRecord.transaction_metadata,
+                     TransactionRecord.created_at)
+            .filter(TransactionRecord.created_at >= since.replace(tzinfo=None))
+            .yield_per(batch_size)
+        )
+        count = 0
+        for capture_id, charge_id, metadata, created_at in query:
+            # created_at is stored as naive UTC
+            timestamp = created_at.replace(tzinfo=timezone.utc).timestamp()
+            self.record(self.features_for(charge_id, metadata if isinstance(metadata, dict) else None), timestamp,
+                        capture_id=capture_id)
+            count += 1
+        return count
+
+
+def exceeded_limits(velocity: Dict[str, Dict[str, int]], limits: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """Returns the counts that are over their window's limit."""
+    exceeded = {}
+    for label, counts in velocity.items():
+        over = {window: count for window, count in counts.items() if window in limits and count > limits[window]}
+        if over:
+            exceeded[label] = over
+    return exceeded
+
+
+def describe_velocity(velocity: Dict[str, Dict[str, int]]) -> str:
+    if not velocity:
+        return "No velocity data."
+    return "; ".join(
+        f"{label}: " + ", ".join(f"{count} in {window}" for window, count in counts.items())
+        for label, counts in velocity.items()
+    )
@@ -0,0 +1,280 @@
+"""Bulk ingestion of transaction dumps.
+
+Streams JSONL or CSV files (optionally gzipped) through agentic_system in fixed-size chunks:
+each chunk is validated against the Transaction schema, processed with micro-batched LLM
+calls, and bulk-inserted together with its statistics and a checkpoint in one commit. Rows
+whose capture id is already stored are skipped before any agent runs. Only one chunk is held
+in memory at a time, and an interrupted run resumes after the last committed chunk.
+
+    python -m app.ingest transactions.jsonl dump.csv.gz --chunk-size 1000 --concurrency 100
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.agents.batch import aprocess_transactions
+from app.agents.failure_detection_agent import warm_fraud_scorer, warm_velocity_store
+from app.core.config import BATCH_MAX_CONCURRENCY, INGEST_CHUNK_SIZE
+from app.models.database import AsyncSessionLocal, IngestCheckpoint, Transaction as TransactionRecord, create_schema
+from app.models.persistence import record_values
+from app.models.schemas import Transaction
+from app.models.stats import StatsDelta, apply_stats
+
+logger = logging.getLogger(__name__)
+
+# Capture ids per existence query, below SQLite's oldest limit of 999 bound parameters
+LOOKUP_BATCH_SIZE = 900
+
+
+def _open_text(path: Path) -> io.TextIOBase:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _file_format(path: Path) -> str:
+    suffixes = [suffix for suffix in path.suffixes if suffix != ".gz"]
+    return "csv" if suffixes and suffixes[-1] == ".csv" else "jsonl"
+
+
+def _csv_payload(row: dict) -> dict:
+    """Turns a flat CSV row into the nested API payload ('amount.value' -> {'amount': {'value': ...}})."""
+    payload: dict = {}
+    for column, value in row.items():
+        if column is None or value == "":
+            continue
+        target = payload
+        *parents, leaf = column.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    if isinstance(payload.get("metadata"), str):
+        try:
+            payload["metadata"] = json.loads(payload["metadata"])
+        except json.JSONDecodeError:
+            pass  # left as a string, so the row is rejected by validation
+    payload.setdefault("metadata", {})
+    return payload
+
+
+def read_rows(path: Path) -> Iterator[dict]:
+    """Yields the raw payload of every row in a JSONL or CSV file, reading it incrementally.
+
+    Malformed JSON lines are yielded as strings so they are rejected with their row number.
+    """
+    with _open_text(path) as handle:
+        if _file_format(path) == "csv":
+            for row in csv.DictReader(handle):
+                yield _csv_payload(row)
+        else:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield line
+
+
+@dataclass
+class IngestStats:
+    rows: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def describe(self) -> str:
+        return (
+            f"{self.rows} rows ({self.inserted} inserted, {self.rejected} rejected, {self.duplicates} duplicates, "
+            f"{self.skipped} skipped from an earlier run) in {self.elapsed:.1f}s, {self.rows_per_second:.0f} rows/s"
+        )
+
+
+def _validate(payloads: List[dict], first_row: int, stats: IngestStats) -> List[Transaction]:
+    transactions = []
+    for row_number, payload in enumerate(payloads, start=first_row):
+        try:
+            transactions.append(Transaction.model_validate(payload))
+        except (ValidationError, TypeError) as e:
+            stats.rejected += 1
+            logger.warning("Row %d rejected: %s", row_number, e)
+    return transactions
+
+
+async def _prepare_schema(session_factory: Callable) -> None:
+    """Creates the tables and indexes ingestion writes to, so a run works against a fresh database."""
+    async with session_factory() as db:
+        await db.run_sync(lambda session: create_schema(session.connection()))
+        await db.commit()
+
+
+async def _stored_capture_ids(session_factory: Callable, capture_ids: List[str]) -> Set[str]:
+    stored = set()
+    async with session_factory() as db:
+        for start in range(0, len(capture_ids), LOOKUP_BATCH_SIZE):
+            batch = capture_ids[start:start + LOOKUP_BATCH_SIZE]
+            stored.update((await db.execute(
+                select(TransactionRecord.capture_id).where(TransactionRecord.capture_id.in_(batch))
+            )).scalars())
+    return stored
+
+
+def _new_transactions(transactions: List[Transaction], skip: Iterable[str]) -> List[Transaction]:
+    """The transactions whose capture id is neither in `skip` nor repeated earlier in the chunk."""
+    seen = set(skip)
+    new = []
+    for transaction in transactions:
+        if transaction.capture_id not in seen:
+            seen.add(transaction.capture_id)
+            new.append(transaction)
+    return new
+
+
+async def _load_checkpoint(session_factory: Callable, source: str) -> int:
+    async with session_factory() as db:
+        checkpoint = await db.get(IngestCheckpoint, source)
+        return checkpoint.rows_done if checkpoint else 0
+
+
+async def _insert_rows_individually(db, records: List[dict]) -> List[dict]:
+    """Inserts records one by one in savepoints and returns the ones that were not already present."""
+    inserted = []
+    for record in records:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(TransactionRecord), [record])
+            inserted.append(record)
+        except IntegrityError:
+            logger.debug("Skipping duplicate transaction %s", record["capture_id"])
+    return inserted
+
+
+async def _commit_chunk(session_factory: Callable, source: str, records: List[dict], rows_done: int) -> int:
+    """Bulk-inserts a chunk with its statistics and checkpoint in one commit; returns rows inserted."""
+    async with session_factory() as db:
+        try:
+            if records:
+                await db.execute(insert(TransactionRecord), records)
+            inserted = records
+        except IntegrityError:
+            # Rows already in the table (e.g. received over HTTP) shouldn't fail the whole chunk
+            await db.rollback()
+            inserted = await _insert_rows_individually(db, records)
+
+        delta = StatsDelta()
+        for record in inserted:
+            delta.count_received(record)
+            if record.get("fulfillment_status") is not None:
+                delta.count_processed(record, record["created_at"])
+        await apply_stats(db, delta)
+        await db.merge(IngestCheckpoint(source=source, rows_done=rows_done))
+        await db.commit()
+        return len(inserted)
+
+
+async def ingest_file(path, session_factory: Callable = AsyncSessionLocal, chunk_size: int = INGEST_CHUNK_SIZE,
+                      max_concurrency: int = BATCH_MAX_CONCURRENCY, restart: bool = False,
+                      source: Optional[str] = None) -> IngestStats:
+    """Ingests one file, resuming after its last committed chunk unless `restart` is set."""
+    path = Path(path)
+    source = source or str(path.resolve())
+    stats = IngestStats()
+    await _prepare_schema(session_factory)
+    rows_done = 0 if restart else await _load_checkpoint(session_factory, source)
+    stats.skipped = rows_done
+
+    rows = read_rows(path)
+    # Skipped rows are only parsed, not validated or processed
+    for _ in itertools.islice(rows, rows_done):
+        pass
+
+    started = time.perf_counter()
+    pending: Optional[Tuple[asyncio.Task, int, Set[str]]] = None
+
+    async def settle() -> None:
+        task, count, _ = pending
+        stats.inserted += await task
+        stats.duplicates += count - task.result()
+
+    while True:
+        payloads = list(itertools.islice(rows, chunk_size))
+        if not payloads:
+            break
+        transactions = _validate(payloads, rows_done + 1, stats)
+        # Rows already stored, or in the previous chunk whose commit may still be running, would only be
+        # processed to be rejected as duplicates on insert
+        stored = await _stored_capture_ids(session_factory, [transaction.capture_id for transaction in transactions])
+        if pending is not None:
+            stored.update(pending[2])
+        new = _new_transactions(transactions, stored)
+        stats.duplicates += len(transactions) - len(new)
+        transactions = new
+        final_states = await aprocess_transactions(transactions, max_concurrency=max_concurrency) if transactions else []
+        created_at = datetime.utcnow()
+        records = [
+            {**record_values(transaction, final_state), "created_at": created_at}
+            for transaction, final_state in zip(transactions, final_states)
+        ]
+        rows_done += len(payloads)
+        stats.rows += len(payloads)
+
+        # The previous chunk's commit overlaps with processing this one; commits stay in file order
+        if pending is not None:
+            await settle()
+        pending = (asyncio.create_task(_commit_chunk(session_factory, source, records, rows_done)), len(records),
+                   {record["capture_id"] for record in records})
+
+        stats.elapsed = time.perf_counter() - started
+        logger.info("%s: %d rows, %.0f rows/s", path.name, stats.skipped + stats.rows, stats.rows_per_second)
+
+    if pending is not None:
+        await settle()
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run JSONL/CSV transaction dumps through the agentic system.")
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY)
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints and start from the first row")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def run():
+        # Baselines and velocity counters from the stored transactions, as the app builds them at startup,
+        # so ingested rows are screened locally instead of all escalating to the model
+        await _prepare_schema(AsyncSessionLocal)
+        await asyncio.to_thread(warm_fraud_scorer)
+        await asyncio.to_thread(warm_velocity_store)
+        for path in args.files:
+            stats = await ingest_file(path, chunk_size=args.chunk_size, max_concurrency=args.concurrency,
+                                      restart=args.restart)
+            print(f"{path}: {stats.describe()}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,128 @@
-import uvicorn
-import webbrowser
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from app.models.schemas import Transaction
-from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Depends
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from app.agents.router import agentic_system
-from app.core.state import AgentState
-from app.models.database import SessionLocal, Base, engine
-from typing import Optional
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from langgraph.graph import END
+from pydantic import ValidationError
+from app.agents.durable import (
+    ainvoke_durable, astream_durable, checkpoint_stats, compact_checkpoints, discard_run, interrupted_transactions,
+    release_runs, renew_run_leases
+)
+from app.agents.batch import aprocess_transactions
+from app.agents.recovery_agent import warm_recovery_summaries
+from app.agents.failure_detection_agent import warm_fraud_scorer, warm_velocity_store
+from app.core.config import (
+    CHECKPOINT_RESUME_ON_STARTUP, DATABASE_URL, EXPORT_BATCH_SIZE, JOB_MAX_WAIT_S, JOB_RETRY_AFTER_S, RECOVERY_SUMMARY_WARM, WRITE_BEHIND_DURABLE
+)
+from app.core.cache import verdict_cache
+from app.core.cascade import cascade_stats
+from app.core.codec import FastJSONResponse, dumps_text
+from app.core.idempotency import processing_guard
+from app.core.leases import keep_alive
+from app.core.metrics import registry
+from app.core.state import AgentState, new_agent_state
+from app.models.database import Base, SessionLocal, AsyncSessionLocal, engine, async_engine, create_schema, get_db, Transaction as TransactionRecord
+from app.models.jobs import QueueFull, job_queue
+from app.models.pagination import InvalidCursor, TransactionFilters, export_ndjson, iter_transactions, read_page
+from app.models.persistence import (
+    ConflictingRedelivery, check_redelivery, load_results, record_values, result_values, stored_state, write_behind
+)
+from app.models.stats import read_counters, read_stats, rebuild_stats
+from typing import AsyncIterator, Callable, List, Optional, Tuple
 import os
 from pathlib import Path
 import asyncio
+import logging
 from contextlib import asynccontextmanager
 
+logger = logging.getLogger(__name__)
+
 # Set up paths
 BASE_DIR = Path(__file__).resolve().parent.parent
 STATIC_DIR = BASE_DIR / "frontend" / "static"
 TEMPLATES_DIR = BASE_DIR / "frontend" / "templates"
 
-# Create static directories if they don't exist
-STATIC_DIR.mkdir(parents=True, exist_ok=True)
-(STATIC_DIR / "css").mkdir(exist_ok=True)
-(STATIC_DIR / "js").mkdir(exist_ok=True)
+def warm_idempotency() -> None:
+    """Adds every stored capture id to the idempotency filter."""
+    db = SessionLocal()
+    try:
+        for (capture_id,) in db.query(TransactionRecord.capture_id).yield_per(10000):
+            processing_guard.add(capture_id)
+    finally:
+        db.close()
+
+def backfill_stats() -> bool:
+    db = SessionLocal()
+    try:
+        return rebuild_stats(db)
+    finally:
+        db.close()
+
+def prepare_environment() -> None:
+    """Creates the static directories and the database schema if they don't exist."""
+    for directory in (STATIC_DIR, STATIC_DIR / "css", STATIC_DIR / "js"):
+        directory.mkdir(parents=True, exist_ok=True)
+    create_schema(engine)
 
-# Initialize database
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Done at startup rather than import so importing the app (workers, tests, tools) stays cheap
+    await run_in_threadpool(prepare_environment)
+    await run_in_threadpool(backfill_stats)
+    await run_in_threadpool(warm_idempotency)
+    await run_in_threadpool(warm_fraud_scorer)
+    await run_in_threadpool(warm_velocity_store)
+    if RECOVERY_SUMMARY_WARM:
+        await warm_recovery_summaries()
+    await run_in_threadpool(compact_checkpoints)
+    await write_behind.start()
+    await job_queue.start(process_job)
+    # Keeps other processes sharing the checkpoint file from resuming the runs this one is executing
+    leases = asyncio.create_task(keep_alive(lambda: run_in_threadpool(renew_run_leases)))
+    # Interrupted runs are finished in the background so startup doesn't wait on their model calls
+    resuming = asyncio.create_task(resume_interrupted_runs()) if CHECKPOINT_RESUME_ON_STARTUP else None
+    yield
+    # Stop taking jobs, then flush queued writes before the engine goes away
+    if resuming is not None:
+        resuming.cancel()
+    await job_queue.stop()
+    leases.cancel()
+    await run_in_threadpool(release_runs)
+    await write_behind.stop()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Self-Healing Agentic System",
     description="An agentic system for processing transactions with self-healing capabilities.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
-# Mount static files
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+# Gauges read from the live objects whenever /metrics is scraped
+registry.gauge("write_behind_queue_depth", "Writes waiting for the next group commit.",
+               callback=lambda: [({}, write_behind.stats()["queued"])])
+registry.gauge("verdict_cache_entries", "Verdicts held in the in-process cache.",
+               callback=lambda: [({}, verdict_cache.stats()["size"])])
+registry.gauge("job_queue_depth", "Jobs waiting for or being processed by a worker.", ["state"],
+               callback=lambda: [({"state": state}, job_queue.stats()[state]) for state in ("queued", "running")])
+registry.gauge("checkpoint_unfinished_runs", "Agent graph runs with checkpoints, i.e. in progress or interrupted.",
+               callback=lambda: [({}, checkpoint_stats()["unfinished_runs"])])
+registry.gauge("idempotency_in_flight", "Transactions being processed or awaiting their commit.",
+               callback=lambda: [({}, processing_guard.stats()["in_flight"])])
 
-# Database connection management
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Mount static files
+app.mount("/static", StaticFiles(directory=str(STATIC_DIR), check_dir=False), name="static")
 
 # Health check endpoint
 @app.get("/health")
@@ -63,79 +136,283 @@ async def serve_static(path: str):
 
 # Connection status endpoint
 @app.get("/api/connection")
-async def check_connection():
+async def check_connection(db: AsyncSession = Depends(get_db)):
+    # Test the connection by executing a simple query
     try:
-        # First try to create a new session
-        db = SessionLocal()
-        
-        # Test the connection by executing a simple query
-        try:
-            result = db.execute("SELECT 1").fetchone()
-            if result and result[0] == 1:
-                return JSONResponse(content={"connected": True})
-            else:
-                return JSONResponse(content={"connected": False, "error": "Invalid query result"}, status_code=500)
-        except Exception as e:
-            error_msg = str(e)
-            if "No such file or directory" in error_msg:
-                return JSONResponse(content={"connected": False, "error": "Database file not found. Please restart the application."}, status_code=500)
-            return JSONResponse(content={"connected": False, "error": error_msg}, status_code=500)
-        finally:
-            try:
-                db.close()
-            except:
-                pass
+        result = (await db.execute(text("SELECT 1"))).fetchone()
+        if result and result[0] == 1:
+            return JSONResponse(content={"connected": True})
+        else:
+            return JSONResponse(content={"connected": False, "error": "Invalid query result"}, status_code=500)
     except Exception as e:
         error_msg = str(e)
         if "No such file or directory" in error_msg:
             return JSONResponse(content={"connected": False, "error": "Database file not found. Please restart the application."}, status_code=500)
         return JSONResponse(content={"connected": False, "error": error_msg}, status_code=500)
 
-@app.post("/process_transaction/", response_model=AgentState)
-async def process_transaction(transaction: Transaction, db: Session = Depends(get_db)):
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return JSONResponse(content=verdict_cache.stats())
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/llm/cascade")
+async def llm_cascade_stats():
+    """Per agent and model tier: answers, escalation rate, mean latency and estimated spend."""
+    return JSONResponse(content=cascade_stats())
+
+@app.get("/api/idempotency/stats")
+async def idempotency_stats():
+    return JSONResponse(content=processing_guard.stats())
+
+async def transaction_body(request: Request) -> Transaction:
+    """Parses the request body straight from bytes into a Transaction, skipping the intermediate dict."""
     try:
-        # Create transaction record
-        db_transaction = Transaction(
-            capture_id=transaction.capture_id,
-            request_id=transaction.request_id,
-            charge_id=transaction.charge_id,
-            status=transaction.status,
-            amount_value=transaction.amount.value,
-            amount_currency=transaction.amount.currency,
-            transaction_metadata=transaction.transaction_metadata,
-            is_valid=None,
-            is_fraudulent=None,
-            fulfillment_status=None,
-            error_message=None,
-            history=[]
+        return Transaction.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
         )
-        db.add(db_transaction)
-        db.commit()
-        db.refresh(db_transaction)
+
+# The body is read by transaction_body, so the schema is declared here for the API docs
+TRANSACTION_BODY = {"requestBody": {"required": True, "content": {
+    "application/json": {"schema": {"$ref": "#/components/schemas/Transaction"}}
+}}}
+
+def stored_result_loader(transaction: Transaction):
+    """Loads the stored final state of an earlier delivery of `transaction` for the idempotency guard."""
+    async def load(capture_id: str) -> Optional[AgentState]:
+        values = await load_results(capture_id)
+        return stored_state(transaction, values) if values is not None else None
+    return load
+
+def transaction_runner(transaction: Transaction, durable: bool,
+                       on_node: Optional[Callable[[str, dict], None]] = None):
+    """The unit of work for one delivery, for the idempotency guard. If given, `on_node` gets each node's delta."""
+    async def execute():
+        # Record the transaction; inserts and updates are group-committed in the background
+        write_behind.enqueue_insert(record_values(transaction))
 
         # Process transaction through agentic system
-        initial_state = AgentState(
-            transaction=db_transaction,
-            is_valid=None,
-            is_fraudulent=None,
-            fulfillment_status=None,
-            error_message=None,
-            history=[]
-        )
+        initial_state = new_agent_state(transaction)
         
-        final_state = agentic_system.invoke(initial_state)
+        # Checkpointed, so a run this transaction's earlier delivery left part-way resumes where it stopped
+        if on_node is None:
+            final_state = await ainvoke_durable(initial_state)
+        else:
+            async for node, delta in astream_durable(initial_state):
+                if node == END:
+                    final_state = delta
+                else:
+                    on_node(node, delta)
         
-        # Update transaction record with processing results
-        db_transaction.is_valid = final_state.is_valid
-        db_transaction.is_fraudulent = final_state.is_fraudulent
-        db_transaction.fulfillment_status = final_state.fulfillment_status
-        db_transaction.error_message = final_state.error_message
-        db_transaction.history = final_state.history
-        db.commit()
-        
-        return final_state
+        # Update transaction record with processing results, waiting for the commit if asked to. The update
+        # fails if it matches no row, so a record whose insert failed (e.g. a conflicting charge id) fails the request;
+        # an insert that only failed because an earlier delivery already recorded the transaction doesn't.
+        written = write_behind.enqueue_update(
+            transaction.capture_id, result_values(final_state), record=record_values(transaction, final_state)
+        )
+        if durable:
+            await written
+        return final_state, written
+    return execute
+
+async def process_once(transaction: Transaction, execute) -> Tuple[AgentState, bool]:
+    """Runs a delivery through the idempotency guard; returns the final state and whether it was replayed.
+    A replay must be of the same transaction, otherwise ConflictingRedelivery is raised."""
+    final_state, replayed = await processing_guard.run(transaction.capture_id, execute, stored_result_loader(transaction))
+    if replayed:
+        # Stored results are checked as they are loaded; this covers a result shared by a run still in flight
+        check_redelivery(transaction, record_values(final_state['transaction']))
+    return final_state, replayed
+
+@app.post("/process_transaction/", response_model=AgentState, openapi_extra=TRANSACTION_BODY)
+async def process_transaction(transaction: Transaction = Depends(transaction_body), durable: bool = WRITE_BEHIND_DURABLE):
+    try:
+        # A redelivered transaction gets its stored result; concurrent deliveries share one run
+        final_state, replayed = await process_once(transaction, transaction_runner(transaction, durable))
+        # Encoded directly, the transaction from its cached encoding, instead of validated against AgentState
+        return FastJSONResponse(final_state, headers={"Idempotent-Replayed": "true"} if replayed else None)
+    except ConflictingRedelivery as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def resume_interrupted_runs() -> int:
+    """Finishes the runs a previous process left part-way, each from its last completed node."""
+    transactions = await run_in_threadpool(interrupted_transactions)
+    for transaction in transactions:
+        try:
+            _, replayed = await process_once(transaction, transaction_runner(transaction, False))
+            if replayed:
+                # The result was stored before the process stopped; only the checkpoints were left
+                discard_run(transaction.capture_id)
+        except Exception:
+            logger.exception("Could not resume the interrupted run of %s", transaction.capture_id)
+    if transactions:
+        logger.info("Resumed %d interrupted runs", len(transactions))
+    return len(transactions)
+
+async def process_job(transaction: Transaction) -> AgentState:
+    """Unit of work for the job queue workers; redelivered transactions are answered from the idempotency guard."""
+    final_state, _ = await process_once(transaction, transaction_runner(transaction, WRITE_BEHIND_DURABLE))
+    return final_state
+
+@app.post("/process_transaction/jobs", status_code=202, openapi_extra=TRANSACTION_BODY)
+async def submit_transaction_job(transaction: Transaction = Depends(transaction_body)):
+    """Accepts a transaction for background processing and returns its job id without waiting for the agents."""
+    try:
+        job_id = await job_queue.submit(transaction)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {e}",
+                            headers={"Retry-After": str(JOB_RETRY_AFTER_S)})
+    status_url = f"/jobs/{job_id}"
+    return FastJSONResponse(status_code=202, headers={"Location": status_url},
+                        content={"job_id": job_id, "status": "queued", "status_url": status_url})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=JOB_MAX_WAIT_S)):
+    """Job status and, once done, its final state. `wait` long-polls for up to that many seconds."""
+    job = await job_queue.get(job_id, wait=wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(content=job)
+
+@app.get("/api/jobs/stats")
+async def job_stats():
+    return JSONResponse(content=job_queue.stats())
+
+async def stream_transaction(transaction: Transaction, durable: bool) -> AsyncIterator[Tuple[str, dict]]:
+    """Processes a delivery like /process_transaction/, yielding a "node" event as each node finishes
+    and then a "result" (or "error") event. Replayed deliveries only get the result."""
+    updates: asyncio.Queue = asyncio.Queue()
+    execute = transaction_runner(transaction, durable, lambda node, delta: updates.put_nowait({"node": node, "delta": delta}))
+    # Runs to completion (and is persisted) even if the client goes away mid-stream
+    run = asyncio.ensure_future(process_once(transaction, execute))
+    run.add_done_callback(lambda task: task.cancelled() or task.exception())
+    getter = None
+    try:
+        while True:
+            getter = asyncio.ensure_future(updates.get())
+            await asyncio.wait({getter, run}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                break
+            yield "node", {"capture_id": transaction.capture_id, **getter.result()}
+        while not updates.empty():
+            yield "node", {"capture_id": transaction.capture_id, **updates.get_nowait()}
+
+        try:
+            final_state, replayed = run.result()
+        except Exception as e:
+            yield "error", {"capture_id": transaction.capture_id, "detail": str(e)}
+            return
+        yield "result", {"capture_id": transaction.capture_id, "replayed": replayed, "state": final_state}
+    finally:
+        if getter is not None:
+            getter.cancel()
+
+@app.post("/process_transaction/stream", openapi_extra=TRANSACTION_BODY)
+async def process_transaction_stream(transaction: Transaction = Depends(transaction_body), durable: bool = WRITE_BEHIND_DURABLE):
+    """Server-Sent Events variant of /process_transaction/: one event per finished node, then the final state."""
+    async def events():
+        async for event, data in stream_transaction(transaction, durable):
+            yield f"event: {event}\ndata: {dumps_text(data)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws/process_transaction")
+async def process_transaction_socket(websocket: WebSocket, durable: bool = WRITE_BEHIND_DURABLE):
+    """WebSocket variant: each message is a transaction, and its node, result or error events are sent back
+    tagged with its capture_id. Transactions on one connection are processed concurrently."""
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    tasks = set()
+
+    async def send(event: str, data: dict) -> None:
+        async with send_lock:
+            await websocket.send_text(dumps_text({"event": event, **data}))
+
+    async def process(transaction: Transaction) -> None:
+        try:
+            async for event, data in stream_transaction(transaction, durable):
+                await send(event, data)
+        except (WebSocketDisconnect, RuntimeError):
+            # Client went away; processing itself carries on inside stream_transaction's task
+            pass
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                transaction = Transaction.model_validate(message)
+            except ValidationError as e:
+                await send("error", {"capture_id": message.get("captureId") if isinstance(message, dict) else None,
+                                     "detail": e.errors(include_url=False)})
+                continue
+            task = asyncio.create_task(process(transaction))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+
+@app.post("/process_transactions/batch", response_model=List[AgentState])
+async def process_transactions_batch(transactions: List[Transaction]):
+    if not transactions:
+        return FastJSONResponse([])
+    try:
+        # Transactions already processed (or repeated within the batch) are answered with their stored result
+        replays = list(await asyncio.gather(*(
+            processing_guard.lookup(transaction.capture_id, stored_result_loader(transaction))
+            for transaction in transactions
+        )))
+        # A repeat, stored or within the batch, must be of the same transaction
+        first = {}
+        for transaction, replay in zip(transactions, replays):
+            earlier = replay['transaction'] if replay is not None else first.setdefault(transaction.capture_id, transaction)
+            check_redelivery(transaction, record_values(earlier))
+
+        # The rest are claimed, so single deliveries arriving meanwhile wait for the batch instead of running again.
+        # A transaction another delivery claimed after the lookup waits for that delivery's run instead
+        pending, contended = {}, []
+        for i, (transaction, replay) in enumerate(zip(transactions, replays)):
+            if replay is not None or transaction.capture_id in pending:
+                continue
+            if processing_guard.claim(transaction.capture_id):
+                pending[transaction.capture_id] = transaction
+            else:
+                contended.append(i)
+
+        # Results are only written once the whole batch is processed, as one group commit
+        try:
+            processed = dict(zip(pending, await aprocess_transactions(pending.values())))
+        except BaseException as e:
+            for capture_id in pending:
+                processing_guard.abandon(capture_id, e)
+            raise
+        written = []
+        for capture_id, final_state in processed.items():
+            # Recorded like transaction_runner does, so a row an earlier delivery inserted without its result
+            # gets the result instead of failing the batch on the duplicate insert
+            write_behind.enqueue_insert(record_values(pending[capture_id]))
+            written.append(write_behind.enqueue_update(
+                capture_id, result_values(final_state), record=record_values(pending[capture_id], final_state)
+            ))
+            processing_guard.complete(capture_id, final_state, written[-1])
+        await asyncio.gather(*written)
+        for i, (final_state, _) in zip(contended, await asyncio.gather(*(
+            process_once(transactions[i], transaction_runner(transactions[i], True)) for i in contended
+        ))):
+            replays[i] = final_state
+        return FastJSONResponse([
+            replay if replay is not None else processed[transaction.capture_id]
+            for transaction, replay in zip(transactions, replays)
+        ])
+    except ConflictingRedelivery as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/")
@@ -143,50 +420,63 @@ async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/dashboard")
-async def dashboard(request: Request):
-    db = SessionLocal()
-    try:
-        # Get recent transactions
-        transactions = db.query(Transaction).order_by(Transaction.created_at.desc()).limit(10).all()
-        
-        # Get statistics
-        total_transactions = db.query(Transaction).count()
-        successful_transactions = db.query(Transaction).filter(Transaction.status == "SUCCESS").count()
-        
-        return templates.TemplateResponse("dashboard.html", {
-            "request": request,
-            "transactions": transactions,
-            "total_transactions": total_transactions,
-            "successful_transactions": successful_transactions
-        })
-    finally:
-        db.close()
+async def dashboard(request: Request, db: AsyncSession = Depends(get_db)):
+    # Get recent transactions (created_at is indexed)
+    transactions = (await db.execute(
+        select(TransactionRecord).order_by(TransactionRecord.created_at.desc()).limit(10)
+    )).scalars().all()
+    
+    # Get statistics from the maintained counters rather than counting the table
+    counters = await read_counters(db)
+    
+    return templates.TemplateResponse("dashboard.html", {
+        "request": request,
+        "transactions": transactions,
+        "total_transactions": counters.get("total", 0),
+        "successful_transactions": counters.get("status:SUCCESS", 0)
+    })
+
+@app.get("/api/stats")
+async def get_stats(hours: int = 24, db: AsyncSession = Depends(get_db)):
+    return JSONResponse(content=await read_stats(db, hours=hours))
 
 @app.get("/transaction/{transaction_id}")
-async def get_transaction(transaction_id: int, request: Request):
-    db = SessionLocal()
-    try:
-        transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
-        if not transaction:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        return templates.TemplateResponse("transaction_detail.html", {
-            "request": request,
-            "transaction": transaction
-        })
-    finally:
-        db.close()
+async def get_transaction(transaction_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    transaction = await db.get(TransactionRecord, transaction_id)
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    return templates.TemplateResponse("transaction_detail.html", {
+        "request": request,
+        "transaction": transaction
+    })
 
 @app.get("/api/transactions")
-def get_transactions(skip: int = 0, limit: int = 10):
-    db = SessionLocal()
+async def get_transactions(
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = None,
+    filters: TransactionFilters = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    # Newest first; pass the returned next_cursor to fetch the following page
     try:
-        transactions = db.query(Transaction).offset(skip).limit(limit).all()
-        return transactions
-    finally:
-        db.close()
+        return JSONResponse(content=await read_page(db, filters, limit, cursor))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/transactions/export")
+async def export_transactions(gzip: bool = False, filters: TransactionFilters = Depends()):
+    # Streams every matching row as NDJSON, fetching EXPORT_BATCH_SIZE rows at a time
+    batches = iter_transactions(AsyncSessionLocal, filters, EXPORT_BATCH_SIZE)
+    headers = {"Content-Disposition": 'attachment; filename="transactions.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export_ndjson(batches, compress=gzip), media_type="application/x-ndjson", headers=headers)
 
 if __name__ == "__main__":
+    import uvicorn
+    import webbrowser
+
     # Check if database exists and create if needed
     from pathlib import Path
     db_path = Path(DATABASE_URL.replace('sqlite:///', ''))
@@ -1,23 +1,80 @@
-from sqlalchemy import create_engine
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# You can change this to another DB like PostgreSQL if needed
-from pathlib import Path
+from app.core.codec import dumps_text, loads
+from app.core.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS
+)
 
-# Get absolute path to database file
-BASE_DIR = Path(__file__).resolve().parent.parent
-DATABASE_URL = f"sqlite:///{BASE_DIR}/transactions.db"
+# Default async driver per backend, and drivers that are already async
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+ASYNC_DRIVER_NAMES = {"aiosqlite", "asyncpg", "psycopg", "aiomysql", "asyncmy"}
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def async_database_url(url: str) -> str:
+    """Maps a database URL to the same database through an async driver."""
+    parsed = make_url(url)
+    if "+" in parsed.drivername and parsed.get_driver_name() in ASYNC_DRIVER_NAMES:
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer and NORMAL sync only fsyncs at checkpoints
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def _engine_options(url: str) -> dict:
+    # JSON columns (metadata, history, job payloads and results) are encoded with orjson
+    codec = {"json_serializer": dumps_text, "json_deserializer": loads}
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}, **codec}
+    return {
+        **codec,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+def make_engine(url: str = DATABASE_URL) -> Engine:
+    """Creates a blocking engine, used for startup work, scripts and the CLI."""
+    engine = create_engine(url, **_engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+def make_async_engine(url: str = DATABASE_URL):
+    """Creates the async engine used on the request path."""
+    async_engine = create_async_engine(async_database_url(url), **_engine_options(url))
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return async_engine
+
+engine = make_engine()
+async_engine = make_async_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_db():
+    """FastAPI dependency yielding an async session per request."""
+    async with AsyncSessionLocal() as db:
+        yield db
 
 Base = declarative_base()
 
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Boolean, Index
 from datetime import datetime
 
 class User(Base):
@@ -51,5 +108,100 @@ class Transaction(Base):
     error_message = Column(String)
     history = Column(JSON)
 
+    # Keyset pagination walks (created_at, id) newest first, optionally within one filter value. These also serve
+    # lookups and range scans on their leading columns (status, created_at), so those need no index of their own
+    __table_args__ = (
+        Index("ix_transactions_created_at_id", "created_at", "id"),
+        Index("ix_transactions_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_transactions_currency_created_at_id", "amount_currency", "created_at", "id"),
+        Index("ix_transactions_fulfillment_status_created_at_id", "fulfillment_status", "created_at", "id"),
+        Index("ix_transactions_is_fraudulent_created_at_id", "is_fraudulent", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<Transaction(capture_id='{self.capture_id}', status='{self.status}')>"
+
+class StatCounter(Base):
+    """Running totals maintained as transactions are written (e.g. 'total', 'status:SUCCESS')."""
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class TransactionRollup(Base):
+    """Processed transactions per hour, currency and fulfillment status."""
+    __tablename__ = "transaction_rollups"
+
+    hour = Column(DateTime, primary_key=True)
+    currency = Column(String, primary_key=True)
+    fulfillment_status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    amount_total = Column(Integer, nullable=False, default=0)
+
+class IngestCheckpoint(Base):
+    """How many rows of a bulk ingestion source have been committed, so interrupted runs can resume."""
+    __tablename__ = "ingest_checkpoints"
+
+    source = Column(String, primary_key=True)
+    rows_done = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ProcessingJob(Base):
+    """A transaction accepted for asynchronous processing; the queue survives restarts."""
+    __tablename__ = "processing_jobs"
+
+    id = Column(String, primary_key=True)
+    capture_id = Column(String, index=True)
+    payload = Column(JSON, nullable=False)
+    # queued -> running -> done | failed; a running job whose owner stops renewing heartbeat_at is queued again
+    status = Column(String, nullable=False, default="queued")
+    result = Column(JSON)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    # The process running the job (see app.core.leases) and when it last confirmed it still is
+    owner = Column(String)
+    heartbeat_at = Column(DateTime)
+
+    # Startup recovery reads the unfinished jobs in arrival order
+    __table_args__ = (
+        Index("ix_processing_jobs_status_created_at", "status", "created_at"),
+    )
+
+# Indexes earlier versions created that a composite index now covers, by name and column
+OBSOLETE_INDEXES = {"ix_transactions_status": "status", "ix_transactions_created_at": "created_at"}
+
+def _add_missing_columns(bind) -> None:
+    """Adds columns added to the models since their tables were created; such columns are nullable."""
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        statements = [
+            text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}")
+            for column in table.columns if column.name not in existing
+        ]
+        if not statements:
+            continue
+        if isinstance(bind, Engine):
+            with bind.begin() as connection:
+                for statement in statements:
+                    connection.execute(statement)
+        else:
+            for statement in statements:
+                bind.execute(statement)
+
+def create_schema(bind: Engine = None) -> None:
+    """Creates missing tables, and any columns and indexes added to existing tables since they were created,
+    and drops obsolete indexes."""
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    _add_missing_columns(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    # Dropped through a detached copy of the table, so the model's own metadata never carries them
+    transactions = Transaction.__table__.to_metadata(MetaData())
+    existing = {index["name"] for index in inspect(bind).get_indexes(transactions.name)}
+    for name, column in OBSOLETE_INDEXES.items():
+        if name in existing:
+            Index(name, transactions.c[column]).drop(bind=bind)
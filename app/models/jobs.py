@@ -0,0 +1,234 @@
+"""Accept-then-process job queue.
+
+Submitting stores the transaction as a queued job and returns its id at once; a fixed pool of
+workers runs jobs through the agentic system and stores each final state on its job row, where
+a status request (optionally long-polling) picks it up. The queue is bounded: once `max_depth`
+jobs are waiting or running, submissions are refused, so a burst sheds at the door instead of
+piling up inside the server.
+
+Several processes may share the table. A worker claims a job (queued -> running, with its
+process as the owner) before running it, so each job runs once however many processes have it
+queued, and renews the claim while it runs. On start, a process queues every job still waiting,
+and requeues running jobs whose owner stopped renewing its claim (see app.core.leases).
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy import delete, select, update
+
+from app.core.codec import encode_transaction
+from app.core.config import JOB_QUEUE_MAX_DEPTH, JOB_RETENTION_HOURS, JOB_WORKERS, LEASE_TIMEOUT_S
+from app.core.leases import keep_alive, new_owner
+from app.core.metrics import JOB_WAIT, JOBS
+from app.core.state import AgentState
+from app.models.database import AsyncSessionLocal, ProcessingJob
+from app.models.schemas import Transaction
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    """Raised by submit() when the queue is at its maximum depth."""
+
+
+def _result_values(final_state: AgentState) -> dict:
+    # The transaction is already stored as the job's payload
+    return {key: value for key, value in final_state.items() if key != 'transaction'}
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, max_depth: int = JOB_QUEUE_MAX_DEPTH,
+                 retention_hours: float = JOB_RETENTION_HOURS, session_factory: Callable = AsyncSessionLocal,
+                 lease_timeout: float = LEASE_TIMEOUT_S):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.retention_hours = retention_hours
+        self.lease_timeout = lease_timeout
+        self.owner: Optional[str] = None
+        self._session_factory = session_factory
+        self._process: Optional[Callable[[Transaction], Awaitable[AgentState]]] = None
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks = []
+        # Jobs admitted and not finished yet (queued or running)
+        self._depth = 0
+        self._running: Set[str] = set()
+        self._finished: Dict[str, asyncio.Event] = {}
+
+    def stats(self) -> dict:
+        return {"queued": self._depth - len(self._running), "running": len(self._running),
+                "max_depth": self.max_depth, "workers": len(self._tasks)}
+
+    async def start(self, process: Callable[[Transaction], Awaitable[AgentState]]) -> int:
+        """Starts the workers with `process` as the unit of work; returns how many unfinished jobs were resumed."""
+        self._process = process
+        self._ready = asyncio.Queue()
+        self.owner = new_owner()
+        async with self._session_factory() as db:
+            if self.retention_hours:
+                cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+                await db.execute(delete(ProcessingJob).where(ProcessingJob.status.in_(FINISHED),
+                                                             ProcessingJob.finished_at < cutoff))
+            # Jobs claimed by a process that stopped renewing its claims wait to run again
+            expired = datetime.utcnow() - timedelta(seconds=self.lease_timeout)
+            await db.execute(update(ProcessingJob)
+                             .where(ProcessingJob.status == RUNNING, ProcessingJob.heartbeat_at < expired)
+                             .values(status=QUEUED, owner=None, heartbeat_at=None))
+            await db.commit()
+            rows = (await db.execute(
+                select(ProcessingJob.id, ProcessingJob.payload)
+                .where(ProcessingJob.status == QUEUED).order_by(ProcessingJob.created_at)
+            )).all()
+        for job_id, payload in rows:
+            self._enqueue(job_id, Transaction.model_validate(payload))
+        if rows:
+            logger.info("Resuming %d unfinished jobs", len(rows))
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(keep_alive(self._renew_claims, self.lease_timeout)))
+        return len(rows)
+
+    async def stop(self) -> None:
+        """Stops the workers. Jobs they were running are queued again in the table and run on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._ready = None
+        self._depth = 0
+        self._running.clear()
+        # Long-polls return the job's stored status rather than waiting on workers that are gone
+        for finished in self._finished.values():
+            finished.set()
+        self._finished.clear()
+        try:
+            async with self._session_factory() as db:
+                await db.execute(update(ProcessingJob)
+                                 .where(ProcessingJob.owner == self.owner, ProcessingJob.status == RUNNING)
+                                 .values(status=QUEUED, owner=None, heartbeat_at=None))
+                await db.commit()
+        except Exception:
+            # Left running, they are requeued once their claims expire
+            logger.exception("Could not release the claims of the stopped job queue")
+
+    def _enqueue(self, job_id: str, transaction: Transaction) -> None:
+        self._depth += 1
+        self._finished[job_id] = asyncio.Event()
+        self._ready.put_nowait((job_id, transaction, time.perf_counter()))
+
+    async def submit(self, transaction: Transaction) -> str:
+        """Stores the transaction as a queued job and returns the job id; raises QueueFull when at capacity."""
+        if self._ready is None:
+            raise RuntimeError("The job queue has not been started")
+        if self._depth >= self.max_depth:
+            JOBS.inc(outcome="rejected")
+            raise QueueFull(f"{self._depth} jobs are already waiting or running")
+
+        job_id = uuid.uuid4().hex
+        # Hold the slot while the job is committed so concurrent submissions can't overshoot the bound
+        self._depth += 1
+        try:
+            async with self._session_factory() as db:
+                db.add(ProcessingJob(id=job_id, capture_id=transaction.capture_id,
+                                     payload=encode_transaction(transaction).data, status=QUEUED))
+                await db.commit()
+        finally:
+            self._depth -= 1
+        self._enqueue(job_id, transaction)
+        JOBS.inc(outcome="accepted")
+        return job_id
+
+    async def _claim(self, job_id: str) -> bool:
+        """Marks a queued job as running it here; False if it is no longer queued (another process claimed it)."""
+        async with self._session_factory() as db:
+            claimed = (await db.execute(
+                update(ProcessingJob).where(ProcessingJob.id == job_id, ProcessingJob.status == QUEUED)
+                .values(status=RUNNING, owner=self.owner, heartbeat_at=datetime.utcnow())
+            )).rowcount
+            await db.commit()
+        return claimed == 1
+
+    async def _renew_claims(self) -> None:
+        if not self._running:
+            return
+        async with self._session_factory() as db:
+            await db.execute(update(ProcessingJob)
+                             .where(ProcessingJob.owner == self.owner, ProcessingJob.status == RUNNING)
+                             .values(heartbeat_at=datetime.utcnow()))
+            await db.commit()
+
+    async def _work(self) -> None:
+        while True:
+            job_id, transaction, enqueued_at = await self._ready.get()
+            JOB_WAIT.observe(time.perf_counter() - enqueued_at)
+            try:
+                try:
+                    claimed = await self._claim(job_id)
+                except Exception:
+                    # The job stays queued and runs on a later start
+                    logger.exception("Could not claim job %s", job_id)
+                    continue
+                if not claimed:
+                    logger.info("Job %s was claimed by another process", job_id)
+                    continue
+                self._running.add(job_id)
+                await self._run(job_id, transaction)
+            finally:
+                self._running.discard(job_id)
+                self._depth -= 1
+                finished = self._finished.pop(job_id, None)
+                if finished is not None:
+                    finished.set()
+
+    async def _run(self, job_id: str, transaction: Transaction) -> None:
+        try:
+            final_state = await self._process(transaction)
+            values = {"status": DONE, "result": _result_values(final_state)}
+        except Exception as e:
+            logger.exception("Job %s failed for %s", job_id, transaction.capture_id)
+            values = {"status": FAILED, "error": str(e)}
+        JOBS.inc(outcome=values["status"])
+        try:
+            async with self._session_factory() as db:
+                stored = (await db.execute(
+                    update(ProcessingJob).where(ProcessingJob.id == job_id, ProcessingJob.owner == self.owner)
+                    .values(finished_at=datetime.utcnow(), **values)
+                )).rowcount
+                await db.commit()
+            if not stored:
+                logger.warning("Job %s was taken over by another process before its outcome was stored", job_id)
+        except Exception:
+            # The job is requeued once its claim expires, then rerun (and answered from the idempotency guard)
+            logger.exception("Could not store the outcome of job %s", job_id)
+
+    async def get(self, job_id: str, wait: float = 0.0) -> Optional[dict]:
+        """The job's status and, once done, its final state. Waits up to `wait` seconds for it to finish."""
+        finished = self._finished.get(job_id)
+        if finished is not None and wait > 0:
+            try:
+                await asyncio.wait_for(finished.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+        async with self._session_factory() as db:
+            job = await db.get(ProcessingJob, job_id)
+        if job is None:
+            return None
+        status = RUNNING if job_id in self._running else job.status
+        return {
+            "job_id": job.id,
+            "capture_id": job.capture_id,
+            "status": status,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "state": {"transaction": job.payload, **job.result} if status == DONE else None,
+            "error": job.error,
+        }
+
+
+job_queue = JobQueue()
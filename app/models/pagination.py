@@ -0,0 +1,132 @@
+"""Keyset pagination and streaming export over the transactions table.
+
+Pages are ordered newest first on (created_at, id) and continue from an opaque cursor holding
+the last row's key, so every page is an index range scan no matter how deep it is.
+"""
+import base64
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.codec import dumps
+from app.models.database import Transaction as TransactionRecord
+
+COLUMNS = tuple(TransactionRecord.__table__.columns)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+@dataclass(frozen=True)
+class TransactionFilters:
+    status: Optional[str] = None
+    currency: Optional[str] = None
+    fulfillment_status: Optional[str] = None
+    is_fraudulent: Optional[bool] = None
+
+    def clauses(self) -> list:
+        clauses = []
+        if self.status is not None:
+            clauses.append(TransactionRecord.status == self.status)
+        if self.currency is not None:
+            clauses.append(TransactionRecord.amount_currency == self.currency)
+        if self.fulfillment_status is not None:
+            clauses.append(TransactionRecord.fulfillment_status == self.fulfillment_status)
+        if self.is_fraudulent is not None:
+            clauses.append(TransactionRecord.is_fraudulent == self.is_fraudulent)
+        return clauses
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def _page_query(filters: TransactionFilters, after: Optional[Tuple[datetime, int]], limit: int):
+    clauses = filters.clauses()
+    if after is not None:
+        created_at, id = after
+        # Spelled out rather than as a row-value comparison so every backend can use the index
+        clauses.append(or_(
+            TransactionRecord.created_at < created_at,
+            and_(TransactionRecord.created_at == created_at, TransactionRecord.id < id),
+        ))
+    return (
+        select(*COLUMNS)
+        .where(*clauses)
+        .order_by(TransactionRecord.created_at.desc(), TransactionRecord.id.desc())
+        .limit(limit)
+    )
+
+
+def row_to_dict(row) -> dict:
+    return {
+        column.name: value.isoformat() if isinstance(value, datetime) else value
+        for column, value in zip(COLUMNS, row)
+    }
+
+
+async def _fetch(db: AsyncSession, filters: TransactionFilters, after, limit: int) -> List[dict]:
+    return [row_to_dict(row) for row in (await db.execute(_page_query(filters, after, limit))).all()]
+
+
+def _key(item: dict) -> Tuple[datetime, int]:
+    return datetime.fromisoformat(item["created_at"]), item["id"]
+
+
+async def read_page(db: AsyncSession, filters: TransactionFilters, limit: int,
+                    cursor: Optional[str] = None) -> dict:
+    """Returns up to `limit` transactions after `cursor` and the cursor of the following page."""
+    after = decode_cursor(cursor) if cursor else None
+    # One extra row tells whether there is a next page without a COUNT
+    items = await _fetch(db, filters, after, limit + 1)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(*_key(items[-1]))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def iter_transactions(session_factory: Callable[[], AsyncSession], filters: TransactionFilters,
+                            batch_size: int) -> AsyncIterator[List[dict]]:
+    """Yields every matching transaction in batches, one short keyset query per batch."""
+    after = None
+    while True:
+        # A session per batch so a slow client never holds a connection between batches
+        async with session_factory() as db:
+            batch = await _fetch(db, filters, after, batch_size)
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after = _key(batch[-1])
+
+
+async def export_ndjson(batches: AsyncIterator[List[dict]], compress: bool = False) -> AsyncIterator[bytes]:
+    """Encodes batches of rows as NDJSON, one chunk per batch, optionally as a gzip stream."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    async for batch in batches:
+        chunk = b"".join(dumps(item) + b"\n" for item in batch)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+            if not chunk:
+                continue
+        yield chunk
+    if compressor is not None:
+        yield compressor.flush()
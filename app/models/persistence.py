@@ -0,0 +1,289 @@
+"""Write-behind persistence with group commits.
+
+Requests enqueue their inserts and result updates instead of committing them inline.
+A background task collects whatever arrived within the flush interval (up to the max
+batch size) and writes it in one transaction. An insert and the result update for the
+same transaction that land in the same flush become a single insert.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import bindparam, insert, select, update
+
+from app.core.config import WRITE_BEHIND_ENABLED, WRITE_BEHIND_FLUSH_INTERVAL_MS, WRITE_BEHIND_MAX_BATCH
+from app.core.metrics import WRITE_FLUSH_SIZE, WRITE_QUEUE_TIME
+from app.core.state import AgentState
+from app.models.database import AsyncSessionLocal, Transaction as TransactionRecord
+from app.models.schemas import Transaction
+from app.models.stats import StatsDelta, apply_stats
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = ("is_valid", "is_fraudulent", "fulfillment_status", "error_message", "history")
+# Stored transaction fields a redelivery must repeat unchanged to be answered with the stored results
+RECORD_FIELDS = ("request_id", "charge_id", "status", "amount_value", "amount_currency", "transaction_metadata")
+
+
+def result_values(final_state: AgentState) -> dict:
+    """Column values for the agentic system's results."""
+    return {
+        "is_valid": final_state.get('is_valid'),
+        "is_fraudulent": final_state.get('is_fraudulent'),
+        "fulfillment_status": final_state.get('fulfillment_status'),
+        "error_message": final_state.get('error_message'),
+        "history": final_state.get('history', []),
+    }
+
+
+def record_values(transaction: Transaction, final_state: Optional[AgentState] = None) -> dict:
+    """Column values for a transaction record, including the processing results if there are any."""
+    return dict(
+        capture_id=transaction.capture_id,
+        request_id=transaction.request_id,
+        charge_id=transaction.charge_id,
+        status=transaction.status,
+        amount_value=transaction.amount.value,
+        amount_currency=transaction.amount.currency,
+        transaction_metadata=transaction.transaction_metadata,
+        **result_values(final_state or {})
+    )
+
+
+class ConflictingRedelivery(Exception):
+    """Raised when a transaction arrives again under a processed capture id but with different contents."""
+
+
+def check_redelivery(transaction: Transaction, values: dict) -> None:
+    """Raises ConflictingRedelivery unless `transaction` matches the stored or in-flight record `values`."""
+    incoming = record_values(transaction)
+    changed = [field for field in RECORD_FIELDS if incoming[field] != values[field]]
+    if changed:
+        raise ConflictingRedelivery(
+            f"Transaction {transaction.capture_id} was already processed with different {', '.join(changed)}"
+        )
+
+
+def stored_state(transaction: Transaction, values: dict) -> AgentState:
+    """Rebuilds the final state of an already processed transaction from its stored record and results."""
+    check_redelivery(transaction, values)
+    state = AgentState(transaction=transaction, **{field: values[field] for field in RESULT_FIELDS})
+    state['history'] = state['history'] or []
+    return state
+
+
+async def load_results(capture_id: str, session_factory: Callable = AsyncSessionLocal) -> Optional[dict]:
+    """Stored record and results of a transaction, or None if it hasn't been recorded or processed yet."""
+    columns = [TransactionRecord.__table__.c[field] for field in RECORD_FIELDS + RESULT_FIELDS]
+    async with session_factory() as db:
+        row = (await db.execute(select(*columns).where(TransactionRecord.capture_id == capture_id))).first()
+    if row is None or row.fulfillment_status is None:
+        return None
+    return dict(row._mapping)
+
+
+@dataclass
+class _Write:
+    capture_id: str
+    values: dict
+    is_insert: bool
+    # Full record values, so the statistics can be updated from an update that only carries results
+    record: Optional[dict] = None
+    future: Optional[asyncio.Future] = None
+    at: datetime = field(default_factory=datetime.utcnow)
+
+
+def _mark_retrieved(future: asyncio.Future) -> None:
+    # Callers that don't ask for durability never await their future; failures are logged instead
+    if not future.cancelled():
+        future.exception()
+
+
+class UnrecordedTransaction(Exception):
+    """Raised when a result update matches no row, i.e. the transaction's insert never committed."""
+
+
+class WriteBehindQueue:
+    """Coalesces transaction writes from concurrent requests into periodic group commits."""
+
+    def __init__(self, session_factory: Callable = AsyncSessionLocal, flush_interval: float = 0.05,
+                 max_batch: int = 500, enabled: bool = True):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Last write-through flush per capture id, so a transaction's writes commit in the order they were made
+        self._writing: Dict[str, asyncio.Future] = {}
+        self.flushes = 0
+        self.writes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.enabled and not self.running:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flushes everything still queued and stops the background task."""
+        if self.running:
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+
+    def enqueue_insert(self, values: dict) -> asyncio.Future:
+        return self._enqueue(_Write(values["capture_id"], values, True, values))
+
+    def enqueue_update(self, capture_id: str, values: dict, record: Optional[dict] = None) -> asyncio.Future:
+        return self._enqueue(_Write(capture_id, values, False, record))
+
+    def _enqueue(self, write: _Write) -> asyncio.Future:
+        """Queues a write and returns a future that resolves once it is committed."""
+        write.future = asyncio.get_running_loop().create_future()
+        write.future.add_done_callback(_mark_retrieved)
+        if self.running:
+            self._queue.put_nowait(write)
+        else:
+            # Not started (or disabled): write through immediately
+            self._write_through(write)
+        return write.future
+
+    def _write_through(self, write: _Write) -> None:
+        previous = self._writing.get(write.capture_id)
+
+        async def flush():
+            if previous is not None:
+                # Wait for the transaction's earlier write, whatever its outcome
+                await asyncio.wait([previous])
+            await self._flush([write])
+
+        task = asyncio.ensure_future(flush())
+        self._writing[write.capture_id] = task
+
+        def forget(_):
+            if self._writing.get(write.capture_id) is task:
+                del self._writing[write.capture_id]
+        task.add_done_callback(forget)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    write = self._queue.get_nowait() if deadline <= loop.time() else \
+                        await asyncio.wait_for(self._queue.get(), deadline - loop.time())
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if write is None:
+                    stopping = True
+                    break
+                batch.append(write)
+            await self._flush(batch)
+
+    @staticmethod
+    def _coalesce(batch: List[_Write]):
+        inserts: Dict[str, dict] = {}
+        updates: Dict[str, dict] = {}
+        for write in batch:
+            if write.is_insert:
+                inserts[write.capture_id] = dict(write.values)
+            elif write.capture_id in inserts:
+                inserts[write.capture_id].update(write.values)
+            else:
+                updates.setdefault(write.capture_id, {}).update(write.values)
+        return inserts, updates
+
+    async def _write(self, db, inserts: Dict[str, dict], updates: Dict[str, dict]) -> Set[str]:
+        """Executes the writes and returns the capture ids of the rows they inserted or updated."""
+        if inserts:
+            await db.execute(insert(TransactionRecord), list(inserts.values()))
+        # executemany needs the same columns in every row, so group updates by column set
+        groups: Dict[tuple, List[dict]] = {}
+        for capture_id, values in updates.items():
+            groups.setdefault(tuple(sorted(values)), []).append({"b_capture_id": capture_id, **values})
+        table = TransactionRecord.__table__
+        # Without reliable executemany row counts, updates are sent one statement at a time to count them
+        per_row = not db.get_bind().dialect.supports_sane_multi_rowcount
+        for columns, rows in groups.items():
+            statement = (
+                update(table)
+                .where(table.c.capture_id == bindparam("b_capture_id"))
+                .values({column: bindparam(column) for column in columns})
+            )
+            if per_row:
+                matched = sum([(await db.execute(statement, row)).rowcount for row in rows])
+            else:
+                matched = (await db.execute(statement, rows)).rowcount
+            # A miss means the transaction's insert never committed; the group is then retried write by write
+            if matched != len(rows):
+                raise UnrecordedTransaction(f"{len(rows) - matched} of {len(rows)} result updates matched no transaction")
+        return set(inserts) | set(updates)
+
+    @staticmethod
+    def _stats_delta(batch: List[_Write], written: Set[str]) -> StatsDelta:
+        # Only writes that reached a row count; an update whose insert failed describes no stored transaction
+        delta = StatsDelta()
+        for write in batch:
+            if write.capture_id not in written:
+                continue
+            if write.is_insert:
+                delta.count_received(write.values)
+            if write.record is not None and write.values.get("fulfillment_status") is not None:
+                delta.count_processed({**write.record, **write.values}, write.at)
+        return delta
+
+    async def _flush(self, batch: List[_Write]) -> None:
+        inserts, updates = self._coalesce(batch)
+        try:
+            async with self._session_factory() as db:
+                written = await self._write(db, inserts, updates)
+                # Statistics commit together with the writes they describe
+                await apply_stats(db, self._stats_delta(batch, written))
+                await db.commit()
+        except Exception:
+            if len(batch) == 1:
+                logger.exception("Failed to persist transaction %s", batch[0].capture_id)
+                if not batch[0].future.done():
+                    batch[0].future.set_exception(Exception(f"Failed to persist transaction {batch[0].capture_id}"))
+                return
+            # One bad row (e.g. a duplicate capture id) shouldn't fail the whole group
+            logger.warning("Group commit of %d writes failed, retrying them one by one", len(batch))
+            for write in batch:
+                await self._flush([write])
+            return
+
+        self.flushes += 1
+        self.writes += len(batch)
+        WRITE_FLUSH_SIZE.observe(len(batch))
+        committed_at = datetime.utcnow()
+        for write in batch:
+            WRITE_QUEUE_TIME.observe((committed_at - write.at).total_seconds())
+            if not write.future.done():
+                write.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "flushes": self.flushes,
+            "writes": self.writes,
+        }
+
+
+write_behind = WriteBehindQueue(
+    flush_interval=WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000,
+    max_batch=WRITE_BEHIND_MAX_BATCH,
+    enabled=WRITE_BEHIND_ENABLED
+)
@@ -1,11 +1,14 @@
-from pydantic import BaseModel, Field
-from typing import Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+from typing import Dict, Any, Optional
 
 class TransactionAmount(BaseModel):
     value: int
     currency: str
 
 class Transaction(BaseModel):
+    # Field names too, so checkpoints (which store them by field name) restore a validated model
+    model_config = ConfigDict(populate_by_name=True)
+
     capture_id: str = Field(..., alias='captureId')
     request_id: str = Field(..., alias='requestId')
     charge_id: str = Field(..., alias='chargeId')
@@ -14,3 +17,11 @@ class Transaction(BaseModel):
     transaction_metadata: Dict[str, Any] = Field(..., alias='metadata')
     created_at: str = Field(..., alias='createdAt')
     updated_at: str = Field(..., alias='updatedAt')
+    # Canonical encoded form, filled in on first use by app.core.codec.encode_transaction
+    _encoded: Optional[Any] = PrivateAttr(default=None)
+
+    def __eq__(self, other: object) -> bool:
+        # Compared by field values only; whether the encoding has been cached yet doesn't matter
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        return self.__dict__ == other.__dict__
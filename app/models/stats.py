@@ -0,0 +1,151 @@
+"""Incrementally maintained dashboard statistics.
+
+Counters and hourly rollups are updated in the same commit as the transaction writes that
+change them, so reading them costs the same however large the transactions table gets.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.database import StatCounter, Transaction as TransactionRecord, TransactionRollup
+
+RollupKey = Tuple[datetime, str, str]
+
+
+def hour_bucket(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+class StatsDelta:
+    """Counter and rollup increments accumulated over one group of writes."""
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self.rollups: Dict[RollupKey, List[int]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.counters or self.rollups)
+
+    def count_received(self, record: dict) -> None:
+        self.counters["total"] += 1
+        self.counters[f"status:{record.get('status')}"] += 1
+
+    def count_processed(self, record: dict, at: datetime) -> None:
+        fulfillment_status = record.get("fulfillment_status") or "UNKNOWN"
+        self.counters["processed"] += 1
+        self.counters[f"fulfillment:{fulfillment_status}"] += 1
+        if record.get("is_fraudulent"):
+            self.counters["fraudulent"] += 1
+        if record.get("is_valid") is False:
+            self.counters["invalid"] += 1
+
+        key = (hour_bucket(at), record.get("amount_currency") or "UNKNOWN", fulfillment_status)
+        rollup = self.rollups.setdefault(key, [0, 0])
+        rollup[0] += 1
+        rollup[1] += record.get("amount_value") or 0
+
+
+def _upsert_increment(dialect_name: str, table, key_columns: List[str], value_columns: List[str]):
+    """INSERT ... that adds to the existing row's values on conflict, for the running dialect."""
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        return statement.on_duplicate_key_update({c: table.c[c] + statement.inserted[c] for c in value_columns})
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={c: table.c[c] + statement.excluded[c] for c in value_columns}
+    )
+
+
+def _stats_statements(dialect_name: str, delta: StatsDelta) -> List[tuple]:
+    statements = []
+    if delta.counters:
+        statement = _upsert_increment(dialect_name, StatCounter.__table__, ["name"], ["value"])
+        statements.append((statement, [{"name": name, "value": value} for name, value in delta.counters.items()]))
+    if delta.rollups:
+        statement = _upsert_increment(
+            dialect_name, TransactionRollup.__table__, ["hour", "currency", "fulfillment_status"], ["count", "amount_total"]
+        )
+        statements.append((statement, [
+            {"hour": hour, "currency": currency, "fulfillment_status": status, "count": count, "amount_total": amount}
+            for (hour, currency, status), (count, amount) in delta.rollups.items()
+        ]))
+    return statements
+
+
+async def apply_stats(db: AsyncSession, delta: StatsDelta) -> None:
+    """Adds the delta to the stored counters and rollups inside the caller's transaction."""
+    for statement, params in _stats_statements(db.bind.dialect.name, delta):
+        await db.execute(statement, params)
+
+
+def apply_stats_sync(db: Session, delta: StatsDelta) -> None:
+    """Blocking variant of apply_stats, for scripts and the CLI."""
+    for statement, params in _stats_statements(db.bind.dialect.name, delta):
+        db.execute(statement, params)
+
+
+async def read_counters(db: AsyncSession) -> Dict[str, int]:
+    return dict((await db.execute(select(StatCounter.name, StatCounter.value))).all())
+
+
+async def read_stats(db: AsyncSession, hours: int = 24) -> dict:
+    """Returns the counters and the rollups for the last `hours` hours."""
+    counters = await read_counters(db)
+    since = hour_bucket(datetime.utcnow() - timedelta(hours=hours))
+    rollups = (await db.execute(
+        select(TransactionRollup).where(TransactionRollup.hour >= since).order_by(TransactionRollup.hour)
+    )).scalars().all()
+    return {
+        "counters": counters,
+        "rollups": [
+            {
+                "hour": rollup.hour.isoformat(),
+                "currency": rollup.currency,
+                "fulfillment_status": rollup.fulfillment_status,
+                "count": rollup.count,
+                "amount_total": rollup.amount_total,
+            }
+            for rollup in rollups
+        ],
+    }
+
+
+def rebuild_stats(db: Session) -> bool:
+    """Backfills counters and rollups from the transactions table if they have never been built."""
+    if db.query(StatCounter).first() is not None:
+        return False
+    if db.query(TransactionRecord.id).first() is None:
+        return False
+
+    delta = StatsDelta()
+    for status, count in db.query(TransactionRecord.status, func.count()).group_by(TransactionRecord.status):
+        delta.counters["total"] += count
+        delta.counters[f"status:{status}"] += count
+
+    columns = (TransactionRecord.created_at, TransactionRecord.amount_currency, TransactionRecord.amount_value,
+               TransactionRecord.fulfillment_status, TransactionRecord.is_fraudulent, TransactionRecord.is_valid)
+    for created_at, currency, amount, fulfillment_status, is_fraudulent, is_valid in (
+        db.query(*columns).filter(TransactionRecord.fulfillment_status.isnot(None)).yield_per(10000)
+    ):
+        delta.count_processed({
+            "amount_currency": currency, "amount_value": amount, "fulfillment_status": fulfillment_status,
+            "is_fraudulent": is_fraudulent, "is_valid": is_valid
+        }, created_at or datetime.utcnow())
+
+    db.add_all(StatCounter(name=name, value=value) for name, value in delta.counters.items())
+    db.add_all(
+        TransactionRollup(hour=hour, currency=currency, fulfillment_status=status, count=count, amount_total=amount)
+        for (hour, currency, status), (count, amount) in delta.rollups.items()
+    )
+    db.commit()
+    return True
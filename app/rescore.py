@@ -0,0 +1,239 @@
+"""Rescoring of stored transactions after a rule change.
+
+Splits the processed rows of the transactions table into id ranges, one per worker process.
+Each worker reads its range in keyset chunks straight into NumPy columns, evaluates the
+validation rules and the fraud agent's rule-based screen on whole chunks
+(app.core.rescoring) and returns the verdicts that would change. The report counts the
+decisions that flip, with sample capture ids, and how many rows each rule hits. Only verdicts
+the rules decide are re-decided (see app.core.rescoring); model and score verdicts stand.
+With --apply the changed verdicts and the fulfillment status that follows from them are
+written back in bulk, each row getting a history entry, with the dashboard counters and
+rollups adjusted in the same commit.
+
+    python -m app.rescore --workers 8 --chunk-size 50000 --report rescore.json [--apply]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, String, case, cast, func, select, update
+from sqlalchemy.orm import Session
+
+from app.agents.failure_detection_agent import FALLBACK_AMOUNT_LIMIT, FALLBACK_CHECK, FALLBACK_SUSPICIOUS_DEVICE_PREFIX
+from app.core.config import DATABASE_URL, RESCORE_CHUNK_SIZE, RESCORE_WORKERS, VALIDATION_LLM_RULES
+from app.core.rescoring import (
+    FULFILLED, HELD, NO, UNKNOWN, YES, VALIDATION_COLUMN_RULES, ColumnChunk, ColumnRuleSet, RescoreReport,
+    fraud_screen_rules
+)
+from app.core.rules import rule_failure_message
+from app.models.database import Transaction as TransactionRecord, make_engine
+from app.models.stats import StatsDelta, apply_stats_sync, hour_bucket
+
+logger = logging.getLogger(__name__)
+
+# In ColumnChunk field order; NULL text becomes "" and NULL verdicts UNKNOWN so columns load with fixed dtypes
+_COLUMNS = (
+    TransactionRecord.id,
+    func.coalesce(TransactionRecord.capture_id, ""),
+    func.coalesce(TransactionRecord.request_id, ""),
+    func.coalesce(TransactionRecord.charge_id, ""),
+    func.coalesce(TransactionRecord.status, ""),
+    func.coalesce(TransactionRecord.amount_value, 0),
+    TransactionRecord.amount_value.isnot(None),
+    func.coalesce(TransactionRecord.amount_currency, ""),
+    func.coalesce(TransactionRecord.transaction_metadata["device_id"].as_string(), ""),
+    func.coalesce(cast(TransactionRecord.is_valid, Integer), UNKNOWN),
+    func.coalesce(cast(TransactionRecord.is_fraudulent, Integer), UNKNOWN),
+    case((TransactionRecord.fulfillment_status == FULFILLED, YES), else_=NO),
+    case((TransactionRecord.is_valid.is_(False), func.coalesce(TransactionRecord.error_message, "")), else_=""),
+    func.coalesce(cast(TransactionRecord.history, String).like(f"%{FALLBACK_CHECK}%"), False),
+)
+
+# Only rows the agents have decided have verdicts to compare
+_PROCESSED = TransactionRecord.fulfillment_status.isnot(None)
+
+# Verdict changes handed back to the parent: id, new is_valid, is_fraudulent and fulfilled, the old ones,
+# failed and flagged rule bits
+Changes = np.ndarray
+_CHANGE_COLUMNS = 9
+
+
+def default_rule_set() -> ColumnRuleSet:
+    # Rules the LLM judges aren't checked locally by the validation agent, so they aren't rescored either
+    return ColumnRuleSet(
+        [rule for rule in VALIDATION_COLUMN_RULES if rule.name not in VALIDATION_LLM_RULES],
+        fraud_screen_rules(FALLBACK_AMOUNT_LIMIT, FALLBACK_SUSPICIOUS_DEVICE_PREFIX),
+        llm_judged=bool(VALIDATION_LLM_RULES),
+    )
+
+
+def id_ranges(db: Session, workers: int) -> List[Tuple[int, int]]:
+    """Splits the ids of processed rows into up to `workers` half-open ranges of equal width."""
+    low, high = db.execute(select(func.min(TransactionRecord.id), func.max(TransactionRecord.id)).where(_PROCESSED)).one()
+    if low is None:
+        return []
+    step = max((high - low + 1) // max(workers, 1), 1)
+    bounds = list(range(low, high + 1, step))[:max(workers, 1)] + [high + 1]
+    return list(zip(bounds, bounds[1:]))
+
+
+def rescore_range(url: str, low: int, high: int, chunk_size: int = RESCORE_CHUNK_SIZE,
+                  rule_set: Optional[ColumnRuleSet] = None) -> Tuple[RescoreReport, Changes]:
+    """Rescores the processed rows with low <= id < high; returns the report and the rows that would change."""
+    rule_set = rule_set or default_rule_set()
+    engine = make_engine(url)
+    report = RescoreReport()
+    changes = []
+    after = low - 1
+    try:
+        with engine.connect() as connection:
+            while True:
+                rows = connection.execute(
+                    select(*_COLUMNS)
+                    .where(_PROCESSED, TransactionRecord.id > after, TransactionRecord.id < high)
+                    .order_by(TransactionRecord.id)
+                    .limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                chunk = ColumnChunk.from_rows(rows)
+                verdicts = rule_set.evaluate(chunk)
+                changed = report.add(chunk, verdicts, rule_set)
+                if changed.any():
+                    changes.append(np.stack([
+                        chunk.ids[changed],
+                        verdicts.is_valid[changed], verdicts.is_fraudulent[changed], verdicts.fulfilled[changed],
+                        chunk.is_valid[changed], chunk.is_fraudulent[changed], chunk.fulfilled[changed],
+                        verdicts.failed[changed], verdicts.flagged[changed],
+                    ], axis=1).astype(np.int64))
+                after = int(chunk.ids[-1])
+    finally:
+        engine.dispose()
+    return report, np.concatenate(changes) if changes else np.empty((0, _CHANGE_COLUMNS), dtype=np.int64)
+
+
+def _history_entry(rule_set: ColumnRuleSet, is_valid: int, is_fraudulent: int, fulfilled: int, old_valid: int,
+                   old_fraudulent: int, old_fulfilled: int, failed: int, flagged: int) -> str:
+    parts = []
+    if is_valid != old_valid:
+        parts.append("valid" if is_valid == YES else
+                     f"invalid (failed rules: {', '.join(rule_set.names(rule_set.validation_rules, failed))})")
+    if is_fraudulent != old_fraudulent and is_fraudulent != UNKNOWN:
+        parts.append(f"fraudulent (flagged by: {', '.join(rule_set.names(rule_set.fraud_rules, flagged))})"
+                     if is_fraudulent == YES else "not fraudulent")
+    entry = f"Rescore: Transaction is now {' and '.join(parts)}"
+    if is_valid == YES and is_fraudulent == UNKNOWN:
+        # Became valid without ever having been screened for fraud
+        entry += "; it has no fraud verdict yet and stays held for review"
+    elif fulfilled != old_fulfilled:
+        entry += "; fulfilled" if fulfilled == YES else "; held for manual review"
+    return entry + "."
+
+
+def _error_message(rule_set: ColumnRuleSet, is_valid: int, is_fraudulent: int, failed: int) -> Optional[str]:
+    # Written the way the agents write it, so a later rescore can tell which rules decided the row
+    if is_valid == NO:
+        return rule_failure_message(rule_set.names(rule_set.validation_rules, failed))
+    if is_fraudulent == YES:
+        return "Transaction flagged as potentially fraudulent."
+    return None
+
+
+def apply_changes(db: Session, changes: Changes, rule_set: Optional[ColumnRuleSet] = None,
+                  chunk_size: int = RESCORE_CHUNK_SIZE) -> int:
+    """Writes the changed verdicts and fulfillment statuses back in bulk, one commit per chunk with the
+    matching counter and rollup adjustments."""
+    rule_set = rule_set or default_rule_set()
+    written = 0
+    for start in range(0, len(changes), chunk_size):
+        chunk = changes[start:start + chunk_size]
+        stored = {row.id: row for row in db.execute(
+            select(TransactionRecord.id, TransactionRecord.history, TransactionRecord.created_at,
+                   TransactionRecord.amount_currency, TransactionRecord.amount_value)
+            .where(TransactionRecord.id.in_(chunk[:, 0].tolist()))
+        )}
+        values = []
+        delta = StatsDelta()
+        for id, is_valid, is_fraudulent, fulfilled, old_valid, old_fraudulent, old_fulfilled, failed, flagged in chunk.tolist():
+            row = stored[id]
+            entry = _history_entry(rule_set, is_valid, is_fraudulent, fulfilled, old_valid, old_fraudulent,
+                                   old_fulfilled, failed, flagged)
+            values.append({
+                "id": id,
+                "is_valid": None if is_valid == UNKNOWN else is_valid == YES,
+                "is_fraudulent": None if is_fraudulent == UNKNOWN else is_fraudulent == YES,
+                "fulfillment_status": FULFILLED if fulfilled == YES else HELD,
+                "error_message": _error_message(rule_set, is_valid, is_fraudulent, failed),
+                "history": [*(row.history or []), entry],
+            })
+            delta.counters["invalid"] += (is_valid == NO) - (old_valid == NO)
+            delta.counters["fraudulent"] += (is_fraudulent == YES) - (old_fraudulent == YES)
+            if fulfilled != old_fulfilled:
+                # Move the transaction to its new status in the counters and its hour's rollup
+                hour, currency = hour_bucket(row.created_at), row.amount_currency or "UNKNOWN"
+                old_status, new_status = (HELD, FULFILLED) if fulfilled == YES else (FULFILLED, HELD)
+                for status, sign in ((old_status, -1), (new_status, 1)):
+                    delta.counters[f"fulfillment:{status}"] += sign
+                    rollup = delta.rollups.setdefault((hour, currency, status), [0, 0])
+                    rollup[0] += sign
+                    rollup[1] += sign * (row.amount_value or 0)
+        db.execute(update(TransactionRecord), values)
+        for name in [name for name, value in delta.counters.items() if not value]:
+            del delta.counters[name]
+        apply_stats_sync(db, delta)
+        db.commit()
+        written += len(values)
+    return written
+
+
+def rescore(url: str = DATABASE_URL, workers: int = RESCORE_WORKERS, chunk_size: int = RESCORE_CHUNK_SIZE,
+            apply: bool = False) -> RescoreReport:
+    """Rescores every processed transaction, in parallel over id ranges, and optionally writes the changes back."""
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    engine = make_engine(url)
+    try:
+        with Session(engine) as db:
+            ranges = id_ranges(db, workers)
+        if len(ranges) > 1:
+            with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                results = list(pool.map(rescore_range, *zip(*((url, low, high, chunk_size) for low, high in ranges))))
+        else:
+            results = [rescore_range(url, low, high, chunk_size) for low, high in ranges]
+
+        report = RescoreReport()
+        for part, _ in results:
+            report.merge(part)
+        if apply:
+            changes = np.concatenate([changes for _, changes in results]) if results else np.empty((0, _CHANGE_COLUMNS), dtype=np.int64)
+            with Session(engine) as db:
+                logger.info("Wrote %d changed verdicts", apply_changes(db, changes, chunk_size=chunk_size))
+    finally:
+        engine.dispose()
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-evaluate stored transactions with the current rules and report changed decisions.")
+    parser.add_argument("--workers", type=int, default=RESCORE_WORKERS, help="worker processes (0 uses every core)")
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    parser.add_argument("--apply", action="store_true", help="write the changed verdicts back to the table")
+    parser.add_argument("--report", type=Path, help="also save the report as JSON")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    report = rescore(workers=args.workers, chunk_size=args.chunk_size, apply=args.apply)
+    print(report.describe())
+    if args.report:
+        args.report.write_text(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+JSON handling cost per request.
+
+Times each place a request's transaction is parsed or encoded, the way it used to be done
+(stdlib json, a model_dump per consumer, AgentState response model validation) and through
+app.core.codec, and what the difference adds up to at a given request rate.
+
+    python -m benchmarks.bench_codec --requests 20000 --qps 2000
+"""
+import argparse
+import json
+import random
+import time
+
+from pydantic import TypeAdapter
+
+from app.core import codec
+from app.core.state import AgentState
+from app.models.schemas import Transaction
+from benchmarks.bench_payloads import make_transaction
+
+AGENT_STATE = TypeAdapter(AgentState)
+# Consumers of the encoded transaction on one request: two payload encoders, the job payload
+CONSUMERS = 3
+
+
+def final_state(transaction: Transaction) -> AgentState:
+    return AgentState(
+        transaction=transaction, is_valid=True, is_fraudulent=False, fulfillment_status="SUCCESS", error_message=None,
+        history=["Validation Agent: Transaction is valid.", "Fraud Detection Agent: Transaction is not fraudulent.",
+                 "Recovery Agent: Transaction passed validation and fraud checks. Fulfillment has been processed."],
+        validation_failures=[], fraud_score=0.4, velocity={"device_id=device_1": {"1m": 1, "1h": 2, "24h": 5}},
+        timings={"run_validation_agent": 0.04, "run_fraud_detection_agent": 212.7, "run_recovery_agent": 0.01},
+    )
+
+
+def parse_stdlib(body: bytes) -> Transaction:
+    return Transaction.model_validate(json.loads(body))
+
+
+def encode_stdlib(transaction: Transaction) -> None:
+    for _ in range(CONSUMERS):
+        transaction.model_dump(by_alias=True)
+
+
+def respond_stdlib(state: AgentState) -> bytes:
+    # What FastAPI does with response_model=AgentState before JSONResponse renders it
+    content = AGENT_STATE.dump_python(AGENT_STATE.validate_python(state), mode="json", by_alias=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_codec(transaction: Transaction) -> None:
+    for _ in range(CONSUMERS):
+        codec.encode_transaction(transaction).data
+
+
+def respond_codec(state: AgentState) -> bytes:
+    return codec.dumps(state)
+
+
+def measure(bodies, parse, encode, respond) -> dict:
+    """CPU seconds per request spent in each stage, each stage timed over all requests in one go."""
+    spent = {}
+    started = time.process_time()
+    transactions = [parse(body) for body in bodies]
+    spent["parse"] = time.process_time() - started
+    started = time.process_time()
+    for transaction in transactions:
+        encode(transaction)
+    spent["encode"] = time.process_time() - started
+    states = [final_state(transaction) for transaction in transactions]
+    started = time.process_time()
+    for state in states:
+        respond(state)
+    spent["respond"] = time.process_time() - started
+    return {stage: seconds / len(bodies) for stage, seconds in spent.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--qps", type=float, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bodies = [make_transaction(rng).model_dump_json(by_alias=True).encode() for _ in range(args.requests)]
+    assert json.loads(respond_codec(final_state(Transaction.model_validate_json(bodies[0])))) == \
+        json.loads(respond_stdlib(final_state(parse_stdlib(bodies[0]))))
+
+    # One warm-up pass each so both paths run with their schemas and caches built
+    measure(bodies[:100], parse_stdlib, encode_stdlib, respond_stdlib)
+    measure(bodies[:100], Transaction.model_validate_json, encode_codec, respond_codec)
+    before = measure(bodies, parse_stdlib, encode_stdlib, respond_stdlib)
+    after = measure(bodies, Transaction.model_validate_json, encode_codec, respond_codec)
+
+    print(f"{'us/request':<12}{'stdlib':>10}{'codec':>10}")
+    for stage in before:
+        print(f"{stage:<12}{before[stage] * 1e6:>10.1f}{after[stage] * 1e6:>10.1f}")
+    total_before, total_after = sum(before.values()), sum(after.values())
+    print(f"{'total':<12}{total_before * 1e6:>10.1f}{total_after * 1e6:>10.1f}")
+    print(f"at {args.qps:.0f} requests/s: {(total_before - total_after) * args.qps:.2f} CPU cores saved "
+          f"({total_before * args.qps:.2f} -> {total_after * args.qps:.2f})")
+
+
+if __name__ == "__main__":
+    main()
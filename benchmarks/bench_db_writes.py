@@ -0,0 +1,80 @@
+"""
+Write-throughput benchmark for the database layer.
+
+Compares committing one transaction row at a time with SQLite's default journaling, with
+the WAL/synchronous=NORMAL pragmas the app uses, and through the async engine with
+several concurrent writers (the shape of the /process_transaction/ hot path).
+
+    python -m benchmarks.bench_db_writes --rows 2000 --writers 16
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base, Transaction as TransactionRecord, make_async_engine, make_engine
+
+
+def make_row() -> TransactionRecord:
+    key = uuid.uuid4().hex
+    return TransactionRecord(
+        capture_id=f"cap_{key}", request_id=f"req_{key}", charge_id=f"chg_{key}", status="SUCCESS",
+        amount_value=1000, amount_currency="SGD", transaction_metadata={}, history=[]
+    )
+
+
+def bench_sync(engine, rows: int) -> float:
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    started = time.perf_counter()
+    with Session() as db:
+        for _ in range(rows):
+            db.add(make_row())
+            db.commit()
+    return rows / (time.perf_counter() - started)
+
+
+async def bench_async(url: str, rows: int, writers: int) -> float:
+    async_engine = make_async_engine(url)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def writer(count: int):
+        async with Session() as db:
+            for _ in range(count):
+                db.add(make_row())
+                await db.commit()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(rows // writers) for _ in range(writers)))
+    elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+    return (rows // writers) * writers / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--writers", type=int, default=16)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    url = lambda name: f"sqlite:///{os.path.join(directory, name)}"
+
+    default = create_engine(url("default.db"))
+    print(f"default journaling, commit per row: {bench_sync(default, args.rows):10.0f} rows/s")
+    tuned = make_engine(url("wal.db"))
+    print(f"WAL + synchronous=NORMAL:           {bench_sync(tuned, args.rows):10.0f} rows/s")
+    rate = asyncio.run(bench_async(url("async.db"), args.rows, args.writers))
+    print(f"async engine, {args.writers} writers:          {rate:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
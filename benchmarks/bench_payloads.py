@@ -0,0 +1,64 @@
+"""
+Prompt payload size and encoding cost.
+
+Compares the estimated tokens of the pretty-printed full transaction the agents used to send
+with the compact per-agent payloads, and how long encoding takes per transaction.
+
+    python -m benchmarks.bench_payloads --transactions 2000
+"""
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from app.core.payloads import PayloadEncoder, estimate_tokens
+from app.core.rules import VALIDATION_RULES, RuleEngine
+from app.models.schemas import Transaction
+
+REASONS = ("complete", "Customer asked for the parcel to be left with the building concierge after 6pm", "")
+
+
+def make_transaction(rng: random.Random) -> Transaction:
+    key = uuid.UUID(int=rng.getrandbits(128)).hex * 2
+    return Transaction.model_validate({
+        "captureId": f"cap_{key}", "requestId": f"req_{key}", "chargeId": f"chg_{key}",
+        "status": "SUCCESS",
+        "amount": {"value": int(rng.lognormvariate(8, 1)), "currency": "SGD"},
+        "metadata": {"merchantId": f"merchant_{rng.randrange(20)}", "device_id": f"device_{rng.randrange(1000)}",
+                     "fulfillmentId": f"fulfill_{key}", "reason": rng.choice(REASONS)},
+        "createdAt": "2025-06-30T20:53:06+05:30",
+        "updatedAt": "2025-06-30T20:53:06+05:30",
+    })
+
+
+def measure(name: str, transactions, encode) -> None:
+    started = time.perf_counter()
+    tokens = [estimate_tokens(encode(transaction)) for transaction in transactions]
+    per_call = (time.perf_counter() - started) / len(transactions) * 1e6
+    p95 = statistics.quantiles(tokens, n=100, method="inclusive")[94]
+    print(f"{name:<28}{statistics.mean(tokens):>10.1f}{p95:>10.1f}{per_call:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--token-budget", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    transactions = [make_transaction(rng) for _ in range(args.transactions)]
+    all_rules = RuleEngine(VALIDATION_RULES, llm_rules=[rule.name for rule in VALIDATION_RULES])
+    validation = PayloadEncoder("validation", all_rules.llm_rule_fields(), token_budget=args.token_budget)
+    fraud = PayloadEncoder("fraud_detection", ("status", "amount", "metadata", "createdAt"), normalize=True,
+                           token_budget=args.token_budget)
+
+    print(f"{'payload':<28}{'tokens':>10}{'p95':>10}{'us/encode':>12}")
+    measure("model_dump_json(indent=2)", transactions, lambda transaction: transaction.model_dump_json(indent=2))
+    measure("validation (all rules)", transactions, lambda transaction: validation.encode(transaction).text)
+    measure("fraud detection", transactions, lambda transaction: fraud.encode(transaction).text)
+
+
+if __name__ == "__main__":
+    main()
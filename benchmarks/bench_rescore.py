@@ -0,0 +1,63 @@
+"""
+Rescoring throughput.
+
+Fills a scratch SQLite database with processed transactions (a share of them failing the
+current rules), then times a report-only rescore with each worker count.
+
+    python -m benchmarks.bench_rescore --rows 1000000 --workers 1 4 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+from app.models.database import Transaction as TransactionRecord, create_schema, make_engine
+
+CURRENCIES = ("SGD", "USD", "EUR", "XXX")
+
+
+def fill(url: str, rows: int, seed: int, batch: int = 50000) -> None:
+    rng = random.Random(seed)
+    engine = make_engine(url)
+    create_schema(engine)
+    with engine.begin() as connection:
+        for start in range(0, rows, batch):
+            connection.execute(insert(TransactionRecord), [
+                {
+                    "capture_id": f"cap_{i}", "request_id": f"req_{i}", "charge_id": f"chg_{i}", "status": "SUCCESS",
+                    "amount_value": int(rng.lognormvariate(7, 1)), "amount_currency": rng.choice(CURRENCIES),
+                    "transaction_metadata": {"device_id": f"device_{rng.randrange(1000)}"},
+                    "is_valid": True, "is_fraudulent": False, "fulfillment_status": "SUCCESS", "history": [],
+                }
+                for i in range(start, min(start + batch, rows))
+            ])
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app import rescore
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'rescore.db')}"
+        started = time.perf_counter()
+        fill(url, args.rows, args.seed)
+        print(f"filled {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'workers':>8}{'seconds':>10}{'rows/min':>14}{'changed':>10}")
+        for workers in args.workers:
+            report = rescore.rescore(url, workers=workers, chunk_size=args.chunk_size)
+            print(f"{workers:>8}{report.elapsed:>10.2f}{report.rows_per_second * 60:>14,.0f}{report.changed:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Cold-start benchmark for a worker process.
+
+Measures, each in a fresh interpreter:
+  - import time of app.main (what every worker and test run pays up front),
+  - construction of the shared LLM client (deferred until the first model call),
+  - time-to-first-request: from launching uvicorn until /health answers.
+
+Budgets can be given to fail the run (exit code 1) when startup regresses:
+
+    python -m benchmarks.bench_startup --runs 5 --import-budget-ms 2500 --ttfr-budget-ms 5000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+CLIENT_SNIPPET = (
+    "import time; from app.core.llm import get_client; t = time.perf_counter(); get_client(); "
+    "print(time.perf_counter() - t)"
+)
+
+
+def bench_env(db_dir: str) -> dict:
+    env = dict(os.environ)
+    # Keep the benchmark's schema out of the application database, and startup free of LLM calls
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(db_dir, 'startup.db')}")
+    env.setdefault("RECOVERY_SUMMARY_WARM", "false")
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    return env
+
+
+def time_snippet(snippet: str, env: dict) -> float:
+    output = subprocess.run([sys.executable, "-c", snippet], env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(env: dict, timeout: float = 60) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=None)
+    parser.add_argument("--ttfr-budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        env = bench_env(db_dir)
+        results = {
+            "import app.main": [time_snippet(IMPORT_SNIPPET, env) for _ in range(args.runs)],
+            "first LLM client": [time_snippet(CLIENT_SNIPPET, env) for _ in range(args.runs)],
+            "time to first request": [time_to_first_request(env) for _ in range(args.runs)],
+        }
+
+    medians = {}
+    for name, samples in results.items():
+        medians[name] = statistics.median(samples) * 1000
+        print(f"{name:>22}: median {medians[name]:8.1f} ms  (min {min(samples) * 1000:.1f}, max {max(samples) * 1000:.1f})")
+
+    over_budget = [
+        f"{name} {medians[name]:.0f} ms > {budget:.0f} ms"
+        for name, budget in (("import app.main", args.import_budget_ms), ("time to first request", args.ttfr_budget_ms))
+        if budget is not None and medians[name] > budget
+    ]
+    for message in over_budget:
+        print(f"over budget: {message}")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
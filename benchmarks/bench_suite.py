@@ -0,0 +1,222 @@
+"""
+Offline benchmark suite.
+
+Runs the agents against the local stub chat model (LLM_PROVIDER=stub) with a configurable
+latency distribution, failure rate and fraud rate, and measures:
+
+  - graph:    agentic_system.ainvoke per transaction
+  - endpoint: POST /process_transaction/ through the ASGI app (lifespan included)
+  - db:       durable write-behind insert + result update per transaction
+  - ingest:   the bulk ingester over a generated JSONL file
+
+Each scenario reports throughput and p50/p95/p99 latency; all results are saved as JSON
+so runs can be compared over time.
+
+    python -m benchmarks.bench_suite --transactions 500 --concurrency 50 --latency lognormal:200:0.5 \\
+        --error-rate 0.01 --output benchmarks/results/latest.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+SCENARIOS = ("graph", "endpoint", "db", "ingest")
+CURRENCIES = ("SGD", "USD", "EUR", "GBP")
+
+
+def make_payload(rng: random.Random) -> dict:
+    key = uuid.UUID(int=rng.getrandbits(128)).hex
+    return {
+        "captureId": f"cap_{key}",
+        "requestId": f"req_{key}",
+        "chargeId": f"chg_{key}",
+        "status": "SUCCESS",
+        "amount": {"value": int(rng.lognormvariate(8, 1)), "currency": rng.choice(CURRENCIES)},
+        "metadata": {"merchantId": f"merchant_{rng.randrange(20)}", "device_id": f"device_{rng.randrange(1000)}"},
+        "createdAt": "2025-06-30T20:53:06+05:30",
+        "updatedAt": "2025-06-30T20:53:06+05:30",
+    }
+
+
+def percentile_summary(name: str, latencies: List[float], errors: int, elapsed: float, count: int) -> dict:
+    """Throughput over the whole run and latency percentiles in milliseconds."""
+    summary = {
+        "scenario": name,
+        "count": count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(count / elapsed, 1) if elapsed else None,
+        "p50_ms": None, "p95_ms": None, "p99_ms": None,
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        summary.update(p50_ms=round(cuts[49] * 1000, 2), p95_ms=round(cuts[94] * 1000, 2), p99_ms=round(cuts[98] * 1000, 2))
+    return summary
+
+
+async def run_timed(name: str, payloads: List[dict], concurrency: int,
+                    call: Callable[[dict], Awaitable[bool]]) -> dict:
+    """Runs `call` for every payload with bounded concurrency; `call` returns False (or raises) on error."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(payload: dict) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await call(payload)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    return percentile_summary(name, latencies, errors, time.perf_counter() - started, len(payloads))
+
+
+async def bench_graph(payloads: List[dict], concurrency: int) -> dict:
+    from app.agents.router import agentic_system
+    from app.core.state import new_agent_state
+    from app.models.schemas import Transaction
+
+    async def call(payload: dict) -> bool:
+        await agentic_system.ainvoke(new_agent_state(Transaction.model_validate(payload)))
+        return True
+
+    return await run_timed("graph", payloads, concurrency, call)
+
+
+async def bench_endpoint(payloads: List[dict], concurrency: int) -> dict:
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def call(payload: dict) -> bool:
+                response = await client.post("/process_transaction/", json=payload)
+                return response.status_code == 200
+
+            return await run_timed("endpoint", payloads, concurrency, call)
+
+
+async def bench_db(payloads: List[dict], concurrency: int) -> dict:
+    from app.models.database import async_engine, create_schema, engine
+    from app.models.persistence import WriteBehindQueue, record_values
+    from app.models.schemas import Transaction
+
+    create_schema(engine)
+    queue = WriteBehindQueue()
+    await queue.start()
+    result = {"is_valid": True, "is_fraudulent": False, "fulfillment_status": "SUCCESS", "error_message": None,
+              "history": ["benchmark"]}
+
+    async def call(payload: dict) -> bool:
+        record = record_values(Transaction.model_validate(payload))
+        queue.enqueue_insert(record)
+        await queue.enqueue_update(record["capture_id"], result, record={**record, **result})
+        return True
+
+    try:
+        return await run_timed("db", payloads, concurrency, call)
+    finally:
+        await queue.stop()
+        await async_engine.dispose()
+
+
+async def bench_ingest(payloads: List[dict], concurrency: int, directory: str) -> dict:
+    from app.ingest import ingest_file
+    from app.models.database import create_schema, engine
+
+    create_schema(engine)
+    path = Path(directory) / "ingest.jsonl"
+    with open(path, "w") as handle:
+        for payload in payloads:
+            handle.write(json.dumps(payload) + "\n")
+    stats = await ingest_file(path, max_concurrency=concurrency, restart=True)
+    # One measurement for the whole file: throughput only
+    return percentile_summary("ingest", [], stats.rejected, stats.elapsed, stats.rows)
+
+
+def configure_environment(args, directory: str) -> None:
+    """Points the app at the stub model and a scratch database; must run before any app import."""
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["LLM_STUB_LATENCY"] = args.latency
+    os.environ["LLM_STUB_ERROR_RATE"] = str(args.error_rate)
+    os.environ["LLM_STUB_YES_RATE"] = str(args.fraud_rate)
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(directory, 'bench.db')}")
+
+
+async def run_scenarios(args, directory: str) -> List[dict]:
+    rng = random.Random(args.seed)
+    results = []
+    for scenario in args.scenarios:
+        payloads = [make_payload(rng) for _ in range(args.transactions)]
+        if scenario == "graph":
+            results.append(await bench_graph(payloads, args.concurrency))
+        elif scenario == "endpoint":
+            results.append(await bench_endpoint(payloads, args.concurrency))
+        elif scenario == "db":
+            results.append(await bench_db(payloads, args.concurrency))
+        elif scenario == "ingest":
+            results.append(await bench_ingest(payloads, args.concurrency, directory))
+    return results
+
+
+def print_table(results: List[dict]) -> None:
+    print(f"{'scenario':<10}{'count':>8}{'errors':>8}{'tx/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        cells = [result.get(key) for key in ("throughput", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{result['scenario']:<10}{result['count']:>8}{result['errors']:>8}"
+              + "".join(f"{'-' if cell is None else cell:>10}" for cell in cells))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", default="lognormal:200:0.5", help="stub model latency, distribution:mean_ms[:spread]")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fraud-rate", type=float, default=0.05, help="share of 'yes' verdicts from the stub model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="JSON file to write the results to")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(args, directory)
+        results = asyncio.run(run_scenarios(args, directory))
+
+    print_table(results)
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,91 @@
 import sys
 import os
+import tempfile
 
 # Add the project root to the Python path to allow imports from 'app'
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Serve the built-in recovery summaries and answer any other model call locally, so tests don't need the Gemini API
+os.environ.setdefault("RECOVERY_SUMMARY_MODE", "static")
+os.environ.setdefault("LLM_PROVIDER", "stub")
+# Agents ask GEMINI_MODEL directly unless a test builds its own cascade
+os.environ.setdefault("CASCADE_MODELS", "")
+# Keep test writes out of the application's database and checkpoint file
+_scratch = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'test_transactions.db')}")
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(_scratch, "test_checkpoints.db"))
+
+import pytest
+
+CREATED_AT = "2025-06-30T20:53:06+05:30"
+
+
+def _transaction_payload(capture_id="cap_test", amount=1000, currency="SGD", status="SUCCESS", metadata=None, **overrides):
+    # "cap_x" gets "req_x" and "chg_x", so each capture id comes with its own request and charge ids
+    suffix = capture_id[len("cap_"):] if capture_id.startswith("cap_") else capture_id
+    data = {
+        "captureId": capture_id,
+        "requestId": f"req_{suffix}",
+        "chargeId": f"chg_{suffix}",
+        "status": status,
+        "amount": {"value": amount, "currency": currency},
+        "metadata": metadata or {},
+        "createdAt": CREATED_AT,
+        "updatedAt": CREATED_AT
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.fixture
+def transaction_payload():
+    """Builds transaction request bodies; other fields can be overridden by their API name, e.g. requestId=..."""
+    return _transaction_payload
+
+
+@pytest.fixture
+def make_transaction():
+    """Builds Transaction models from the same arguments as transaction_payload."""
+    from app.models.schemas import Transaction
+
+    def make(*args, **kwargs):
+        return Transaction.model_validate(_transaction_payload(*args, **kwargs))
+    return make
+
+
+@pytest.fixture(autouse=True)
+def clear_verdict_cache():
+    """Keeps cached LLM verdicts from leaking between tests."""
+    from app.core.cache import verdict_cache
+    verdict_cache.clear()
+    yield
+    verdict_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_idempotency_guard():
+    """Forgets capture ids seen by earlier tests."""
+    from app.core.idempotency import processing_guard
+    processing_guard.clear()
+    yield
+    processing_guard.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_fraud_features():
+    """Starts every test without fraud scoring baselines or velocity counts."""
+    from app.agents.failure_detection_agent import fraud_scorer, velocity_store
+    fraud_scorer.reset()
+    velocity_store.reset()
+    yield
+    fraud_scorer.reset()
+    velocity_store.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breaker():
+    """Keeps simulated model failures in one test from opening the circuit for the next."""
+    from app.core.resilience import llm_breaker
+    llm_breaker.reset()
+    yield
+    llm_breaker.reset()
@@ -0,0 +1,64 @@
+import asyncio
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from app.agents import failure_detection_agent
+from app.agents.batch import process_transactions
+from app.core.batching import MicroBatcher, parse_batch_verdicts
+
+
+def test_parse_batch_verdicts():
+    """
+    Tests that numbered verdict lines are parsed and out-of-range lines ignored.
+    """
+    content = "1: yes\n2. NO\n[3] - yes\n7: no"
+    assert parse_batch_verdicts(content, 3) == {0: True, 1: False, 2: True}
+
+
+def test_micro_batcher_coalesces_and_retries_missing_items():
+    """
+    Tests that concurrent submissions share one request and skipped items are asked singly.
+    """
+    sent = []
+
+    async def send_batch(items):
+        sent.append(items)
+        return "1: yes\n3: no"
+
+    async def send_one(item):
+        sent.append(item)
+        return True
+
+    async def run():
+        batcher = MicroBatcher(send_batch, send_one, max_batch_size=3, max_wait=1)
+        return await asyncio.gather(*(batcher.submit(item) for item in ["a", "b", "c"])), batcher
+
+    verdicts, batcher = asyncio.run(run())
+    assert verdicts == [True, True, False]
+    assert sent == [["a", "b", "c"], "b"]
+    assert batcher.requests == 2
+
+
+def test_process_transactions_batches_fraud_checks(make_transaction, monkeypatch):
+    """
+    Tests that a batch of transactions reaches the fraud model in a single request.
+    """
+    prompts = []
+
+    def answer(payload):
+        prompts.append(payload)
+        # Flag every even-numbered transaction in the batch
+        count = payload['transactions_json'].count("Transaction ")
+        return AIMessage(content="\n".join(f"{i}: {'yes' if i % 2 == 0 else 'no'}" for i in range(1, count + 1)))
+
+    async def aanswer(payload):
+        return answer(payload)
+
+    monkeypatch.setattr(failure_detection_agent, "batch_fraud_detection_agent", RunnableLambda(answer, afunc=aanswer))
+
+    transactions = [make_transaction(f"cap_batch_{i}") for i in range(5)]
+    results = process_transactions(transactions, batch_size=10, max_wait=0.05)
+
+    assert len(prompts) == 1
+    assert [result['transaction'].capture_id for result in results] == [t.capture_id for t in transactions]
+    assert all(result['is_valid'] for result in results)
+    assert sum(result['is_fraudulent'] for result in results) == 2
@@ -0,0 +1,99 @@
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+from app.agents import failure_detection_agent
+from app.core import cascade as cascade_module, llm
+from app.core.cascade import VERDICT_FORMAT, ModelCascade, Tier, Verdict, parse_verdict
+from app.core.config import GEMINI_MODEL
+from app.core.llm import chat_model
+from app.core.resilience import CircuitBreaker, GuardedCall
+from app.core.state import new_agent_state
+from app.core.stub_llm import StubChatModel
+
+CHEAP_MODEL = "gemini-2.0-flash-lite"
+
+
+@pytest.fixture
+def models(monkeypatch):
+    """Installs stub clients for the cheap and final models and a cheap tier in front of fraud detection."""
+    def install(cheap: StubChatModel, final: StubChatModel):
+        llm.register_client(CHEAP_MODEL, cheap)
+        llm.register_client(GEMINI_MODEL, final)
+        tier = Tier(CHEAP_MODEL, failure_detection_agent.prompt | chat_model(CHEAP_MODEL, agent="fraud_detection"),
+                    GuardedCall("fraud_detection", CircuitBreaker(), deadline=None))
+        monkeypatch.setattr(failure_detection_agent.cascade, "tiers", [tier])
+        return cheap, final
+
+    yield install
+    llm.reset_clients()
+
+
+def test_parse_verdict_reads_structured_and_bare_answers():
+    """
+    Tests that JSON verdicts (with or without fences and confidence) and bare yes/no answers are read, and anything else isn't.
+    """
+    assert parse_verdict('{"verdict": "yes", "confidence": 0.92}') == Verdict(True, 0.92)
+    assert parse_verdict('```json\n{"verdict": "No", "confidence": 3}\n```') == Verdict(False, 1.0)
+    assert parse_verdict('{"verdict": "no"}') == Verdict(False, None)
+    assert parse_verdict("Yes.") == Verdict(True, None)
+    assert parse_verdict('{"verdict": "maybe", "confidence": 0.5}') is None
+    assert parse_verdict("I cannot tell") is None
+
+
+def test_confident_cheap_verdict_skips_the_final_model(models):
+    """
+    Tests that a cheap-tier verdict at or above the threshold is used without asking GEMINI_MODEL.
+    """
+    cheap, final = models(StubChatModel(script=["yes"], confidence=0.95), StubChatModel(script=["no"]))
+
+    assert failure_detection_agent._ask("transaction 1") is True
+    assert (cheap.calls, final.calls) == (1, 0)
+    tier = failure_detection_agent.cascade.stats()["tiers"][CHEAP_MODEL]
+    assert tier["answers"] >= 1
+    assert tier["cost_usd"] > 0
+
+
+def test_unsure_cheap_verdict_escalates(models):
+    """
+    Tests that a cheap-tier verdict below the threshold is replaced by the final model's answer.
+    """
+    cheap, final = models(StubChatModel(script=["no"], confidence=0.4), StubChatModel(script=["yes"]))
+
+    assert failure_detection_agent._ask("transaction 2") is True
+    assert (cheap.calls, final.calls) == (1, 1)
+
+
+def test_cascade_escalates_an_unsure_cheap_answer_to_the_final_model(monkeypatch):
+    """
+    Tests that a ModelCascade asks its cheap tier first, escalates an unsure answer and reads GEMINI_MODEL's as final.
+    """
+    monkeypatch.setattr(cascade_module, "_cascades", [])
+    cheap, final = StubChatModel(script=["yes"], confidence=0.3), StubChatModel(script=["no"], confidence=0.6)
+    llm.register_client(CHEAP_MODEL, cheap)
+    llm.register_client(GEMINI_MODEL, final)
+    prompt = ChatPromptTemplate.from_template("Is {transaction} fraudulent? " + VERDICT_FORMAT)
+    try:
+        cascade = ModelCascade("cascade_test", prompt, [CHEAP_MODEL, GEMINI_MODEL], threshold=0.8)
+
+        assert [tier.model for tier in cascade.tiers] == [CHEAP_MODEL]
+        assert cascade.key == f"{CHEAP_MODEL}>{GEMINI_MODEL}@0.8"
+        assert cascade.ask_cheap({"transaction": "transaction 4"}) is None
+        answer = (prompt | chat_model(GEMINI_MODEL, agent="cascade_test")).invoke({"transaction": "transaction 4"})
+        assert cascade.final(answer.content) == Verdict(False, 0.6)
+    finally:
+        llm.reset_clients()
+
+    assert (cheap.calls, final.calls) == (1, 1)
+    stats = cascade_module.cascade_stats()["cascade_test"]["tiers"]
+    assert stats[CHEAP_MODEL]["answers"] == stats[GEMINI_MODEL]["answers"] == 1
+    assert stats[CHEAP_MODEL]["escalation_rate"] == 1.0 and stats[GEMINI_MODEL]["escalation_rate"] == 0.0
+
+def test_unreadable_final_answer_falls_back_to_rules(make_transaction, models):
+    """
+    Tests that an answer that is neither yes nor no degrades to the rule-based check instead of counting as 'no'.
+    """
+    models(StubChatModel(script=["maybe"], confidence=0.9), StubChatModel(script=["maybe"]))
+
+    state = failure_detection_agent.run_fraud_detection_agent(new_agent_state(make_transaction("cap_cascade_3", amount=20000)))
+
+    assert state['is_fraudulent'] is True
+    assert state['history'][-1] == "Fraud Detection Agent: Transaction is fraudulent (degraded: unparseable verdict; rule-based check)."
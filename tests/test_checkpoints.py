@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+import pytest
+from app.agents import durable, failure_detection_agent, monitoring_agent
+from app.core.checkpoints import SqliteCheckpointSaver
+from app.core.config import SQLITE_BUSY_TIMEOUT_MS
+from app.core.state import new_agent_state
+
+
+@pytest.fixture
+def validations(monkeypatch):
+    runs = []
+    apply_rules = monitoring_agent._apply_rules
+
+    def counting_apply_rules(state):
+        runs.append(state['transaction'].capture_id)
+        return apply_rules(state)
+
+    monkeypatch.setattr(monitoring_agent, "_apply_rules", counting_apply_rules)
+    return runs
+
+
+def test_interrupted_run_resumes_after_the_last_completed_node(make_transaction, monkeypatch, validations):
+    """
+    Tests that a run failing in fraud detection keeps its checkpoints and the next run skips validation.
+    """
+    transaction = make_transaction("cap_checkpoint_1")
+    prescore = failure_detection_agent._prescore
+
+    def crash(state, speculative=False):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(failure_detection_agent, "_prescore", crash)
+    with pytest.raises(RuntimeError):
+        asyncio.run(durable.ainvoke_durable(new_agent_state(transaction)))
+    # Still leased to this process, as if it were running; released, it is the next process's to resume
+    assert durable.interrupted_transactions() == []
+    durable.release_runs()
+    assert [t.capture_id for t in durable.interrupted_transactions()] == ["cap_checkpoint_1"]
+
+    monkeypatch.setattr(failure_detection_agent, "_prescore", prescore)
+    final_state = asyncio.run(durable.ainvoke_durable(new_agent_state(transaction)))
+
+    assert validations == ["cap_checkpoint_1"]
+    assert final_state['is_valid'] is True
+    assert final_state['is_fraudulent'] is False
+    assert final_state['history'][0].startswith("Validation Agent")
+    assert durable.interrupted_transactions() == []
+
+
+def test_finished_run_leaves_no_checkpoints(make_transaction, validations):
+    """
+    Tests that a completed run deletes its thread, so running the transaction again starts from the beginning.
+    """
+    transaction = make_transaction("cap_checkpoint_2")
+    for _ in range(2):
+        asyncio.run(durable.ainvoke_durable(new_agent_state(transaction)))
+    assert validations == ["cap_checkpoint_2", "cap_checkpoint_2"]
+    assert durable.checkpoint_stats() == {"unfinished_runs": 0, "checkpoints": 0}
+
+
+def test_compact_keeps_each_threads_latest_checkpoint(tmp_path):
+    """
+    Tests that compaction drops all but the newest checkpoint of each thread, which is still the one resumed from.
+    """
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    for thread_id in ("a", "b"):
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        for step in range(3):
+            checkpoint = {"v": 4, "id": f"{thread_id}-{step}", "ts": "", "channel_values": {"step": step},
+                          "channel_versions": {}, "versions_seen": {}}
+            config = saver.put(config, checkpoint, {"step": step}, {})
+            saver.put_writes(config, [("step", step)], task_id=f"task-{step}")
+
+    saver.compact()
+
+    assert saver.stats() == {"unfinished_runs": 2, "checkpoints": 2}
+    latest = saver.get_tuple({"configurable": {"thread_id": "a"}})
+    assert latest.checkpoint["channel_values"] == {"step": 2}
+    assert latest.pending_writes == [("task-2", "step", 2)]
+
+
+def test_only_runs_of_stopped_processes_are_resumed(tmp_path):
+    """
+    Tests that a thread leased to a live process isn't handed to another process sharing the file until its
+    heartbeat expires, and then only to one of them.
+    """
+    path = str(tmp_path / "checkpoints.db")
+    running, starting, also_starting = (SqliteCheckpointSaver(path, lease_timeout=60) for _ in range(3))
+    config = {"configurable": {"thread_id": "cap_a", "checkpoint_ns": ""}}
+    checkpoint = {"v": 4, "id": "cap_a-0", "ts": "", "channel_values": {}, "channel_versions": {}, "versions_seen": {}}
+    assert running.claim("cap_a")
+    running.put(config, checkpoint, {}, {})
+
+    assert starting.abandoned_thread_ids() == []
+    assert not starting.claim("cap_a", take_over=False)
+    assert running._conn.execute("PRAGMA busy_timeout").fetchone()[0] == SQLITE_BUSY_TIMEOUT_MS
+
+    # The running process stops renewing its heartbeat
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE leases SET heartbeat = heartbeat - 120")
+    assert starting.abandoned_thread_ids() == also_starting.abandoned_thread_ids() == ["cap_a"]
+    assert starting.claim("cap_a", take_over=False)
+    assert not also_starting.claim("cap_a", take_over=False)
+    assert also_starting.abandoned_thread_ids() == []
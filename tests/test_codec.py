@@ -0,0 +1,55 @@
+import json
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from app import main
+from app.core import codec
+from app.core.state import AgentState, new_agent_state
+from app.models.schemas import Transaction
+
+METADATA = {"merchantId": "merchant_1", "note": "café"}
+
+
+def test_transaction_is_encoded_once_and_reused(make_transaction):
+    """
+    Tests that the canonical encoding is cached on the transaction and spliced into encoded states as is.
+    """
+    transaction = make_transaction("cap_codec_1", metadata=METADATA)
+    encoded = codec.encode_transaction(transaction)
+    state = new_agent_state(transaction)
+
+    assert codec.encode_transaction(transaction) is encoded
+    assert encoded.data == transaction.model_dump(by_alias=True)
+    assert codec.dumps(state).startswith(b'{"transaction":' + encoded.json + b",")
+    assert json.loads(codec.dumps(state)) == TypeAdapter(AgentState).dump_python(state, mode="json", by_alias=True)
+    assert "_encoded" not in transaction.model_dump() and Transaction.model_validate(encoded.data) == transaction
+
+
+def test_canonical_json_is_compact_sorted_and_total():
+    """
+    Tests that canonical JSON sorts keys, keeps non-ASCII text, and writes non-string keys and unknown types as strings.
+    """
+    assert codec.canonical_json({"b": 1, "a": {"d": "é", "c": None}}) == '{"a":{"c":null,"d":"é"},"b":1}'
+    assert codec.canonical_json({1: {2, 3} - {2, 3}}) == '{"1":"set()"}'
+
+
+def test_endpoint_parses_and_encodes_with_the_codec(transaction_payload):
+    """
+    Tests that /process_transaction/ answers with the same state as before and reports body errors as a 422.
+    """
+    body = transaction_payload("cap_codec_1", metadata=METADATA)
+    with TestClient(main.app) as client:
+        response = client.post("/process_transaction/", json=body)
+        replay = client.post("/process_transaction/", json=body)
+        invalid = client.post("/process_transaction/", json={**body, "amount": {"value": "lots"}})
+        malformed = client.post("/process_transaction/", content=b"{", headers={"Content-Type": "application/json"})
+        schema = client.get("/openapi.json").json()["paths"]["/process_transaction/"]["post"]["requestBody"]
+
+    assert response.status_code == 200
+    assert response.json()["transaction"] == body
+    assert response.json()["fulfillment_status"] == "SUCCESS"
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["transaction"] == body
+    assert invalid.status_code == 422
+    assert {tuple(error["loc"]) for error in invalid.json()["detail"]} == {("body", "amount", "value"), ("body", "amount", "currency")}
+    assert malformed.status_code == 422 and malformed.json()["detail"][0]["type"] == "json_invalid"
+    assert schema["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/Transaction"}
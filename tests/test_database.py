@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect, text
+from app.main import app
+from app.models.database import OBSOLETE_INDEXES, Transaction, async_database_url, create_schema, make_engine
+
+
+def test_sqlite_engine_uses_wal(tmp_path):
+    """
+    Tests that SQLite connections are opened with the WAL and synchronous pragmas.
+    """
+    engine = make_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # synchronous=NORMAL is reported as 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+
+
+def test_async_database_url_picks_async_driver():
+    """
+    Tests that sync URLs are mapped onto the matching async driver.
+    """
+    assert async_database_url("sqlite:////tmp/x.db") == "sqlite+aiosqlite:////tmp/x.db"
+    assert async_database_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert async_database_url("postgresql+asyncpg://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+
+def test_connection_endpoint_uses_async_session():
+    """
+    Tests that the connection check runs through the async get_db session.
+    """
+    with TestClient(app) as client:
+        response = client.get("/api/connection")
+    assert response.status_code == 200
+    assert response.json() == {"connected": True}
+
+
+def test_create_schema_drops_indexes_the_composite_ones_cover(tmp_path):
+    """
+    Tests that upgrading a database drops the single-column status and created_at indexes and keeps the composite ones.
+    """
+    engine = make_engine(f"sqlite:///{tmp_path / 'upgrade.db'}")
+    create_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_transactions_status ON transactions (status)"))
+        conn.execute(text("CREATE INDEX ix_transactions_created_at ON transactions (created_at)"))
+
+    create_schema(engine)
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("transactions")}
+    assert not indexes & set(OBSOLETE_INDEXES)
+    assert {"ix_transactions_status_created_at_id", "ix_transactions_created_at_id"} <= indexes
+    assert not {index.name for index in Transaction.__table__.indexes} & set(OBSOLETE_INDEXES)
+
+
+def test_create_schema_adds_columns_missing_from_older_tables(tmp_path):
+    """
+    Tests that upgrading a database adds the columns added to a model since its table was created, keeping its rows.
+    """
+    engine = make_engine(f"sqlite:///{tmp_path / 'upgrade.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE processing_jobs (id VARCHAR PRIMARY KEY, capture_id VARCHAR, payload JSON NOT NULL,"
+                          " status VARCHAR NOT NULL, result JSON, error VARCHAR, created_at DATETIME, finished_at DATETIME)"))
+        conn.execute(text("INSERT INTO processing_jobs (id, payload, status) VALUES ('job_1', '{}', 'queued')"))
+
+    create_schema(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("processing_jobs")}
+    assert {"owner", "heartbeat_at"} <= columns
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id, status, owner FROM processing_jobs")).all() == [("job_1", "queued", None)]
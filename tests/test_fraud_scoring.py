@@ -0,0 +1,113 @@
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.agents import failure_detection_agent
+from app.core.fraud_scoring import ESCALATE, FAIL, PASS, AmountSketch, FraudScorer
+from app.core.state import new_agent_state
+from app.models.database import Base, Transaction as TransactionRecord
+
+
+def seeded_scorer(**kwargs):
+    scorer = FraudScorer(min_samples=10, **kwargs)
+    for amount in range(900, 1100, 5):
+        scorer.observe("SGD", amount, {"merchantId": "m1"})
+    return scorer
+
+
+def test_sketch_tracks_mean_and_quantiles():
+    """
+    Tests that the streaming sketch approximates the median of what it has seen.
+    """
+    sketch = AmountSketch()
+    for amount in range(1, 1001):
+        sketch.add(amount)
+    assert sketch.count == 1000
+    assert 400 <= sketch.quantile(0.5) <= 600
+
+
+def test_no_baseline_escalates(make_transaction):
+    """
+    Tests that a currency without enough history is left to the LLM.
+    """
+    assessment = seeded_scorer().assess(make_transaction(currency="USD"))
+    assert assessment.decision == ESCALATE
+    assert assessment.score is None
+
+
+def test_clear_pass_clear_fail_and_ambiguous_band(make_transaction):
+    """
+    Tests that typical amounts pass, extreme amounts fail and the band in between escalates.
+    """
+    scorer = seeded_scorer(pass_threshold=2.0, fail_threshold=4.0)
+    assert scorer.assess(make_transaction()).decision == PASS
+    assert scorer.assess(make_transaction(amount=1_000_000)).decision == FAIL
+    ambiguous = scorer.assess(make_transaction(amount=1180))
+    assert ambiguous.decision == ESCALATE
+    assert 2.0 < ambiguous.score < 4.0
+
+
+def test_unusually_small_amounts_are_not_cleared(make_transaction):
+    """
+    Tests that amounts far below the baseline (card testing) score on the absolute z-score and fail locally.
+    """
+    assessment = seeded_scorer(pass_threshold=2.0, fail_threshold=4.0).assess(make_transaction(amount=1))
+    assert assessment.decision == FAIL
+    assert assessment.score > 4.0
+
+
+def test_metadata_baseline_is_bounded():
+    """
+    Tests that per-metadata baselines evict the least recently seen values.
+    """
+    scorer = FraudScorer(metadata_keys=["merchantId"], max_keys=2)
+    for merchant in ["a", "b", "c"]:
+        scorer.observe("SGD", 100, {"merchantId": merchant})
+    assert len(scorer._metadata) == 2
+    assert ("merchantId", "a") not in scorer._metadata
+
+
+def test_agent_decides_clear_cases_locally(make_transaction, monkeypatch):
+    """
+    Tests that the fraud agent skips the LLM when the local score is conclusive.
+    """
+    def fail(_):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr(failure_detection_agent, "fraud_detection_agent", RunnableLambda(fail))
+    for amount in range(900, 1100, 5):
+        failure_detection_agent.fraud_scorer.observe("SGD", amount)
+
+    state = failure_detection_agent.run_fraud_detection_agent(new_agent_state(make_transaction(amount=1_000_000)))
+    assert state['is_fraudulent'] is True
+    assert "local score" in state['history'][-1]
+    assert state['fraud_score'] > 4.0
+
+
+def test_cached_verdicts_feed_the_baselines(make_transaction, monkeypatch):
+    """
+    Tests that a transaction answered from the verdict cache is learned from like one the model answered.
+    """
+    monkeypatch.setattr(failure_detection_agent, "fraud_detection_agent", RunnableLambda(lambda _: AIMessage(content="no")))
+    for i in range(2):
+        state = failure_detection_agent.run_fraud_detection_agent(new_agent_state(make_transaction(f"cap_score_{i}")))
+        assert state['is_fraudulent'] is False
+    assert state['history'][-1] == "Fraud Detection Agent: Transaction is not fraudulent (cached)."
+    assert failure_detection_agent.fraud_scorer._currencies["SGD"].count == 2
+
+
+def test_rebuild_replays_only_transactions_screened_as_not_fraudulent():
+    """
+    Tests that warming the baselines skips flagged transactions and invalid ones, which have no fraud verdict.
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        for i, is_fraudulent in enumerate([False, True, None]):
+            db.add(TransactionRecord(capture_id=f"cap_score_{i}", request_id=f"req_score_{i}", charge_id=f"chg_score_{i}",
+                                     status="SUCCESS", amount_value=1000, amount_currency="SGD", transaction_metadata={},
+                                     is_valid=is_fraudulent is not None, is_fraudulent=is_fraudulent))
+        db.commit()
+        scorer = FraudScorer()
+        assert scorer.rebuild_from_db(db) == 1
+    assert scorer._currencies["SGD"].count == 1
@@ -0,0 +1,180 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app import main
+from app.core.idempotency import BloomFilter, IdempotencyGuard
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """
+    Tests that every added key is reported present and unseen keys rarely are.
+    """
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"cap_{i}")
+
+    assert all(f"cap_{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other_{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_concurrent_duplicates_share_one_execution():
+    """
+    Tests that duplicates arriving while the first run is in flight wait for it, and later ones are loaded.
+    """
+    executions = []
+    loads = []
+
+    async def run():
+        guard = IdempotencyGuard(capacity=100, error_rate=0.01)
+        stored = asyncio.get_running_loop().create_future()
+
+        async def execute():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return {"fulfillment_status": "SUCCESS"}, stored
+
+        async def load(key):
+            loads.append(key)
+            return {"fulfillment_status": "SUCCESS", "from": "db"}
+
+        concurrent = await asyncio.gather(*(guard.run("cap_1", execute, load) for _ in range(5)))
+        # Until the result is stored, repeats are answered from memory
+        before_stored = await guard.run("cap_1", execute, load)
+        stored.set_result(None)
+        await asyncio.sleep(0)
+        after_stored = await guard.run("cap_1", execute, load)
+        return concurrent, before_stored, after_stored, guard.stats()
+
+    concurrent, before_stored, after_stored, stats = asyncio.run(run())
+    assert len(executions) == 1
+    assert [replayed for _, replayed in concurrent].count(False) == 1
+    assert before_stored == ({"fulfillment_status": "SUCCESS"}, True)
+    assert after_stored == ({"fulfillment_status": "SUCCESS", "from": "db"}, True)
+    assert loads == ["cap_1"]
+    assert stats == {"seen": 1, "in_flight": 0, "executions": 1, "replays": 6}
+
+
+def test_key_claimed_during_the_lookup_is_not_executed_again():
+    """
+    Tests that a delivery finding the key claimed once its stored result is looked up waits for that run instead.
+    """
+    executions = []
+
+    async def run():
+        guard = IdempotencyGuard(capacity=100, error_rate=0.01)
+        guard.add("cap_1")
+
+        async def load(key):
+            # Another delivery claims the key while this one reads the stored result
+            assert guard.claim(key)
+            asyncio.get_running_loop().call_later(0.01, guard.complete, key, {"fulfillment_status": "SUCCESS"})
+            return None
+
+        async def execute():
+            executions.append(1)
+            return {"fulfillment_status": "FAILURE"}, None
+
+        return await guard.run("cap_1", execute, load)
+
+    assert asyncio.run(run()) == ({"fulfillment_status": "SUCCESS"}, True)
+    assert executions == []
+
+def test_redelivered_transaction_replays_stored_result(transaction_payload, monkeypatch):
+    """
+    Tests that posting a transaction again returns the stored final state without running the agents.
+    """
+    runs = []
+    ainvoke_durable = main.ainvoke_durable
+
+    async def counting_ainvoke(state):
+        runs.append(state['transaction'].capture_id)
+        return await ainvoke_durable(state)
+
+    monkeypatch.setattr(main, "ainvoke_durable", counting_ainvoke)
+    transaction = transaction_payload("cap_idem_1", amount=1500, status="FAILURE")
+
+    with TestClient(main.app) as client:
+        first = client.post("/process_transaction/?durable=true", json=transaction)
+        second = client.post("/process_transaction/", json=transaction)
+
+    assert first.status_code == second.status_code == 200
+    assert runs == ["cap_idem_1"]
+    assert "idempotent-replayed" not in first.headers
+    assert second.headers["idempotent-replayed"] == "true"
+    for key in ("is_valid", "is_fraudulent", "fulfillment_status", "error_message", "history"):
+        assert second.json()[key] == first.json()[key]
+
+
+def test_redelivery_with_different_contents_is_rejected(transaction_payload):
+    """
+    Tests that a capture id processed before is not answered with its old verdicts when the redelivered body differs.
+    """
+    with TestClient(main.app) as client:
+        first = client.post("/process_transaction/?durable=true", json=transaction_payload("cap_idem_2"))
+        changed = client.post("/process_transaction/", json=transaction_payload("cap_idem_2", amount=99999))
+        batch = client.post("/process_transactions/batch", json=[transaction_payload("cap_idem_3"), transaction_payload("cap_idem_2", amount=99999)])
+        repeated = client.post("/process_transactions/batch", json=[transaction_payload("cap_idem_4"), transaction_payload("cap_idem_4", amount=1)])
+        same = client.post("/process_transaction/", json=transaction_payload("cap_idem_2"))
+
+    assert first.status_code == same.status_code == 200
+    assert same.headers["idempotent-replayed"] == "true"
+    assert changed.status_code == batch.status_code == repeated.status_code == 409
+    assert "amount_value" in changed.json()["detail"]
+
+
+def test_single_delivery_waits_for_a_batch_processing_it(make_transaction, monkeypatch):
+    """
+    Tests that a single delivery arriving while a batch processes the same transaction shares the batch's result.
+    """
+    runs = []
+    started = asyncio.Event()
+    aprocess_transactions = main.aprocess_transactions
+
+    async def slow_batch(transactions):
+        started.set()
+        await asyncio.sleep(0.05)
+        return await aprocess_transactions(transactions)
+
+    async def counting_ainvoke(state):
+        runs.append(state['transaction'].capture_id)
+
+    monkeypatch.setattr(main, "aprocess_transactions", slow_batch)
+    monkeypatch.setattr(main, "ainvoke_durable", counting_ainvoke)
+    transaction = make_transaction("cap_idem_5")
+
+    async def deliver():
+        started.clear()
+        batch = asyncio.ensure_future(main.process_transactions_batch([transaction]))
+        await started.wait()
+        return await asyncio.gather(batch, main.process_transaction(transaction, durable=True))
+
+    with TestClient(main.app) as client:
+        batch, single = client.portal.call(deliver)
+        stored = client.get("/api/transactions", params={"limit": 100}).json()
+
+    assert runs == []
+    assert single.headers["idempotent-replayed"] == "true"
+    assert json.loads(single.body) == json.loads(batch.body)[0]
+    assert [row["capture_id"] for row in stored["items"]].count("cap_idem_5") == 1
+
+
+def test_batch_finishes_a_half_recorded_transaction(make_transaction, transaction_payload):
+    """
+    Tests that a batch resubmitting a transaction whose earlier delivery was recorded without a result stores the result.
+    """
+    transaction = make_transaction("cap_idem_6")
+
+    async def record_only():
+        await main.write_behind.enqueue_insert(main.record_values(transaction))
+
+    with TestClient(main.app) as client:
+        client.portal.call(record_only)
+        batch = client.post("/process_transactions/batch", json=[transaction_payload("cap_idem_6")])
+        replay = client.post("/process_transaction/", json=transaction_payload("cap_idem_6"))
+        stored = client.get("/api/transactions", params={"limit": 100}).json()
+
+    assert batch.status_code == replay.status_code == 200
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert replay.json()["fulfillment_status"] == batch.json()[0]["fulfillment_status"] == "SUCCESS"
+    assert [row["capture_id"] for row in stored["items"]].count("cap_idem_6") == 1
@@ -0,0 +1,190 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+import subprocess
+import sys
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app import ingest
+from app.agents import failure_detection_agent
+from app.models.database import Base, IngestCheckpoint, StatCounter, Transaction as TransactionRecord, make_async_engine
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def payload(transaction_payload):
+    def make(i):
+        return transaction_payload(f"cap_ingest_{i}", amount=1000 + i, metadata={"note": f"row {i}"})
+    return make
+
+
+@pytest.fixture(autouse=True)
+def clear_fraud_model(monkeypatch):
+    def answer_one(payload):
+        return AIMessage(content="no")
+
+    async def aanswer_one(payload):
+        return answer_one(payload)
+
+    def answer(payload):
+        count = payload['transactions_json'].count("Transaction ")
+        return AIMessage(content="\n".join(f"{i}: no" for i in range(1, count + 1)))
+
+    async def aanswer(payload):
+        return answer(payload)
+
+    monkeypatch.setattr(failure_detection_agent, "batch_fraud_detection_agent", RunnableLambda(answer, afunc=aanswer))
+    monkeypatch.setattr(failure_detection_agent, "fraud_detection_agent", RunnableLambda(answer_one, afunc=aanswer_one))
+
+
+async def make_session_factory(tmp_path):
+    engine = make_async_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def table_state(session_factory):
+    async with session_factory() as db:
+        capture_ids = (await db.execute(select(TransactionRecord.capture_id).order_by(TransactionRecord.id))).scalars().all()
+        counters = dict((await db.execute(select(StatCounter.name, StatCounter.value))).all())
+        checkpoints = dict((await db.execute(select(IngestCheckpoint.source, IngestCheckpoint.rows_done))).all())
+    return capture_ids, counters, checkpoints
+
+
+def test_jsonl_ingest_rejects_bad_rows_and_resumes(payload, tmp_path, monkeypatch):
+    """
+    Tests that invalid rows are rejected, and a run interrupted after a chunk resumes from its checkpoint.
+    """
+    path = tmp_path / "dump.jsonl.gz"
+    with gzip.open(path, "wt") as handle:
+        for i in range(7):
+            handle.write("{not json\n" if i == 3 else json.dumps(payload(i)) + "\n")
+
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+
+        # Fail the second chunk's commit to simulate an interrupted run
+        commit_chunk = ingest._commit_chunk
+        calls = []
+
+        async def failing_commit(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("interrupted")
+            return await commit_chunk(*args)
+
+        monkeypatch.setattr(ingest, "_commit_chunk", failing_commit)
+        with pytest.raises(RuntimeError):
+            await ingest.ingest_file(path, session_factory, chunk_size=3, source="dump")
+        interrupted = await table_state(session_factory)
+
+        monkeypatch.setattr(ingest, "_commit_chunk", commit_chunk)
+        stats = await ingest.ingest_file(path, session_factory, chunk_size=3, source="dump")
+        resumed = await table_state(session_factory)
+        await engine.dispose()
+        return interrupted, stats, resumed
+
+    interrupted, stats, resumed = asyncio.run(run())
+    assert interrupted == ([f"cap_ingest_{i}" for i in range(3)], {"total": 3, "status:SUCCESS": 3, "processed": 3,
+                                                                    "fulfillment:SUCCESS": 3}, {"dump": 3})
+    assert (stats.skipped, stats.rows, stats.inserted, stats.rejected) == (3, 4, 3, 1)
+    capture_ids, counters, checkpoints = resumed
+    assert capture_ids == [f"cap_ingest_{i}" for i in range(7) if i != 3]
+    assert counters["total"] == 6
+    assert checkpoints == {"dump": 7}
+
+
+def test_csv_ingest_skips_rows_already_stored(payload, tmp_path, monkeypatch):
+    """
+    Tests that CSV rows are nested into the API payload, and rows already in the table or repeated in the file
+    count as duplicates without being processed.
+    """
+    path = tmp_path / "dump.csv"
+    columns = ["captureId", "requestId", "chargeId", "status", "amount.value", "amount.currency", "metadata",
+               "createdAt", "updatedAt"]
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        for i in [0, 1, 2, 3, 1]:
+            p = payload(i)
+            writer.writerow([p["captureId"], p["requestId"], p["chargeId"], p["status"], p["amount"]["value"],
+                             p["amount"]["currency"], json.dumps(p["metadata"]), p["createdAt"], p["updatedAt"]])
+
+    processed = []
+    aprocess_transactions = ingest.aprocess_transactions
+
+    async def counting_process(transactions, **kwargs):
+        processed.append([transaction.capture_id for transaction in transactions])
+        return await aprocess_transactions(transactions, **kwargs)
+
+    monkeypatch.setattr(ingest, "aprocess_transactions", counting_process)
+
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+        first = await ingest.ingest_file(path, session_factory, chunk_size=10, source="first")
+        again = await ingest.ingest_file(path, session_factory, chunk_size=10, source="again")
+        async with session_factory() as db:
+            row = (await db.execute(select(TransactionRecord).where(TransactionRecord.capture_id == "cap_ingest_2"))).scalar_one()
+        state = await table_state(session_factory)
+        await engine.dispose()
+        return first, again, row, state
+
+    first, again, row, (capture_ids, counters, _) = asyncio.run(run())
+    assert (first.inserted, first.duplicates) == (4, 1)
+    assert (again.inserted, again.duplicates) == (0, 5)
+    assert processed == [[f"cap_ingest_{i}" for i in range(4)]]
+    assert row.amount_value == 1002 and row.transaction_metadata == {"note": "row 2"}
+    assert row.fulfillment_status == "SUCCESS"
+    assert len(capture_ids) == 4 and counters["total"] == 4
+
+
+def test_command_line_ingest_creates_the_schema(payload, tmp_path):
+    """
+    Tests that `python -m app.ingest` creates the tables on a fresh database instead of failing on the missing checkpoint table.
+    """
+    path = tmp_path / "dump.jsonl"
+    path.write_text("\n".join(json.dumps(payload(i)) for i in range(3)) + "\n")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'fresh.db'}", CHECKPOINT_DB="")
+    output = subprocess.run([sys.executable, "-m", "app.ingest", str(path)], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    assert output.returncode == 0, output.stderr
+
+    async def run():
+        engine = make_async_engine(env["DATABASE_URL"])
+        capture_ids, counters, checkpoints = await table_state(async_sessionmaker(engine, expire_on_commit=False))
+        await engine.dispose()
+        return capture_ids, counters, checkpoints
+
+    capture_ids, counters, checkpoints = asyncio.run(run())
+    assert capture_ids == [f"cap_ingest_{i}" for i in range(3)]
+    assert counters["total"] == 3
+    assert checkpoints == {str(path.resolve()): 3}
+
+
+def test_command_line_ingest_warms_the_local_screens(payload, tmp_path, monkeypatch):
+    """
+    Tests that the command line rebuilds the fraud baselines and velocity counters before processing the first chunk.
+    """
+    path = tmp_path / "dump.jsonl"
+    path.write_text(json.dumps(payload(0)) + "\n")
+    calls = []
+    aprocess_transactions = ingest.aprocess_transactions
+
+    async def recording_process(transactions, **kwargs):
+        calls.append("process")
+        return await aprocess_transactions(transactions, **kwargs)
+
+    monkeypatch.setattr(ingest, "warm_fraud_scorer", lambda: calls.append("fraud_scorer"))
+    monkeypatch.setattr(ingest, "warm_velocity_store", lambda: calls.append("velocity_store"))
+    monkeypatch.setattr(ingest, "aprocess_transactions", recording_process)
+
+    ingest.main([str(path)])
+
+    assert calls == ["fraud_scorer", "velocity_store", "process"]
@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from sqlalchemy import update
+from app.models.database import AsyncSessionLocal, ProcessingJob, create_schema, engine
+from app.models.jobs import DONE, QUEUED, RUNNING, JobQueue, QueueFull
+
+
+def test_submit_returns_202_and_long_poll_returns_the_final_state(transaction_payload):
+    """
+    Tests that a submitted transaction is accepted at once and its final state can be long-polled.
+    """
+    with TestClient(main.app) as client:
+        submitted = client.post("/process_transaction/jobs", json=transaction_payload("cap_job_1"))
+        assert submitted.status_code == 202
+        job_id = submitted.json()["job_id"]
+        assert submitted.headers["location"] == f"/jobs/{job_id}"
+
+        job = client.get(f"/jobs/{job_id}?wait=10").json()
+        assert client.get("/jobs/unknown").status_code == 404
+
+    assert job["status"] == DONE
+    assert job["capture_id"] == "cap_job_1"
+    assert job["state"]["transaction"]["captureId"] == "cap_job_1"
+    assert job["state"]["fulfillment_status"] == "SUCCESS"
+    assert job["state"]["history"][0] == "Validation Agent: Transaction is valid."
+
+
+def test_full_queue_sheds_with_503(transaction_payload, monkeypatch):
+    """
+    Tests that submissions beyond the maximum depth are refused with a Retry-After hint.
+    """
+    with TestClient(main.app) as client:
+        monkeypatch.setattr(main.job_queue, "max_depth", 0)
+        response = client.post("/process_transaction/jobs", json=transaction_payload("cap_job_full"))
+
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+
+
+def test_queue_bounds_depth_and_resumes_unfinished_jobs(make_transaction):
+    """
+    Tests that the queue refuses work at capacity and that jobs left queued by a stopped process run on the next start.
+    """
+    create_schema(engine)
+
+    async def scenario():
+        release = asyncio.Event()
+        processed = []
+
+        async def process(transaction):
+            processed.append(transaction.capture_id)
+            await release.wait()
+            return {"transaction": transaction, "history": ["done"]}
+
+        queue = JobQueue(workers=1, max_depth=2)
+        await queue.start(process)
+        first = await queue.submit(make_transaction("cap_job_a"))
+        second = await queue.submit(make_transaction("cap_job_b"))
+        with pytest.raises(QueueFull):
+            await queue.submit(make_transaction("cap_job_c"))
+        await asyncio.sleep(0.01)
+        assert queue.stats()["running"] == 1 and queue.stats()["queued"] == 1
+
+        # Stopping mid-job leaves both jobs queued in the table
+        await queue.stop()
+        assert (await queue.get(first))["status"] == QUEUED
+
+        release.set()
+        resumed = JobQueue(workers=2, max_depth=2)
+        assert await resumed.start(process) >= 2
+        results = [await resumed.get(job_id, wait=5) for job_id in (first, second)]
+        await resumed.stop()
+        return processed, results
+
+    processed, results = asyncio.run(scenario())
+    assert processed[:1] == ["cap_job_a"]
+    assert {"cap_job_a", "cap_job_b"} <= set(processed[1:])
+    assert [result["status"] for result in results] == [DONE, DONE]
+    assert results[0]["state"]["history"] == ["done"]
+
+
+def test_processes_sharing_the_table_run_each_job_once(make_transaction):
+    """
+    Tests that a job queued in several processes runs in the one that claims it, that running jobs are kept
+    at startup, and that a job whose owner stopped renewing its claim runs again.
+    """
+    create_schema(engine)
+
+    async def scenario():
+        processed = []
+
+        async def process(transaction):
+            processed.append(transaction.capture_id)
+            await asyncio.sleep(0.05)
+            return {"transaction": transaction, "history": ["done"]}
+
+        async def set_job(job_id, **values):
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(ProcessingJob).where(ProcessingJob.id == job_id).values(**values))
+                await db.commit()
+
+        # Submitted while no worker runs, so the job is only queued in the table
+        submitter = JobQueue(workers=0)
+        await submitter.start(process)
+        shared = await submitter.submit(make_transaction("cap_job_shared"))
+        live = await submitter.submit(make_transaction("cap_job_live"))
+        abandoned = await submitter.submit(make_transaction("cap_job_abandoned"))
+        await set_job(live, status=RUNNING, owner="other", heartbeat_at=datetime.utcnow(),
+                      finished_at=datetime.utcnow() - timedelta(days=30))
+        await set_job(abandoned, status=RUNNING, owner="stopped", heartbeat_at=datetime.utcnow() - timedelta(hours=1))
+
+        queues = [JobQueue(workers=2, retention_hours=1) for _ in range(3)]
+        for queue in queues:
+            await queue.start(process)
+
+        async def outcome(job_id):
+            # Whichever process claimed the job, its outcome shows in the table
+            for _ in range(250):
+                job = await queues[0].get(job_id)
+                if job["status"] == DONE:
+                    break
+                await asyncio.sleep(0.02)
+            return job
+
+        results = {job_id: await outcome(job_id) for job_id in (shared, abandoned)}
+        await asyncio.sleep(0.1)
+        kept = await queues[0].get(live)
+        for queue in queues + [submitter]:
+            await queue.stop()
+        return processed, results, kept
+
+    processed, results, kept = asyncio.run(scenario())
+    assert processed.count("cap_job_shared") == processed.count("cap_job_abandoned") == 1
+    assert "cap_job_live" not in processed
+    assert [result["status"] for result in results.values()] == [DONE, DONE]
+    assert kept["status"] == RUNNING
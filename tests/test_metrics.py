@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.agents.router import build_workflow
+from app.core import llm
+from app.core.config import GEMINI_MODEL
+from app.core.metrics import DECISIONS, LLM_REQUESTS, LLM_TOKENS, NODE_DURATION, Registry
+from app.core.state import new_agent_state
+from app.core.stub_llm import StubChatModel
+from app.main import app
+
+
+def test_registry_renders_prometheus_text():
+    """
+    Tests that counters and histograms are rendered in the Prometheus exposition format.
+    """
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", ["outcome"])
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.inc(outcome="ok")
+    requests.inc(2, outcome="ok")
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{outcome="ok"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'latency_seconds_sum 0.55' in lines
+    assert 'latency_seconds_count 2' in lines
+
+
+@pytest.mark.parametrize("topology", ["serial", "speculative"])
+def test_graph_runs_record_node_timings_and_llm_usage(make_transaction, topology):
+    """
+    Tests that each node's time lands in the state and the histogram, and LLM calls are counted with tokens.
+    """
+    llm.register_client(GEMINI_MODEL, StubChatModel(script=["no"]))
+    try:
+        before = {
+            "node": NODE_DURATION.count(node="run_fraud_detection_agent"),
+            "requests": LLM_REQUESTS.value(agent="fraud_detection", model=GEMINI_MODEL, outcome="ok"),
+            "tokens": LLM_TOKENS.value(agent="fraud_detection", model=GEMINI_MODEL, kind="prompt"),
+            "decisions": DECISIONS.value(agent="fraud_detection", source="llm"),
+        }
+        final_state = asyncio.run(build_workflow(topology).compile().ainvoke(new_agent_state(make_transaction("cap_metrics"))))
+    finally:
+        llm.reset_clients()
+
+    expected_nodes = {"run_validation_agent", "run_fraud_detection_agent", "run_recovery_agent"}
+    if topology == "speculative":
+        expected_nodes.add("join_fraud_detection")
+    assert set(final_state['timings']) == expected_nodes
+    assert all(ms >= 0 for ms in final_state['timings'].values())
+    assert NODE_DURATION.count(node="run_fraud_detection_agent") == before["node"] + 1
+    assert LLM_REQUESTS.value(agent="fraud_detection", model=GEMINI_MODEL, outcome="ok") == before["requests"] + 1
+    assert LLM_TOKENS.value(agent="fraud_detection", model=GEMINI_MODEL, kind="prompt") > before["tokens"]
+    assert DECISIONS.value(agent="fraud_detection", source="llm") == before["decisions"] + 1
+
+
+def test_metrics_endpoint():
+    """
+    Tests that /metrics serves the registry, including gauges read at scrape time.
+    """
+    with TestClient(app) as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE agent_node_duration_seconds histogram" in response.text
+    assert "write_behind_queue_depth 0" in response.text
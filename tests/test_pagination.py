@@ -0,0 +1,97 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.main import app
+from app.models.database import Base, Transaction as TransactionRecord, make_async_engine
+from app.models.pagination import (
+    InvalidCursor, TransactionFilters, decode_cursor, export_ndjson, iter_transactions, read_page
+)
+
+START = datetime(2025, 6, 30, 12, 0)
+
+
+def rows(count):
+    # Pairs of rows share a created_at so the id tie-breaker is exercised
+    return [
+        dict(
+            capture_id=f"cap_page_{i}", request_id=f"req_page_{i}", charge_id=f"chg_page_{i}",
+            status="SUCCESS" if i % 3 else "FAILURE", amount_value=100 + i,
+            amount_currency="SGD" if i % 2 else "USD", transaction_metadata={}, history=[],
+            is_fraudulent=i % 5 == 0, created_at=START + timedelta(minutes=i // 2)
+        )
+        for i in range(count)
+    ]
+
+
+async def make_session_factory(tmp_path, count):
+    engine = make_async_engine(f"sqlite:///{tmp_path / 'pages.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(TransactionRecord), rows(count))
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+def expected(count, **filters):
+    selected = [
+        row for row in rows(count)
+        if all(row[{"currency": "amount_currency"}.get(k, k)] == v for k, v in filters.items())
+    ]
+    ids = {row["capture_id"]: i + 1 for i, row in enumerate(rows(count))}
+    return [row["capture_id"] for row in sorted(selected, key=lambda r: (r["created_at"], ids[r["capture_id"]]), reverse=True)]
+
+
+@pytest.mark.parametrize("filters", [{}, {"currency": "SGD"}, {"status": "FAILURE", "is_fraudulent": True}])
+def test_pages_walk_every_row_once_in_order(tmp_path, filters):
+    """
+    Tests that following next_cursor visits every matching row once, newest first.
+    """
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path, 23)
+        seen = []
+        cursor = None
+        async with session_factory() as db:
+            while True:
+                page = await read_page(db, TransactionFilters(**filters), limit=4, cursor=cursor)
+                assert len(page["items"]) <= 4
+                seen.extend(item["capture_id"] for item in page["items"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+        await engine.dispose()
+        return seen
+
+    assert asyncio.run(run()) == expected(23, **filters)
+
+
+def test_export_streams_batches_as_gzipped_ndjson(tmp_path):
+    """
+    Tests that the export yields every row as one NDJSON line, compressed as a single gzip stream.
+    """
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path, 10)
+        batches = iter_transactions(session_factory, TransactionFilters(), batch_size=3)
+        chunks = [chunk async for chunk in export_ndjson(batches, compress=True)]
+        await engine.dispose()
+        return chunks
+
+    lines = gzip.decompress(b"".join(asyncio.run(run()))).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["capture_id"] for record in records] == expected(10)
+    assert records[0]["created_at"] == (START + timedelta(minutes=4)).isoformat()
+
+
+def test_invalid_cursor_is_rejected():
+    """
+    Tests that a malformed cursor raises InvalidCursor and is a 400 from the API.
+    """
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+    with TestClient(app) as client:
+        response = client.get("/api/transactions", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,66 @@
+import json
+from app.core.cache import verdict_key
+from app.core.payloads import OMITTED_KEY, PayloadEncoder, estimate_tokens
+from app.core.rules import VALIDATION_RULES, RuleEngine
+
+LONG_ID = "cap_" + "a" * 62
+METADATA = {"merchantId": "merchant_1", "reason": "Customer asked for the parcel to be left with the concierge after 6pm"}
+
+
+def test_payload_keeps_only_the_agents_fields_compactly(make_transaction):
+    """
+    Tests that a payload carries the selected fields, hashed ids and truncated text in compact JSON.
+    """
+    transaction = make_transaction(LONG_ID, metadata=METADATA)
+    encoded = PayloadEncoder("test", ("captureId", "amount", "metadata", "createdAt"), max_text_chars=32).encode(transaction)
+    payload = json.loads(encoded.text)
+
+    assert set(payload) == {"captureId", "amount", "metadata", "createdAt"}
+    assert payload["captureId"].startswith("cap_aa~") and len(payload["captureId"]) < 20
+    assert payload["createdAt"] == "2025-06-30T20:53:06+05:30"
+    assert payload["metadata"]["merchantId"] == "merchant_1"
+    assert payload["metadata"]["reason"].endswith("...") and len(payload["metadata"]["reason"]) == 32
+    assert " " not in encoded.text.replace(payload["metadata"]["reason"], "")
+    assert encoded.tokens < estimate_tokens(transaction.model_dump_json(indent=2)) / 2
+
+
+def test_encoding_is_canonical_and_distinguishes_values(make_transaction):
+    """
+    Tests that key order and code formatting don't change the payload (or cache key), but values do.
+    """
+    encoder = PayloadEncoder("test", ("status", "amount", "metadata"), normalize=True)
+    first = make_transaction(metadata={"b": 1, "a": 2})
+    second = make_transaction(metadata={"a": 2, "b": 1}, status=" success", currency="sgd")
+    third = make_transaction(metadata={"a": 2, "b": 1}, amount=1001)
+
+    assert encoder.encode(first).text == encoder.encode(second).text
+    assert encoder.encode(first).text != encoder.encode(third).text
+    assert verdict_key("fraud", "1", "m", encoder.encode(first).text) == verdict_key("fraud", "1", "m", encoder.encode(second).text)
+
+    # Distinct long ids stay distinct after hashing
+    ids = PayloadEncoder("test", ("captureId",))
+    assert ids.encode(make_transaction(LONG_ID)).text != ids.encode(make_transaction("cap_" + "a" * 61 + "b")).text
+
+
+def test_token_budget_drops_largest_metadata_first(make_transaction):
+    """
+    Tests that an oversized payload is brought under budget by dropping the largest metadata entries.
+    """
+    metadata = {"merchantId": "merchant_1", "notes": "x " * 30, "comment": "y " * 20}
+    encoder = PayloadEncoder("test", ("amount", "metadata"), max_text_chars=1000, token_budget=30)
+    encoded = encoder.encode(make_transaction(metadata=metadata))
+    payload = json.loads(encoded.text)
+
+    assert encoded.trimmed
+    assert encoded.tokens <= 30
+    assert "notes" not in payload["metadata"]
+    assert payload["metadata"]["merchantId"] == "merchant_1"
+    assert payload["metadata"][OMITTED_KEY] >= 1
+
+
+def test_validation_fields_follow_the_llm_rules():
+    """
+    Tests that the validation payload only includes what the LLM-judged rules look at.
+    """
+    engine = RuleEngine(VALIDATION_RULES, llm_rules=["currency", "timestamps"])
+    assert engine.llm_rule_fields() == ["amount", "createdAt", "updatedAt"]
@@ -0,0 +1,171 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.models.database import Base, Transaction as TransactionRecord, make_async_engine
+from app.models.persistence import WriteBehindQueue
+
+
+def row(i):
+    return dict(
+        capture_id=f"cap_wb_{i}", request_id=f"req_wb_{i}", charge_id=f"chg_wb_{i}", status="SUCCESS",
+        amount_value=1000, amount_currency="SGD", transaction_metadata={}, history=[]
+    )
+
+
+async def make_session_factory(tmp_path):
+    engine = make_async_engine(f"sqlite:///{tmp_path / 'wb.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def fetch_all(session_factory):
+    async with session_factory() as db:
+        return (await db.execute(select(TransactionRecord).order_by(TransactionRecord.capture_id))).scalars().all()
+
+
+def test_concurrent_writes_share_one_commit(tmp_path):
+    """
+    Tests that inserts and their result updates from many requests land in one group commit.
+    """
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+        queue = WriteBehindQueue(session_factory, flush_interval=0.05)
+        await queue.start()
+        futures = []
+        for i in range(10):
+            futures.append(queue.enqueue_insert(row(i)))
+            futures.append(queue.enqueue_update(f"cap_wb_{i}", {"fulfillment_status": "SUCCESS", "history": ["done"]}))
+        await asyncio.gather(*futures)
+        await queue.stop()
+        rows = await fetch_all(session_factory)
+        await engine.dispose()
+        return queue, rows
+
+    queue, rows = asyncio.run(run())
+    assert queue.flushes == 1
+    assert len(rows) == 10
+    assert all(r.fulfillment_status == "SUCCESS" and r.history == ["done"] for r in rows)
+
+
+def test_duplicate_only_fails_its_own_write(tmp_path):
+    """
+    Tests that a duplicate capture id in a group doesn't lose the other writes.
+    """
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+        queue = WriteBehindQueue(session_factory, flush_interval=0.05)
+        await queue.start()
+        await queue.enqueue_insert(row(1))
+        duplicate = queue.enqueue_insert(row(1))
+        other = queue.enqueue_insert(row(2))
+        await other
+        with pytest.raises(Exception):
+            await duplicate
+        await queue.stop()
+        rows = await fetch_all(session_factory)
+        await engine.dispose()
+        return rows
+
+    assert [r.capture_id for r in asyncio.run(run())] == ["cap_wb_1", "cap_wb_2"]
+
+
+def test_stop_flushes_queued_writes(tmp_path):
+    """
+    Tests that writes still queued at shutdown are committed.
+    """
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+        queue = WriteBehindQueue(session_factory, flush_interval=60)
+        await queue.start()
+        queue.enqueue_insert(row(1))
+        await queue.stop()
+        rows = await fetch_all(session_factory)
+        await engine.dispose()
+        return rows
+
+    assert len(asyncio.run(run())) == 1
+
+
+def test_update_without_a_recorded_insert_fails(tmp_path):
+    """
+    Tests that a result update whose insert failed (a conflicting charge id) fails instead of matching no row.
+    """
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+        queue = WriteBehindQueue(session_factory, flush_interval=0.05)
+        await queue.start()
+        await queue.enqueue_insert(row(1))
+        conflicting = queue.enqueue_insert({**row(2), "charge_id": "chg_wb_1"})
+        updated = queue.enqueue_update("cap_wb_2", {"fulfillment_status": "SUCCESS"})
+        outcomes = await asyncio.gather(conflicting, updated, return_exceptions=True)
+        await queue.stop()
+        rows = await fetch_all(session_factory)
+        await engine.dispose()
+        return outcomes, rows
+
+    outcomes, rows = asyncio.run(run())
+    assert all(isinstance(outcome, Exception) for outcome in outcomes)
+    assert [r.capture_id for r in rows] == ["cap_wb_1"]
+
+
+def test_write_through_keeps_each_transactions_order(tmp_path):
+    """
+    Tests that without the background task a transaction's update still commits after its insert.
+    """
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+        queue = WriteBehindQueue(session_factory, enabled=False)
+        inserted = queue.enqueue_insert(row(1))
+        updated = queue.enqueue_update("cap_wb_1", {"fulfillment_status": "SUCCESS", "history": ["done"]})
+        await asyncio.gather(inserted, updated)
+        rows = await fetch_all(session_factory)
+        await engine.dispose()
+        return rows
+
+    rows = asyncio.run(run())
+    assert [(r.fulfillment_status, r.history) for r in rows] == [("SUCCESS", ["done"])]
+
+
+def test_durable_request_fails_when_its_record_is_not_stored(transaction_payload):
+    """
+    Tests that a durable delivery conflicting with a stored transaction's ids gets a 500, not a result that isn't stored.
+    """
+    from fastapi.testclient import TestClient
+    from app import main
+
+    first = transaction_payload("cap_wb_durable_a", requestId="req_wb_durable", chargeId="chg_wb_durable")
+    with TestClient(main.app) as client:
+        stored = client.post("/process_transaction/?durable=true", json=first)
+        conflicting = client.post("/process_transaction/?durable=true", json={**first, "captureId": "cap_wb_durable_b"})
+
+    assert stored.status_code == 200
+    assert conflicting.status_code == 500
+
+
+def test_statistics_only_count_stored_transactions(tmp_path):
+    """
+    Tests that a result update whose insert failed adds nothing to the processed and fulfillment counters.
+    """
+    from app.models.database import StatCounter
+
+    async def run():
+        engine, session_factory = await make_session_factory(tmp_path)
+        queue = WriteBehindQueue(session_factory, flush_interval=0.05)
+        await queue.start()
+        result = {"fulfillment_status": "SUCCESS", "history": ["done"]}
+        writes = []
+        for i, values in ((1, row(1)), (2, {**row(2), "request_id": "req_wb_1"})):
+            writes.append(queue.enqueue_insert(values))
+            writes.append(queue.enqueue_update(f"cap_wb_{i}", result, record={**values, **result}))
+        await asyncio.gather(*writes, return_exceptions=True)
+        # A redelivery of the conflicting transaction fails the same way
+        await asyncio.gather(queue.enqueue_update("cap_wb_2", result, record={**row(2), **result}), return_exceptions=True)
+        await queue.stop()
+        async with session_factory() as db:
+            counters = dict((await db.execute(select(StatCounter.name, StatCounter.value))).all())
+        await engine.dispose()
+        return counters
+
+    assert asyncio.run(run()) == {"total": 1, "status:SUCCESS": 1, "processed": 1, "fulfillment:SUCCESS": 1}
@@ -0,0 +1,157 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import rescore
+from app.core.rescoring import NO, UNKNOWN, YES, ColumnChunk, ColumnRuleSet
+from app.core.rules import VALIDATION_RULES, RuleEngine, rule_failure_message
+from app.models.database import StatCounter, Transaction as TransactionRecord, TransactionRollup, create_schema, make_engine
+
+VALID = ["Validation Agent: Transaction is valid."]
+SCREENED = VALID + ["Fraud Detection Agent: Transaction is not fraudulent (degraded: circuit open; rule-based check)."]
+LLM_FLAGGED = VALID + ["Fraud Detection Agent: Transaction is fraudulent."]
+
+
+def record(i, status="SUCCESS", amount=1500, currency="SGD", device_id="device_1", is_valid=True,
+           is_fraudulent=False, fulfillment_status="SUCCESS", error_message=None, history=VALID):
+    return TransactionRecord(
+        capture_id=f"cap_rescore_{i}", request_id=f"req_rescore_{i}", charge_id=f"chg_rescore_{i}",
+        status=status, amount_value=amount, amount_currency=currency, transaction_metadata={"device_id": device_id},
+        is_valid=is_valid, is_fraudulent=is_fraudulent, fulfillment_status=fulfillment_status,
+        error_message=error_message, history=history
+    )
+
+
+def invalid_record(i, error_message, **overrides):
+    return record(i, is_valid=False, is_fraudulent=None, fulfillment_status="FLAGGED_FOR_REVIEW",
+                  error_message=error_message, history=["Validation Agent: Transaction is invalid."], **overrides)
+
+
+def make_database(tmp_path, records, counters=None):
+    url = f"sqlite:///{tmp_path / 'rescore.db'}"
+    engine = make_engine(url)
+    create_schema(engine)
+    with Session(engine) as db:
+        db.add_all(records)
+        db.add_all([StatCounter(name=name, value=value) for name, value in (counters or {}).items()])
+        db.commit()
+    return url, engine
+
+
+def test_column_rules_match_the_row_rules(make_transaction):
+    """
+    Tests that the vectorized validation rules fail the same transactions as the rule engine.
+    """
+    cases = [
+        ("SUCCESS", 1500, "SGD"), ("REFUNDED", 1500, "SGD"), ("SUCCESS", 0, "SGD"),
+        ("SUCCESS", 1500, "XXX"), ("", 1500, "usd"), ("PENDING", -5, "EUR"),
+    ]
+    transactions = [
+        make_transaction(f"cap_{i}", status=status, amount=amount, currency=currency)
+        for i, (status, amount, currency) in enumerate(cases)
+    ]
+    rule_set = ColumnRuleSet()
+    chunk = ColumnChunk.from_rows([
+        (i, t.capture_id, t.request_id, t.charge_id, t.status, t.amount.value, True, t.amount.currency, "", YES, NO,
+         YES, "", False)
+        for i, t in enumerate(transactions)
+    ])
+    verdicts = rule_set.evaluate(chunk)
+
+    engine = RuleEngine(VALIDATION_RULES)
+    for i, transaction in enumerate(transactions):
+        assert rule_set.names(rule_set.validation_rules, int(verdicts.failed[i])) == engine.evaluate(transaction)
+
+
+def test_verdicts_the_rules_cannot_decide_stay_unknown():
+    """
+    Tests that the column rules leave undecided verdicts UNKNOWN, drop the fraud verdict of rows that become
+    invalid, and don't clear invalid verdicts an LLM or an unrescored rule may have reached.
+    """
+    def row(i, currency, is_valid, is_fraudulent, failure_message=""):
+        return (i, f"cap_{i}", f"req_{i}", f"chg_{i}", "SUCCESS", 1500, True, currency, "", is_valid, is_fraudulent,
+                YES if (is_valid, is_fraudulent) == (YES, NO) else NO, failure_message, False)
+
+    chunk = ColumnChunk.from_rows([
+        row(0, "SGD", UNKNOWN, UNKNOWN),
+        row(1, "XXX", YES, NO),
+        row(2, "SGD", NO, UNKNOWN, rule_failure_message(["currency"])),
+        row(3, "SGD", NO, UNKNOWN, "Transaction failed validation checks."),
+        row(4, "SGD", NO, UNKNOWN, rule_failure_message(["currency", "timestamps"])),
+    ])
+
+    verdicts = ColumnRuleSet().evaluate(chunk)
+    llm_judged = ColumnRuleSet(llm_judged=True).evaluate(chunk)
+
+    assert verdicts.is_valid.tolist() == [UNKNOWN, NO, YES, NO, NO]
+    assert verdicts.is_fraudulent.tolist() == [UNKNOWN] * 5
+    assert verdicts.fulfilled.tolist() == [NO] * 5
+    assert llm_judged.is_valid.tolist() == [UNKNOWN, NO, NO, NO, NO]
+
+def test_report_lists_changed_decisions_without_writing(tmp_path):
+    """
+    Tests that the report counts the verdicts the rules re-decide, leaves model verdicts alone and doesn't write.
+    """
+    url, engine = make_database(tmp_path, [
+        record(1),
+        record(2, currency="XXX"),
+        record(3, amount=20000, history=SCREENED),
+        record(4, device_id="suspicious_device_9", history=SCREENED),
+        record(5, currency="XXX", is_valid=None, is_fraudulent=None, fulfillment_status=None),
+        # Flagged by the model on a small amount, and cleared by it on a large one: neither is the screen's call
+        record(6, amount=50, is_fraudulent=True, fulfillment_status="FLAGGED_FOR_REVIEW", history=LLM_FLAGGED),
+        record(7, amount=20000),
+        # Invalid only because of a rule that passes now, by the model, and by a rule that isn't rescored
+        invalid_record(8, rule_failure_message(["currency"])),
+        invalid_record(9, "Transaction failed validation checks."),
+        invalid_record(10, rule_failure_message(["currency", "timestamps"])),
+    ])
+
+    report = rescore.rescore(url, workers=1, chunk_size=2)
+
+    assert (report.rows, report.changed) == (9, 4)
+    assert report.transitions == {
+        "is_valid: true -> false": 1, "is_valid: false -> true": 1,
+        "is_fraudulent: false -> null": 1, "is_fraudulent: false -> true": 2,
+        "fulfillment_status: SUCCESS -> FLAGGED_FOR_REVIEW": 3,
+    }
+    assert report.samples["is_fraudulent: false -> true"] == ["cap_rescore_3", "cap_rescore_4"]
+    assert report.samples["is_valid: false -> true"] == ["cap_rescore_8"]
+    assert report.rules["validation:currency"] == 1
+    assert report.rules["fraud:amount_limit"] == 2
+    assert report.rules["fraud:suspicious_device"] == 1
+    with Session(engine) as db:
+        assert db.scalar(select(TransactionRecord.is_valid).where(TransactionRecord.capture_id == "cap_rescore_2")) is True
+
+
+def test_apply_writes_changes_and_adjusts_counters(tmp_path):
+    """
+    Tests that applying writes the new verdicts and fulfillment status with a history entry and moves the
+    transactions between the dashboard counters and rollups.
+    """
+    url, engine = make_database(tmp_path, [record(i) for i in range(1, 7)] + [
+        record(7, currency="XXX"),
+        record(8, amount=50000, history=SCREENED),
+        record(9, amount=50, is_fraudulent=True, fulfillment_status="FLAGGED_FOR_REVIEW", history=LLM_FLAGGED),
+    ], counters={"invalid": 0, "fraudulent": 1, "fulfillment:SUCCESS": 8, "fulfillment:FLAGGED_FOR_REVIEW": 1})
+
+    parallel = rescore.rescore(url, workers=3, chunk_size=2)
+    applied = rescore.rescore(url, workers=1, apply=True)
+    again = rescore.rescore(url, workers=1)
+
+    assert parallel.transitions == applied.transitions
+    assert (applied.changed, again.changed) == (2, 0)
+    with Session(engine) as db:
+        invalid = db.get(TransactionRecord, 7)
+        assert (invalid.is_valid, invalid.is_fraudulent, invalid.fulfillment_status) == (False, None, "FLAGGED_FOR_REVIEW")
+        assert invalid.error_message == "Transaction failed validation rules: currency."
+        assert invalid.history[-1] == "Rescore: Transaction is now invalid (failed rules: currency); held for manual review."
+        flagged = db.get(TransactionRecord, 8)
+        assert (flagged.is_fraudulent, flagged.fulfillment_status) == (True, "FLAGGED_FOR_REVIEW")
+        assert flagged.history[-1] == "Rescore: Transaction is now fraudulent (flagged by: amount_limit); held for manual review."
+        assert db.get(TransactionRecord, 9).is_fraudulent is True
+        assert dict(db.execute(select(StatCounter.name, StatCounter.value)).all()) == {
+            "invalid": 1, "fraudulent": 2, "fulfillment:SUCCESS": 6, "fulfillment:FLAGGED_FOR_REVIEW": 3
+        }
+        rollups = {(r.currency, r.fulfillment_status): (r.count, r.amount_total)
+                   for r in db.execute(select(TransactionRollup)).scalars()}
+        assert rollups == {("XXX", "SUCCESS"): (-1, -1500), ("XXX", "FLAGGED_FOR_REVIEW"): (1, 1500),
+                           ("SGD", "SUCCESS"): (-1, -50000), ("SGD", "FLAGGED_FOR_REVIEW"): (1, 50000)}
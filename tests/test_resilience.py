@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+from app.agents import failure_detection_agent, recovery_agent
+from app.agents.router import agentic_system
+from app.core import llm
+from app.core.config import GEMINI_MODEL
+from app.core.metrics import LLM_HEDGES
+from app.core.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, DegradedError, GuardedCall, llm_breaker
+from app.core.state import new_agent_state
+from app.core.stub_llm import LatencyModel, StubChatModel
+from app.core.summaries import STATIC_SUMMARIES, SummaryStore
+
+
+@pytest.fixture
+def stub_model():
+    def install(**kwargs):
+        model = StubChatModel(**kwargs)
+        llm.register_client(GEMINI_MODEL, model)
+        return model
+
+    yield install
+    llm.reset_clients()
+
+
+def test_breaker_opens_rejects_and_recovers_after_a_probe():
+    """
+    Tests that the breaker opens on failures, rejects during the cooldown and closes after a successful probe.
+    """
+    now = [0.0]
+    breaker = CircuitBreaker(error_rate=0.5, window=4, min_calls=4, cooldown=10, clock=lambda: now[0])
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success, 0.01)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    now[0] = 11
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_opens_on_slow_calls():
+    """
+    Tests that calls that succeed but are consistently slow also open the breaker.
+    """
+    breaker = CircuitBreaker(error_rate=0.5, slow_call_seconds=1.0, window=4, min_calls=4)
+    for _ in range(4):
+        breaker.record(True, 2.0)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_probe_frees_the_half_open_slot():
+    """
+    Tests that a half-open probe cancelled by its caller lets the next call probe instead of blocking the breaker.
+    """
+    now = [0.0]
+    breaker = CircuitBreaker(error_rate=0.5, window=2, min_calls=2, cooldown=10, clock=lambda: now[0])
+    for _ in range(2):
+        breaker.record(False, 0.01)
+    now[0] = 11.0
+    guard = GuardedCall("probe_test", breaker, deadline=None)
+
+    async def run():
+        probe = asyncio.ensure_future(guard.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN and not breaker.allow()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await guard.call(lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_hedged_request_wins_over_a_slow_primary():
+    """
+    Tests that a request running past the hedging percentile gets a duplicate whose answer is used.
+    """
+    guard = GuardedCall("hedge_test", CircuitBreaker(), deadline=1.0, hedge_percentile=90, hedge_min_samples=5)
+    for _ in range(10):
+        guard._latencies.append(0.01)
+    delays = iter([0.5, 0.0])
+
+    async def call():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert asyncio.run(guard.call(call)) == 0.0
+    assert LLM_HEDGES.value(agent="hedge_test") == 1
+
+
+def test_deadline_degrades_to_rule_based_fraud_check(make_transaction, stub_model, monkeypatch):
+    """
+    Tests that a model answering past the deadline is abandoned and the fraud rules decide instead.
+    """
+    stub_model(latency=LatencyModel.parse("fixed:500"), script=["no"])
+    monkeypatch.setattr(failure_detection_agent.guard, "deadline", 0.05)
+
+    state = new_agent_state(make_transaction("cap_resilience_1", amount=20000))
+    final_state = asyncio.run(agentic_system.ainvoke(state))
+
+    assert final_state['is_fraudulent'] is True
+    assert any("degraded: deadline" in entry for entry in final_state['history'])
+
+
+def test_open_circuit_skips_the_model(make_transaction, stub_model):
+    """
+    Tests that while the circuit is open no model calls are made and the history records the degraded path.
+    """
+    model = stub_model(error_rate=1.0)
+    for i in range(llm_breaker.min_calls):
+        with pytest.raises(DegradedError):
+            failure_detection_agent._ask(f"transaction {i}")
+    assert llm_breaker.state == OPEN
+    calls = model.calls
+
+    transaction = make_transaction("cap_resilience_2", metadata={"device_id": "suspicious_device_1"})
+    final_state = agentic_system.invoke(new_agent_state(transaction))
+
+    assert model.calls == calls
+    assert final_state['is_fraudulent'] is True
+    assert "Fraud Detection Agent: Transaction is fraudulent (degraded: circuit open; rule-based check)." in final_state['history']
+
+
+def test_degraded_recovery_summary_is_noted_in_the_history(make_transaction, stub_model, monkeypatch):
+    """
+    Tests that a recovery summary the model couldn't write is served from the built-in text and marked as degraded.
+    """
+    stub_model(error_rate=1.0)
+    monkeypatch.setattr(recovery_agent, "summary_store", SummaryStore(mode="llm"))
+    llm_breaker._open()
+
+    final_state = agentic_system.invoke(new_agent_state(make_transaction("cap_resilience_3")))
+
+    summary = STATIC_SUMMARIES[("Valid", "Not Fraudulent")]
+    assert final_state['history'][-1] == f"Recovery Agent: {summary} (degraded: circuit open; built-in summary)"
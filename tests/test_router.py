@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from app.agents import failure_detection_agent, recovery_agent
+from app.agents.router import build_workflow
+from app.core.state import AgentState
+
+
+@pytest.fixture
+def make_state(make_transaction):
+    def make(status="SUCCESS"):
+        return AgentState(
+            transaction=make_transaction("cap_router", status=status),
+            is_valid=None,
+            is_fraudulent=None,
+            fulfillment_status=None,
+            error_message=None,
+            history=[]
+        )
+    return make
+
+
+@pytest.fixture
+def fake_chains(monkeypatch):
+    """Replaces the fraud and recovery chains with offline fakes that always answer 'yes'."""
+    calls = []
+
+    def reply(content):
+        def invoke(_):
+            calls.append(content)
+            return AIMessage(content=content)
+
+        async def ainvoke(payload):
+            return invoke(payload)
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+    monkeypatch.setattr(failure_detection_agent, "fraud_detection_agent", reply("yes"))
+    monkeypatch.setattr(recovery_agent, "recovery_agent", reply("Flagged for review."))
+    return calls
+
+
+@pytest.mark.parametrize("topology", ["serial", "speculative"])
+def test_topologies_agree_on_valid_transaction(make_state, fake_chains, topology):
+    """
+    Tests that both topologies reach the same verdict for a valid transaction.
+    """
+    graph = build_workflow(topology).compile()
+    final_state = asyncio.run(graph.ainvoke(make_state()))
+    assert final_state['is_valid'] is True
+    assert final_state['is_fraudulent'] is True
+    assert final_state['fulfillment_status'] == 'FLAGGED_FOR_REVIEW'
+    assert final_state['history'][0].startswith("Validation Agent")
+    assert final_state['history'][1].startswith("Fraud Detection Agent")
+
+
+def test_speculative_fraud_result_discarded_when_invalid(make_state, fake_chains):
+    """
+    Tests that the speculative fraud verdict is dropped when validation fails.
+    """
+    graph = build_workflow("speculative").compile()
+    final_state = graph.invoke(make_state(status="FAILURE"))
+    assert final_state['is_valid'] is False
+    assert final_state['is_fraudulent'] is None
+    assert final_state['speculative_fraud'] is None
+    assert "discarded" in final_state['history'][1]
+
+
+def test_unknown_topology_is_rejected():
+    """
+    Tests that a misconfigured topology fails at build time.
+    """
+    with pytest.raises(ValueError):
+        build_workflow("diamond")
+
+
+@pytest.mark.parametrize("status, counted", [("SUCCESS", 1), ("FAILURE", 0)])
+def test_speculative_run_counts_only_kept_verdicts(make_state, monkeypatch, status, counted):
+    """
+    Tests that a speculative fraud run updates the velocity counters and baselines only once the join keeps it.
+    """
+    monkeypatch.setattr(failure_detection_agent, "fraud_detection_agent", RunnableLambda(lambda _: AIMessage(content="no")))
+    graph = build_workflow("speculative").compile()
+    state = make_state(status=status)
+    features = failure_detection_agent.velocity_store.features_for("chg_router", {})
+
+    final_state = graph.invoke(state)
+
+    assert final_state['is_fraudulent'] is (False if counted else None)
+    assert failure_detection_agent.velocity_store.lookup(features)["charge_id=chg_router"]["24h"] == counted
+    assert sum(sketch.count for sketch in failure_detection_agent.fraud_scorer._currencies.values()) == counted
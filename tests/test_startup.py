@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_importing_the_agents_defers_the_llm_sdk_and_the_web_app():
+    """
+    Tests that importing the package and the agent graph loads neither the Gemini SDK nor app.main.
+    """
+    snippet = (
+        "import sys, app, app.agents.router; "
+        "print('langchain_google_genai' in sys.modules, 'app.main' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, env=dict(os.environ),
+                            capture_output=True, text=True, check=True)
+    assert output.stdout.split() == ["False", "False"]
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.models.database import Base, Transaction as TransactionRecord, make_async_engine
+from app.models.persistence import WriteBehindQueue
+from app.models.stats import read_stats, rebuild_stats
+
+
+def test_stats_follow_durable_writes(transaction_payload):
+    """
+    Tests that processing a transaction updates the counters read by /api/stats.
+    """
+    with TestClient(app) as client:
+        before = client.get("/api/stats").json()["counters"]
+        response = client.post("/process_transaction/?durable=true", json=transaction_payload("cap_stats_1", amount=1500, status="FAILURE"))
+        assert response.status_code == 200
+        after = client.get("/api/stats").json()
+
+    counters = after["counters"]
+    assert counters["total"] == before.get("total", 0) + 1
+    assert counters["status:FAILURE"] == before.get("status:FAILURE", 0) + 1
+    assert counters["fulfillment:FLAGGED_FOR_REVIEW"] == before.get("fulfillment:FLAGGED_FOR_REVIEW", 0) + 1
+    assert any(r["currency"] == "SGD" and r["fulfillment_status"] == "FLAGGED_FOR_REVIEW" for r in after["rollups"])
+
+
+def test_insert_and_update_in_separate_flushes_count_once(tmp_path):
+    """
+    Tests that a transaction whose result arrives in a later group commit is counted once.
+    """
+    async def run():
+        engine = make_async_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        queue = WriteBehindQueue(session_factory, flush_interval=0.01)
+        await queue.start()
+        record = dict(
+            capture_id="cap_1", request_id="req_1", charge_id="chg_1", status="SUCCESS",
+            amount_value=700, amount_currency="USD", transaction_metadata={}, history=[]
+        )
+        await queue.enqueue_insert(record)
+        result = {"fulfillment_status": "SUCCESS", "is_valid": True, "is_fraudulent": False, "history": []}
+        await queue.enqueue_update("cap_1", result, record={**record, **result})
+        await queue.stop()
+        async with session_factory() as db:
+            stats = await read_stats(db)
+        await engine.dispose()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["counters"] == {"total": 1, "status:SUCCESS": 1, "processed": 1, "fulfillment:SUCCESS": 1}
+    assert [(r["currency"], r["count"], r["amount_total"]) for r in stats["rollups"]] == [("USD", 1, 700)]
+
+
+def test_rebuild_backfills_existing_rows(tmp_path):
+    """
+    Tests that counters are backfilled once from a table that predates them.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        TransactionRecord(capture_id="a", request_id="a", charge_id="a", status="SUCCESS", amount_value=10,
+                          amount_currency="SGD", fulfillment_status="SUCCESS", created_at=datetime(2025, 6, 30, 10, 5)),
+        TransactionRecord(capture_id="b", request_id="b", charge_id="b", status="FAILED", amount_value=20,
+                          amount_currency="SGD", fulfillment_status="FLAGGED_FOR_REVIEW", is_valid=False,
+                          created_at=datetime(2025, 6, 30, 10, 40)),
+    ])
+    db.commit()
+
+    assert rebuild_stats(db) is True
+    assert rebuild_stats(db) is False
+    counters = {row.name: row.value for row in db.query(Base.metadata.tables["stat_counters"]).all()}
+    assert counters["total"] == 2
+    assert counters["status:FAILED"] == 1
+    assert counters["invalid"] == 1
+    db.close()
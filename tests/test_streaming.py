@@ -0,0 +1,78 @@
+import json
+from fastapi.testclient import TestClient
+from app import main
+from app.agents.streaming import state_delta
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_state_delta_keeps_only_changes():
+    """
+    Tests that a node's delta has its changed keys and only the new history and timing entries.
+    """
+    before = {"transaction": object(), "is_valid": True, "is_fraudulent": None, "history": ["a"], "timings": {"x": 1.0}}
+    update = {**before, "is_fraudulent": False, "history": ["a", "b"], "timings": {"x": 1.0, "y": 2.0}}
+    assert state_delta(before, update) == {"is_fraudulent": False, "history": ["b"], "timings": {"y": 2.0}}
+
+
+def test_sse_stream_sends_each_node_then_the_result(transaction_payload):
+    """
+    Tests that the SSE endpoint emits one event per node as it finishes, then the final state, and replays later deliveries.
+    """
+    with TestClient(main.app) as client:
+        with client.stream("POST", "/process_transaction/stream?durable=true", json=transaction_payload("cap_stream_1")) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = parse_events(response.read().decode())
+        replay = parse_events(client.post("/process_transaction/stream", json=transaction_payload("cap_stream_1")).text)
+        invalid = client.post("/process_transaction/stream", json={**transaction_payload("cap_stream_2"), "amount": {"value": "lots"}})
+
+    assert [event for event, _ in events] == ["node", "node", "node", "result"]
+    assert [data["node"] for _, data in events[:3]] == ["run_validation_agent", "run_fraud_detection_agent", "run_recovery_agent"]
+    validation = events[0][1]["delta"]
+    assert validation["is_valid"] is True
+    assert validation["history"] == ["Validation Agent: Transaction is valid."]
+    assert "transaction" not in validation
+
+    result = events[-1][1]
+    assert result["replayed"] is False
+    assert result["state"]["fulfillment_status"] == "SUCCESS"
+    assert result["state"]["history"] == [entry for _, data in events[:3] for entry in data["delta"]["history"]]
+
+    assert [event for event, _ in replay] == ["result"]
+    assert replay[0][1]["replayed"] is True
+    assert replay[0][1]["state"]["history"] == result["state"]["history"]
+    assert result["state"]["transaction"] == transaction_payload("cap_stream_1")
+    assert invalid.status_code == 422
+    assert {tuple(error["loc"]) for error in invalid.json()["detail"]} == {("body", "amount", "value"), ("body", "amount", "currency")}
+
+
+def test_websocket_streams_several_transactions_on_one_connection(transaction_payload):
+    """
+    Tests that one WebSocket carries the events of several transactions, tagged by capture id, and rejects bad input.
+    """
+    with TestClient(main.app) as client:
+        with client.websocket_connect("/ws/process_transaction") as websocket:
+            websocket.send_json(transaction_payload("cap_socket_1"))
+            websocket.send_json(transaction_payload("cap_socket_2", status="UNKNOWN"))
+            websocket.send_json({"captureId": "cap_socket_bad"})
+            messages = []
+            while sum(message["event"] in ("result", "error") for message in messages) < 3:
+                messages.append(websocket.receive_json())
+
+    by_capture = {}
+    for message in messages:
+        by_capture.setdefault(message["capture_id"], []).append(message)
+
+    assert [message["event"] for message in by_capture["cap_socket_1"]] == ["node", "node", "node", "result"]
+    invalid = by_capture["cap_socket_2"]
+    assert [message.get("node") for message in invalid] == ["run_validation_agent", "run_recovery_agent", None]
+    assert invalid[0]["delta"]["is_valid"] is False
+    assert invalid[-1]["state"]["fulfillment_status"] == "FLAGGED_FOR_REVIEW"
+    assert by_capture["cap_socket_bad"][0]["event"] == "error"
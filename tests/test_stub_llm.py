@@ -0,0 +1,66 @@
+import asyncio
+import random
+import pytest
+from app.agents.batch import process_transactions
+from app.agents.router import agentic_system
+from app.core import llm
+from app.core.config import GEMINI_MODEL
+from app.core.state import new_agent_state
+from app.core.stub_llm import LatencyModel, StubChatModel, StubLLMError
+
+
+@pytest.fixture
+def stub_model():
+    """Installs a stub as the shared client for the agents' model, and restores the registry afterwards."""
+    def install(**kwargs):
+        model = StubChatModel(**kwargs)
+        llm.register_client(GEMINI_MODEL, model)
+        return model
+
+    yield install
+    llm.reset_clients()
+
+
+def test_latency_model_parses_and_samples():
+    """
+    Tests that latency specs are parsed and sampled in seconds.
+    """
+    rng = random.Random(0)
+    assert LatencyModel.parse("fixed:20").sample(rng) == 0.02
+    samples = [LatencyModel.parse("uniform:100:10").sample(rng) for _ in range(100)]
+    assert all(0.09 <= sample <= 0.11 for sample in samples)
+    with pytest.raises(ValueError):
+        LatencyModel.parse("gaussian:10")
+
+
+def test_scripted_verdicts_drive_the_graph(make_transaction, stub_model):
+    """
+    Tests that the agents run on the stub model and follow its scripted verdicts.
+    """
+    model = stub_model(script=["yes"])
+    final_state = asyncio.run(agentic_system.ainvoke(new_agent_state(make_transaction("cap_stub_1"))))
+
+    assert model.calls == 1
+    assert final_state['is_fraudulent'] is True
+    assert final_state['fulfillment_status'] == "FLAGGED_FOR_REVIEW"
+
+
+def test_batch_prompts_get_one_verdict_per_transaction(make_transaction, stub_model):
+    """
+    Tests that a micro-batched prompt is answered line by line in script order.
+    """
+    model = stub_model(script=["no", "yes"])
+    results = process_transactions([make_transaction(f"cap_stub_{i}") for i in range(4)], batch_size=10, max_wait=0.05)
+
+    assert model.calls == 1
+    assert [result['is_fraudulent'] for result in results] == [False, True, False, True]
+
+
+def test_error_rate_raises_simulated_failures():
+    """
+    Tests that calls fail at the configured rate.
+    """
+    model = StubChatModel(error_rate=1.0)
+    with pytest.raises(StubLLMError):
+        model.invoke("Respond with only 'yes' or 'no'.")
+    assert StubChatModel(yes_rate=1.0).invoke("Respond with only 'yes' or 'no'.").content == "yes"
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from app.core.summaries import STATIC_SUMMARIES, Summary, SummaryStore
+
+VALID = {"validation_status": "Valid", "fraud_status": "Not Fraudulent"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cached_mode_generates_once_per_combination():
+    """
+    Tests that a status combination only reaches the LLM once until it needs refreshing.
+    """
+    calls = []
+    clock = FakeClock()
+    store = SummaryStore(mode="cached", refresh_after=60, clock=clock)
+
+    def generate(inputs):
+        calls.append(inputs)
+        return f"summary {len(calls)}"
+
+    assert store.summarize(VALID, generate) == Summary("summary 1")
+    assert store.summarize(VALID, generate) == Summary("summary 1")
+    clock.now = 61
+    assert store.summarize(VALID, generate) == Summary("summary 2")
+    assert len(calls) == 2
+
+
+def test_failed_refresh_serves_stale_then_static_summary():
+    """
+    Tests that an LLM failure falls back to the last good summary, then the built-in one, and says so.
+    """
+    clock = FakeClock()
+    store = SummaryStore(mode="cached", refresh_after=60, clock=clock)
+
+    def fail(inputs):
+        raise RuntimeError("model unavailable")
+
+    assert store.summarize(VALID, fail) == Summary(STATIC_SUMMARIES[("Valid", "Not Fraudulent")],
+                                                   "model error: RuntimeError; built-in summary")
+    store.summarize(VALID, lambda inputs: "generated")
+    clock.now = 61
+    assert store.summarize(VALID, fail) == Summary("generated", "model error: RuntimeError; last generated summary")
+
+
+def test_warm_fills_every_combination():
+    """
+    Tests that warming makes every later lookup local.
+    """
+    store = SummaryStore(mode="cached")
+
+    async def agenerate(inputs):
+        return f"{inputs['validation_status']}/{inputs['fraud_status']}"
+
+    asyncio.run(store.awarm(agenerate))
+
+    def fail(inputs):
+        raise AssertionError("should not call the LLM after warming")
+
+    for validation_status, fraud_status in STATIC_SUMMARIES:
+        inputs = {"validation_status": validation_status, "fraud_status": fraud_status}
+        assert store.summarize(inputs, fail) == Summary(f"{validation_status}/{fraud_status}")
+
+
+def test_llm_mode_calls_every_time():
+    """
+    Tests that the opt-in per-transaction mode never memoizes.
+    """
+    calls = []
+    store = SummaryStore(mode="llm")
+    store.summarize(VALID, lambda inputs: calls.append(1) or "a")
+    store.summarize(VALID, lambda inputs: calls.append(1) or "b")
+    assert len(calls) == 2
+
+
+def test_unknown_mode_is_rejected():
+    """
+    Tests that a misconfigured mode fails at startup.
+    """
+    with pytest.raises(ValueError):
+        SummaryStore(mode="sometimes")
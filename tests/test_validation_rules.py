@@ -0,0 +1,42 @@
+import pytest
+from app.core.rules import RuleEngine, VALIDATION_RULES
+
+
+def test_valid_transaction_passes_all_rules(make_transaction):
+    """
+    Tests that a well-formed transaction fails no local rules.
+    """
+    engine = RuleEngine(VALIDATION_RULES)
+    assert engine.evaluate(make_transaction()) == []
+
+
+@pytest.mark.parametrize("overrides, rule", [
+    ({"status": "FAILURE"}, "status"),
+    ({"amount": 0}, "amount"),
+    ({"amount": 100, "currency": "XYZ"}, "currency"),
+    ({"createdAt": "30/06/2025"}, "timestamps"),
+    ({"captureId": ""}, "required_fields"),
+])
+def test_rule_failures_are_reported_by_name(make_transaction, overrides, rule):
+    """
+    Tests that each broken field is reported under the rule that checks it.
+    """
+    engine = RuleEngine(VALIDATION_RULES)
+    assert engine.evaluate(make_transaction(**overrides)) == [rule]
+
+
+def test_llm_rules_are_skipped_locally(make_transaction):
+    """
+    Tests that rules configured for the LLM are not evaluated by the engine.
+    """
+    engine = RuleEngine(VALIDATION_RULES, llm_rules=["currency"])
+    assert engine.evaluate(make_transaction(amount=100, currency="XYZ")) == []
+    assert [rule.name for rule in engine.llm_rules] == ["currency"]
+
+
+def test_unknown_llm_rule_is_rejected():
+    """
+    Tests that a typo in the LLM rule configuration fails fast.
+    """
+    with pytest.raises(ValueError):
+        RuleEngine(VALIDATION_RULES, llm_rules=["not_a_rule"])
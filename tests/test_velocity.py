@@ -0,0 +1,99 @@
+from app.core.velocity import VelocityStore, exceeded_limits
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_counts_slide_out_of_each_window():
+    """
+    Tests that events age out of the 1m window before the 1h and 24h windows.
+    """
+    clock = FakeClock()
+    store = VelocityStore(fields=["device_id"], clock=clock)
+    features = store.features_for("chg_1", {"device_id": "d1"})
+    for _ in range(3):
+        store.record(features)
+
+    assert store.lookup(features)["device_id=d1"] == {"1m": 3, "1h": 3, "24h": 3}
+    clock.now += 120
+    assert store.lookup(features)["device_id=d1"] == {"1m": 0, "1h": 3, "24h": 3}
+    clock.now += 2 * 3600
+    assert store.lookup(features)["charge_id=chg_1"] == {"1m": 0, "1h": 0, "24h": 3}
+    clock.now += 86400
+    assert store.lookup(features)["charge_id=chg_1"] == {"1m": 0, "1h": 0, "24h": 0}
+
+
+def test_backfilled_events_land_in_the_right_windows():
+    """
+    Tests that events replayed with past timestamps only count in windows that still cover them.
+    """
+    clock = FakeClock()
+    store = VelocityStore(clock=clock)
+    features = store.features_for("chg_1", None)
+    store.record(features, timestamp=clock.now - 1800)
+    store.record(features, timestamp=clock.now - 2 * 86400)
+    assert store.lookup(features)["charge_id=chg_1"] == {"1m": 0, "1h": 1, "24h": 1}
+
+
+def test_memory_is_bounded():
+    """
+    Tests that the least recently seen values are evicted past max_keys.
+    """
+    store = VelocityStore(max_keys=2)
+    for charge_id in ["a", "b", "c"]:
+        store.record(store.features_for(charge_id, None))
+    assert store.lookup(store.features_for("a", None))["charge_id=a"]["24h"] == 0
+    assert store.lookup(store.features_for("c", None))["charge_id=c"]["24h"] == 1
+
+
+def test_each_capture_is_counted_once(make_transaction):
+    """
+    Tests that observing the same capture again (a resumed or retried run) returns the same counts without adding to them.
+    """
+    store = VelocityStore(fields=["device_id"])
+    first = make_transaction("cap_velocity_1", metadata={"device_id": "d1"})
+    second = make_transaction("cap_velocity_2", metadata={"device_id": "d1"})
+
+    assert store.observe(first)["device_id=d1"]["24h"] == 1
+    assert store.observe(first)["device_id=d1"]["24h"] == 1
+    assert store.preview(first)["device_id=d1"]["24h"] == 1
+    assert store.preview(second)["device_id=d1"]["24h"] == 2
+    assert store.observe(second)["device_id=d1"]["24h"] == 2
+
+
+def test_exceeded_limits():
+    """
+    Tests that only windows over their limit are reported.
+    """
+    velocity = {"device_id=d1": {"1m": 6, "1h": 6, "24h": 6}, "charge_id=c": {"1m": 1, "1h": 1, "24h": 1}}
+    assert exceeded_limits(velocity, {"1m": 5, "1h": 30}) == {"device_id=d1": {"1m": 6}}
+
+
+def test_busy_device_escalates_a_local_pass(make_transaction, monkeypatch):
+    """
+    Tests that a typical amount from a device over its velocity limit still goes to the LLM.
+    """
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+    from app.agents import failure_detection_agent
+    from app.core.state import new_agent_state
+
+    prompts = []
+    monkeypatch.setattr(failure_detection_agent, "fraud_detection_agent",
+                        RunnableLambda(lambda payload: prompts.append(payload) or AIMessage(content="yes")))
+    monkeypatch.setattr(failure_detection_agent, "VELOCITY_LIMITS", {"1m": 2})
+    for amount in range(900, 1100, 5):
+        failure_detection_agent.fraud_scorer.observe("SGD", amount)
+
+    def run(i):
+        transaction = make_transaction(f"cap_velocity_{i}", metadata={"device_id": "d1"})
+        return failure_detection_agent.run_fraud_detection_agent(new_agent_state(transaction))
+
+    assert [run(i)['is_fraudulent'] for i in range(3)] == [False, False, True]
+    assert len(prompts) == 1
+    assert "device_id=d1: 3 in 1m" in prompts[0]['transaction_json']
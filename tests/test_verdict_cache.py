@@ -0,0 +1,78 @@
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from app.agents import failure_detection_agent
+from app.core.cache import SqliteVerdictStore, VerdictCache, verdict_key
+from app.core.state import AgentState
+
+METADATA = {"fulfillmentId": "fulfill_1", "reason": "complete"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_is_canonical(make_transaction):
+    """
+    Tests that formatting differences in a replayed payload map to the same key.
+    """
+    first = make_transaction(metadata={"reason": "complete", "fulfillmentId": "fulfill_1"})
+    second = make_transaction(metadata=METADATA, status="success", currency="sgd")
+    assert verdict_key("fraud", "1", "m", first) == verdict_key("fraud", "1", "m", second)
+    assert verdict_key("fraud", "1", "m", first) != verdict_key("fraud", "2", "m", first)
+    assert verdict_key("fraud", "1", "m", first) != verdict_key("validation", "1", "m", first)
+
+
+def test_lru_eviction_and_ttl():
+    """
+    Tests that the least recently used entry is evicted and expired entries miss.
+    """
+    clock = FakeClock()
+    cache = VerdictCache(max_size=2, ttl=10, clock=clock)
+    cache.set("a", True)
+    cache.set("b", False)
+    assert cache.get("a") is True
+    cache.set("c", True)
+    assert cache.get("b") is None
+    assert cache.get("a") is True
+
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_sqlite_tier_survives_a_new_process_cache(tmp_path):
+    """
+    Tests that verdicts written through one cache are served by another sharing the store.
+    """
+    path = str(tmp_path / "verdicts.db")
+    VerdictCache(store=SqliteVerdictStore(path)).set("key", True)
+    cache = VerdictCache(store=SqliteVerdictStore(path))
+    assert cache.get("key") is True
+    assert cache.stats()["store_hits"] == 1
+
+
+def test_cached_verdict_short_circuits_fraud_agent(make_transaction, monkeypatch):
+    """
+    Tests that a replayed transaction is answered from the cache and marked as cached.
+    """
+    calls = []
+
+    def invoke(_):
+        calls.append(1)
+        return AIMessage(content="no")
+
+    monkeypatch.setattr(failure_detection_agent, "fraud_detection_agent", RunnableLambda(invoke))
+
+    def run():
+        state = AgentState(transaction=make_transaction("cap_cache", metadata=METADATA), is_valid=True, is_fraudulent=None,
+                           fulfillment_status=None, error_message=None, history=[])
+        return failure_detection_agent.run_fraud_detection_agent(state)
+
+    assert run()['history'] == ["Fraud Detection Agent: Transaction is not fraudulent."]
+    assert run()['history'] == ["Fraud Detection Agent: Transaction is not fraudulent (cached)."]
+    assert len(calls) == 1